@@ -2,8 +2,22 @@
 
 import sys
 import os
+import hashlib
+import zipfile
+import importlib.abc
+import importlib.machinery
+import importlib.util
+import types
+from collections.abc import Sequence
+from functools import wraps
+from itertools import islice
+from contextlib import contextmanager
+from contextvars import ContextVar
+
 import numpy as np
 
+from rank_moves import MOVES, TYPE_CODES, UNIT
+
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
 # ============================================================
@@ -70,53 +84,309 @@ def _dz_action_to_cards(action, cards_left):
 #  Module loading
 # ============================================================
 
-def _clear_douzero_cache():
-    """Remove all cached douzero.* modules from sys.modules."""
-    to_remove = [k for k in sys.modules
-                 if k == 'douzero' or k.startswith('douzero.')]
-    for k in to_remove:
-        del sys.modules[k]
+class _Backend(object):
+    """One repo's ``douzero`` package, imported as ``douzero_<repo>``.
+
+    DouZero and AlphaDou both ship a top-level ``douzero`` package.  Each
+    is loaded under its own name (douzero_DouZero.env.move_generator, ...)
+    so both stay in sys.modules at once.  The repos import their own
+    modules as ``douzero.*``: those names are _AliasModules that forward to
+    the backend active in the current thread / context, so code of either
+    repo has to run inside its backend's ``active()`` (the adapters wrap
+    every call into a repo that way).
+    """
+
+    def __init__(self, repo_name, root=None):
+        self.repo_name = repo_name
+        self.prefix = 'douzero_' + repo_name
+        self.root = root or os.path.join(BASE_DIR, repo_name, 'douzero')
+
+    def find_spec(self, fullname):
+        """Spec of ``prefix[.rest]`` from the files under ``root``."""
+        path = os.path.join(self.root, *fullname.split('.')[1:])
+        if os.path.isdir(path):
+            init = os.path.join(path, '__init__.py')
+            if os.path.isfile(init):
+                return importlib.util.spec_from_file_location(
+                    fullname, init, submodule_search_locations=[path])
+            spec = importlib.machinery.ModuleSpec(fullname, None, is_package=True)
+            spec.submodule_search_locations = [path]
+            return spec
+        if os.path.isfile(path + '.py'):
+            return importlib.util.spec_from_file_location(fullname, path + '.py')
+        return None
+
+    def import_module(self, name):
+        """``import douzero.<name>`` from this repo, e.g. 'env.env'."""
+        with self.active():
+            return importlib.import_module(self.prefix + '.' + name)
+
+    def resolve(self, alias):
+        """This backend's module for ``douzero[.x]``."""
+        return importlib.import_module(self.prefix + alias[len('douzero'):])
+
+    @contextmanager
+    def active(self):
+        """Resolve ``douzero.*`` to this backend meanwhile (this context only)."""
+        _BackendFinder.install()
+        token = _active_backend.set(self)
+        try:
+            yield self
+        finally:
+            _active_backend.reset(token)
+
+
+#active()中的backend, douzero.*解析到它; 每个线程/上下文各自一份
+_active_backend = ContextVar('douzero_backend', default=None)
+
+
+class _AliasModule(types.ModuleType):
+    """``douzero[.x]`` in sys.modules, shared by all backends.
+
+    Attribute lookups go to the module of the backend active in the
+    current context, so a function-level ``import douzero.x`` still works
+    after the import-time active() exited, and two backends can run in
+    different threads.
+    """
+
+    def __getattr__(self, attr):
+        backend = _active_backend.get()
+        if backend is None:
+            raise AttributeError("%s.%s used outside a douzero backend's active()"
+                                 % (self.__name__, attr))
+        return getattr(backend.resolve(self.__name__), attr)
+
+
+class _AliasLoader(importlib.abc.Loader):
+    """Creates the _AliasModule of a ``douzero.*`` name."""
+
+    def create_module(self, spec):
+        return _AliasModule(spec.name)
+
+    def exec_module(self, module):
+        pass
+
+
+class _BackendFinder(importlib.abc.MetaPathFinder):
+    """sys.meta_path hook serving the douzero_<repo> packages."""
+    _instance = None
+
+    def __init__(self):
+        self.backends = {}
+
+    @classmethod
+    def install(cls):
+        if cls._instance is None:
+            cls._instance = cls()
+            sys.meta_path.insert(0, cls._instance)
+        return cls._instance
+
+    def find_spec(self, fullname, path=None, target=None):
+        head, _, rest = fullname.partition('.')
+        backend = self.backends.get(head)
+        if backend is not None:
+            return backend.find_spec(fullname)
+        active = _active_backend.get()
+        if head == 'douzero' and active is not None:
+            #先导入真正的模块: 不存在时照常报ImportError, 包要有__path__
+            module = active.resolve(fullname)
+            return importlib.util.spec_from_loader(
+                fullname, _AliasLoader(), is_package=hasattr(module, '__path__'))
+        return None
+
+
+def _backend(repo_name):
+    """The (registered) backend of ``repo_name``."""
+    finder = _BackendFinder.install()
+    prefix = 'douzero_' + repo_name
+    if prefix not in finder.backends:
+        finder.backends[prefix] = _Backend(repo_name)
+    return finder.backends[prefix]
+
+
+def _in_backend(method):
+    """Run an adapter method inside its backend's active()."""
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._backend.active():
+            return method(self, *args, **kwargs)
+    return wrapper
 
 
 def _load_repo_modules(repo_name):
     """Load douzero modules from a specific repo.
 
-    Returns (DeepAgent, MovesGener, md, ms).
+    Returns (DeepAgent, MovesGener, md, ms).  Modules live under
+    douzero_<repo_name>, so DouZero and AlphaDou can be loaded together.
     """
-    _clear_douzero_cache()
-    repo_path = os.path.join(BASE_DIR, repo_name)
-    # Ensure repo_path is at front of sys.path
-    if repo_path in sys.path:
-        sys.path.remove(repo_path)
-    sys.path.insert(0, repo_path)
-
-    from douzero.env.move_generator import MovesGener
-    from douzero.env import move_detector as md
-    from douzero.env import move_selector as ms
-    from douzero.evaluation.deep_agent import DeepAgent
+    backend = _backend(repo_name)
+    MovesGener = backend.import_module('env.move_generator').MovesGener
+    md = backend.import_module('env.move_detector')
+    ms = backend.import_module('env.move_selector')
+    DeepAgent = backend.import_module('evaluation.deep_agent').DeepAgent
 
     return DeepAgent, MovesGener, md, ms
 
 
+# ============================================================
+#  Agent loading (optionally memory-mapped weights)
+# ============================================================
+
+POSITIONS = ['landlord', 'landlord_up', 'landlord_down']
+
+
+#旧格式checkpoint转换后的副本(mmap需要zip格式)放在这里, 不写进模型目录
+MMAP_CACHE_DIR = os.environ.get('DOUDIZHU_MMAP_CACHE') or os.path.join(
+    os.path.expanduser('~'), '.cache', 'happydoudizhu', 'mmap')
+
+
+def _mappable_checkpoint(model_path, cache_dir=None):
+    """Path of a zip-format copy of ``model_path`` (mmap needs one).
+
+    Legacy-format checkpoints are converted once into ``cache_dir``
+    (MMAP_CACHE_DIR by default), never next to the original, which belongs
+    to the vendored repo.  The copy is named after the original's path,
+    size and mtime, so a replaced checkpoint gets a fresh copy.
+    """
+    import torch
+    if zipfile.is_zipfile(model_path):
+        return model_path
+    cache_dir = cache_dir or MMAP_CACHE_DIR
+    st = os.stat(model_path)
+    key = '%s:%d:%d' % (os.path.abspath(model_path), st.st_size, st.st_mtime_ns)
+    name = os.path.splitext(os.path.basename(model_path))[0]
+    mapped_path = os.path.join(
+        cache_dir, '%s-%s.ckpt' % (name, hashlib.sha1(key.encode()).hexdigest()[:16]))
+    if not os.path.exists(mapped_path):
+        os.makedirs(cache_dir, exist_ok=True)
+        #多个worker可能同时转换, 各写各的临时文件
+        tmp = '%s.%d.tmp' % (mapped_path, os.getpid())
+        torch.save(torch.load(model_path, map_location='cpu'), tmp)
+        os.replace(tmp, mapped_path)
+    return mapped_path
+
+
+@contextmanager
+def _loading_mapped(torch, model_path, mapped):
+    """torch.load of ``model_path`` returns ``mapped`` (other paths load as usual)."""
+    real_load = torch.load
+
+    def load(f, *args, **kwargs):
+        if (isinstance(f, (str, os.PathLike))
+                and os.path.abspath(f) == os.path.abspath(model_path)):
+            return mapped
+        return real_load(f, *args, **kwargs)
+
+    torch.load = load
+    try:
+        yield
+    finally:
+        torch.load = real_load
+
+
+def _mapped_agent(DeepAgent, position, model_path, cache_dir=None):
+    """The repo's own DeepAgent, its network built on mmapped weights.
+
+    The checkpoint is loaded once, with torch.load(mmap=True), which reads
+    nothing up front.  The constructor then runs unchanged (whatever
+    layout the repo uses) on the meta device, so the network allocates no
+    weights of its own, and its torch.load of ``model_path`` is handed the
+    mapped state dict.  Finally the mapped tensors are assigned without a
+    copy to the agent's network: the torch Module attribute whose
+    parameter names all appear in the checkpoint.  Every process mapping
+    the file shares its page-cache pages read-only.  CPU only.
+    """
+    import warnings
+    import torch
+    mapped = torch.load(_mappable_checkpoint(model_path, cache_dir), map_location='cpu',
+                        mmap=True, weights_only=True)
+    with _loading_mapped(torch, model_path, mapped), torch.device('meta'), \
+            warnings.catch_warnings():
+        #load_state_dict到meta参数是空操作(会警告), 权重在下面assign
+        warnings.simplefilter('ignore', UserWarning)
+        agent = DeepAgent(position, model_path)
+    networks = [module for module in vars(agent).values()
+                if isinstance(module, torch.nn.Module)
+                and module.state_dict().keys() <= mapped.keys()]
+    if len(networks) != 1:
+        raise ValueError("%s: %d networks of %s match %s"
+                         % (position, len(networks), DeepAgent.__name__, model_path))
+    network = networks[0]
+    network.load_state_dict({k: mapped[k] for k in network.state_dict()}, assign=True)
+    #不在checkpoint里的张量(非持久buffer等)仍在meta上, 无法计算
+    tensors = list(network.named_parameters()) + list(network.named_buffers())
+    left = [name for name, tensor in tensors if tensor.is_meta]
+    left += [name for name, value in vars(agent).items()
+             if isinstance(value, torch.Tensor) and value.is_meta]
+    if left:
+        raise ValueError("%s: %s of %s not in %s"
+                         % (position, ", ".join(left), DeepAgent.__name__, model_path))
+    return agent
+
+
+def _load_agents(repo_name, DeepAgent, model_dir, shared_weights):
+    """position → DeepAgent for the three checkpoints in ``model_dir``."""
+    agents = {}
+    with _backend(repo_name).active():
+        for pos in POSITIONS:
+            model_path = os.path.join(model_dir, f'{pos}.ckpt')
+            if shared_weights:
+                agents[pos] = _mapped_agent(DeepAgent, pos, model_path)
+            else:
+                agents[pos] = DeepAgent(pos, model_path)
+    return agents
+
+
+def share_weights(enabled=True):
+    """Memory-map the checkpoints of adapters created from now on.
+
+    Call it in every worker process (tournament/arena --shared-weights
+    do so in the pool initializer).
+    """
+    DouZeroAdapter.shared_weights = enabled
+    AlphaDouAdapter.shared_weights = enabled
+
+
 # ============================================================
 #  Legal action generation (mirrors DouZero GameEnv logic)
 # ============================================================
 
-def _get_legal_actions(hand_cards_dz, rival_move, MovesGener, md, ms):
+def _get_legal_actions(hand_cards_dz, rival_move, MovesGener, md, ms,
+                       cache=None):
     """Generate legal DouZero actions given hand cards and rival move.
 
     Args:
         hand_cards_dz: sorted list of DouZero ints (current player's hand)
         rival_move: list of DouZero ints ([] = new round / pass)
         MovesGener, md, ms: loaded module references
+        cache: optional MoveCache, keyed by hand and normalized rival move
     Returns:
         list of lists (each inner list is a legal action in DouZero ints)
     """
-    mg = MovesGener(hand_cards_dz)
-
     rival_type = md.get_move_type(rival_move)
     rival_move_type = rival_type['type']
     rival_move_len = rival_type.get('len', 1)
+
+    if cache is not None:
+        key = ('dz', tuple(sorted(hand_cards_dz)), rival_move_type,
+               rival_move_len, rival_type.get('rank', 0))
+        cached = cache.get(key)
+        if cached is None:
+            moves = _gen_legal_actions(
+                hand_cards_dz, rival_move, rival_move_type, rival_move_len,
+                MovesGener, md, ms)
+            cached = cache.put(key, tuple(tuple(m) for m in moves))
+        # Callers may mutate the action lists
+        return [list(m) for m in cached]
+
+    return _gen_legal_actions(hand_cards_dz, rival_move, rival_move_type,
+                              rival_move_len, MovesGener, md, ms)
+
+
+def _gen_legal_actions(hand_cards_dz, rival_move, rival_move_type,
+                       rival_move_len, MovesGener, md, ms):
+    """Uncached body of _get_legal_actions."""
+    mg = MovesGener(hand_cards_dz)
     moves = list()
 
     if rival_move_type == md.TYPE_0_PASS:
@@ -185,6 +455,114 @@ def _get_player_id(position, dizhu_id):
         return ((dizhu_id + 1) % 3) + 1
 
 
+class _Prefix(Sequence):
+    """Read-only view of the first ``n`` items of a list that only grows.
+
+    Items are only ever appended to the list, so the view stays what it
+    was when handed out, without copying.  Slices are plain lists, like
+    a list's (get_obs slices and copies the action sequence).
+    """
+    __slots__ = ('_items', '_n')
+
+    def __init__(self, items):
+        self._items = items
+        self._n = len(items)
+
+    def __len__(self):
+        return self._n
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            items = self._items
+            return [items[k] for k in range(*i.indices(self._n))]
+        if i < 0:
+            i += self._n
+        if not 0 <= i < self._n:
+            raise IndexError('history index out of range')
+        return self._items[i]
+
+    def __iter__(self):
+        return islice(self._items, self._n)
+
+    def __eq__(self, other):
+        if not isinstance(other, (list, tuple, _Prefix)):
+            return NotImplemented
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    __hash__ = None
+
+    def copy(self):
+        return list(self)
+
+    def __repr__(self):
+        return '_Prefix(%r)' % (list(self),)
+
+
+class InfosetTracker:
+    """Play history of one game in DouZero form, built incrementally.
+
+    Kept on PlayRecords.infoset_tracker; every call to ``of`` only
+    converts the records added since the previous one, so a decision no
+    longer replays the whole game.  Both sequence formats are kept, since
+    DouZero and AlphaDou seats can share a game.  The sequences and
+    played_cards lists are only appended to, so InfoSets get _Prefix views
+    of them fixed at their current length, and a copy of last_move_dict;
+    the action lists inside are shared and never modified.
+    """
+
+    def __init__(self, dizhu_id):
+        self.dizhu_id = dizhu_id
+        # Number of records already converted
+        self.seen = 0
+        self.douzero_seq = []           # [action, ...]
+        self.alphadou_seq = []          # [(position, action), ...]
+        self.played_cards = {'landlord': [], 'landlord_down': [], 'landlord_up': []}
+        self.last_move_dict = {'landlord': [], 'landlord_down': [], 'landlord_up': []}
+        self.bomb_num = 0
+        self.last_pid = 'landlord'
+
+    @classmethod
+    def of(cls, playrecords):
+        """The game's tracker, brought up to date with its records."""
+        tracker = playrecords.infoset_tracker
+        if tracker is None or tracker.dizhu_id != playrecords.dizhu_id:
+            tracker = playrecords.infoset_tracker = cls(playrecords.dizhu_id)
+        tracker.update(playrecords.records)
+        return tracker
+
+    def update(self, records):
+        for i in range(self.seen, len(records)):
+            rec_pid, rec_move = records[i][0], records[i][1]
+            rec_pos = _get_position(rec_pid, self.dizhu_id)
+            if isinstance(rec_move, str):  # "yaobuqi" / "buyao" → pass
+                dz_action = []
+            else:
+                dz_action = _cards_to_dz(rec_move)
+            self.douzero_seq.append(dz_action)
+            self.alphadou_seq.append((rec_pos, dz_action))
+            if dz_action:
+                self.played_cards[rec_pos] += dz_action
+                self.last_move_dict[rec_pos] = dz_action.copy()
+                if dz_action in _BOMBS:
+                    self.bomb_num += 1
+                self.last_pid = rec_pos
+        self.seen = len(records)
+
+    def last_move(self):
+        """Most recent non-pass move among the last two actions."""
+        seq = self.douzero_seq
+        if not seq:
+            return []
+        if seq[-1]:
+            return seq[-1]
+        return seq[-2] if len(seq) >= 2 else []
+
+    def last_two_moves(self):
+        """[last action, the one before], padded with []."""
+        seq = self.douzero_seq
+        return [seq[-1] if seq else [], seq[-2] if len(seq) >= 2 else []]
+
+
 def _build_infoset(player, playrecords, position, dizhu_id, for_alphadou):
     """Build a DouZero-compatible InfoSet from our game state.
 
@@ -223,63 +601,25 @@ def _build_infoset(player, playrecords, position, dizhu_id, for_alphadou):
             infoset.other_hand_cards += infoset.all_handcards[pos]
     infoset.other_hand_cards.sort()
 
-    # Build play history from records
-    action_seq = []
-    played_cards = {'landlord': [], 'landlord_down': [], 'landlord_up': []}
-    last_move_dict = {'landlord': [], 'landlord_down': [], 'landlord_up': []}
-    bomb_num = 0
-
-    for record in playrecords.records:
-        rec_pid = record[0]
-        rec_move = record[1]
-        rec_pos = _get_position(rec_pid, dizhu_id)
-
-        if isinstance(rec_move, str):  # "yaobuqi" / "buyao" → pass
-            dz_action = []
-        else:
-            dz_action = _cards_to_dz(rec_move)
-
-        # Format differs: DouZero uses [action], AlphaDou uses (pos, action)
-        if for_alphadou:
-            action_seq.append((rec_pos, dz_action))
-        else:
-            action_seq.append(dz_action)
-
-        if dz_action:
-            played_cards[rec_pos] += dz_action
-            last_move_dict[rec_pos] = dz_action.copy()
-            if dz_action in _BOMBS:
-                bomb_num += 1
-
-    infoset.card_play_action_seq = action_seq
-    infoset.played_cards = played_cards
-    infoset.last_move_dict = last_move_dict
-    infoset.bomb_num = bomb_num
+    # Play history, kept up to date incrementally per game.  The tracker's
+    # lists only grow, so fixed-length views of them keep the InfoSet as
+    # it is now at O(1) cost; last_move_dict has its 3 entries replaced
+    tracker = InfosetTracker.of(playrecords)
+    infoset.card_play_action_seq = _Prefix(tracker.alphadou_seq if for_alphadou
+                                           else tracker.douzero_seq)
+    infoset.played_cards = {pos: _Prefix(cards)
+                            for pos, cards in tracker.played_cards.items()}
+    infoset.last_move_dict = dict(tracker.last_move_dict)
+    infoset.bomb_num = tracker.bomb_num
 
     # last_move: most recent non-pass move
-    infoset.last_move = []
-    if action_seq:
-        if for_alphadou:
-            last_act = action_seq[-1][1]
-            prev_act = action_seq[-2][1] if len(action_seq) >= 2 else []
-        else:
-            last_act = action_seq[-1]
-            prev_act = action_seq[-2] if len(action_seq) >= 2 else []
-        infoset.last_move = prev_act if len(last_act) == 0 else last_act
+    infoset.last_move = tracker.last_move()
 
     # last_two_moves
-    infoset.last_two_moves = [[], []]
-    for entry in action_seq[-2:]:
-        act = entry[1] if for_alphadou else entry
-        infoset.last_two_moves.insert(0, act)
-        infoset.last_two_moves = infoset.last_two_moves[:2]
+    infoset.last_two_moves = tracker.last_two_moves()
 
     # last_pid: position of last player who made a non-pass move
-    infoset.last_pid = 'landlord'
-    for record in reversed(playrecords.records):
-        if not isinstance(record[1], str):
-            infoset.last_pid = _get_position(record[0], dizhu_id)
-            break
+    infoset.last_pid = tracker.last_pid
 
     # AlphaDou-specific fields (needed by env_res.py _get_obs_resnet)
     if for_alphadou:
@@ -295,6 +635,48 @@ def _build_infoset(player, playrecords, position, dizhu_id, for_alphadou):
 #  Convert DouZero action back to our format
 # ============================================================
 
+class _LegalMoves(object):
+    """DouZero legal actions seen as unbound rank Moves (pass left out).
+
+    Lets Player record the NN's legal moves (PlayRecords level "full")
+    without running its own move generator as well.  The actions are only
+    classified when the list is first read (WebShow reads the last list of
+    each seat), not on every recorded turn.
+    """
+    __slots__ = ("_actions", "_md", "_backend", "_moves")
+
+    def __init__(self, actions, md, backend):
+        self._actions = actions
+        self._md = md
+        self._backend = backend
+        self._moves = None
+
+    def _convert(self):
+        if self._moves is None:
+            md = self._md
+            moves = []
+            with self._backend.active():
+                for action in self._actions:
+                    if not action:
+                        continue
+                    move_type = _DZ_TYPE_TO_OURS.get(md.get_move_type(action)['type'], 'dan')
+                    packed = sum(UNIT[DZ_TO_RANK[c]] for c in action)
+                    moves.append(MOVES[TYPE_CODES[move_type]][packed])
+            self._moves = moves
+        return self._moves
+
+    def __len__(self):
+        if self._moves is None:
+            return sum(1 for action in self._actions if action)
+        return len(self._moves)
+
+    def __getitem__(self, i):
+        return self._convert()[i]
+
+    def __iter__(self):
+        return iter(self._convert())
+
+
 def _convert_action(action, player, md):
     """Convert a DouZero action to (move_type_str, [Card])."""
     if len(action) == 0:
@@ -306,27 +688,74 @@ def _convert_action(action, player, md):
     return move_type, cards
 
 
+# ============================================================
+#  Batched action selection (see inference.py)
+# ============================================================
+
+def _batched_act(agent, get_obs, infosets):
+    """DeepAgent.act for several infosets of one position in one forward pass.
+
+    Each infoset contributes one row per legal action (get_obs's z_batch /
+    x_batch); the rows are concatenated, scored together and split back
+    to pick the best action of every infoset.
+    """
+    import torch
+
+    actions = [None] * len(infosets)
+    pending = []
+    for i, infoset in enumerate(infosets):
+        if len(infoset.legal_actions) == 1:
+            actions[i] = infoset.legal_actions[0]
+        else:
+            pending.append(i)
+    if not pending:
+        return actions
+
+    obs = [get_obs(infosets[i]) for i in pending]
+    device = next(agent.model.parameters()).device
+    z_batch = torch.from_numpy(np.concatenate([o['z_batch'] for o in obs])).float().to(device)
+    x_batch = torch.from_numpy(np.concatenate([o['x_batch'] for o in obs])).float().to(device)
+    with torch.no_grad():
+        values = agent.model.forward(z_batch, x_batch, return_value=True)['values']
+    values = values.detach().cpu().numpy().reshape(-1)
+
+    start = 0
+    for i, o in zip(pending, obs):
+        n = len(o['x_batch'])
+        actions[i] = infosets[i].legal_actions[int(np.argmax(values[start:start + n]))]
+        start += n
+    return actions
+
+
 # ============================================================
 #  DouZero Adapter
 # ============================================================
 
 class DouZeroAdapter:
     _instance = None
+    # Memory-map checkpoint weights (see share_weights)
+    shared_weights = False
+    # act_batch scores several infosets in one forward pass (inference.py)
+    batched = True
 
-    def __init__(self, model_dir=None):
+    def __init__(self, model_dir=None, shared_weights=None):
         if model_dir is None:
             model_dir = os.path.join(
                 BASE_DIR, 'DouZero', 'baselines', 'douzero_ADP')
 
         DeepAgent, MovesGener, md, ms = _load_repo_modules('DouZero')
+        self._backend = _backend('DouZero')
+        self._get_obs = self._backend.import_module('env.env').get_obs
         self._MovesGener = MovesGener
         self._md = md
         self._ms = ms
 
-        self._agents = {}
-        for pos in ['landlord', 'landlord_up', 'landlord_down']:
-            model_path = os.path.join(model_dir, f'{pos}.ckpt')
-            self._agents[pos] = DeepAgent(pos, model_path)
+        if shared_weights is None:
+            shared_weights = self.shared_weights
+        self._agents = _load_agents('DouZero', DeepAgent, model_dir, shared_weights)
+
+        # Optional inference.InferenceBroker shared by concurrent games
+        self.broker = None
 
     @classmethod
     def instance(cls):
@@ -334,14 +763,20 @@ class DouZeroAdapter:
             cls._instance = cls()
         return cls._instance
 
+    @_in_backend
     def choose(self, next_move_types, next_moves, last_move_type,
                player, playrecords):
         dizhu_id = playrecords.dizhu_id
         position = _get_position(player.player_id, dizhu_id)
+        probes = getattr(player, 'probes', None)
+        if probes is not None:
+            t = probes.start()
 
         # Build InfoSet
         infoset = _build_infoset(
             player, playrecords, position, dizhu_id, for_alphadou=False)
+        if probes is not None:
+            t = probes.lap("choose.infoset", t)
 
         # Determine rival move for legal action generation
         if last_move_type == "start":
@@ -352,15 +787,31 @@ class DouZeroAdapter:
         # Generate legal actions via DouZero's MovesGener
         infoset.legal_actions = _get_legal_actions(
             infoset.player_hand_cards, rival_move,
-            self._MovesGener, self._md, self._ms)
+            self._MovesGener, self._md, self._ms,
+            cache=getattr(player, 'move_cache', None))
+        if probes is not None:
+            t = probes.lap("choose.legal", t)
+        if playrecords.level == "full":
+            player.next_moves = _LegalMoves(infoset.legal_actions, self._md, self._backend)
 
         if not infoset.legal_actions:
             return "yaobuqi", []
 
-        # Run the neural network agent
-        action = self._agents[position].act(infoset)
+        # Run the neural network agent (batched across games if brokered)
+        if self.broker is not None:
+            action = self.broker.act(position, infoset)
+        else:
+            action = self._agents[position].act(infoset)
+        if probes is not None:
+            probes.lap("choose.inference", t)
         return _convert_action(action, player, self._md)
 
+    @_in_backend
+    def act_batch(self, position, infosets):
+        """Actions for several infosets of ``position``, one forward pass."""
+        return _batched_act(self._agents[position], self._get_obs, infosets)
+
+    @_in_backend
     def suggest(self, infoset):
         """Get AI action from a pre-built InfoSet (used by assistant/MCP).
 
@@ -384,21 +835,25 @@ class DouZeroAdapter:
 
 class AlphaDouAdapter:
     _instance = None
+    # Memory-map checkpoint weights (see share_weights)
+    shared_weights = False
+    # No batched forward pass, so no inference broker (see act_batch)
+    batched = False
 
-    def __init__(self, model_dir=None):
+    def __init__(self, model_dir=None, shared_weights=None):
         if model_dir is None:
             model_dir = os.path.join(
                 BASE_DIR, 'AlphaDou', 'baseline', 'best')
 
         DeepAgent, MovesGener, md, ms = _load_repo_modules('AlphaDou')
+        self._backend = _backend('AlphaDou')
         self._MovesGener = MovesGener
         self._md = md
         self._ms = ms
 
-        self._agents = {}
-        for pos in ['landlord', 'landlord_up', 'landlord_down']:
-            model_path = os.path.join(model_dir, f'{pos}.ckpt')
-            self._agents[pos] = DeepAgent(pos, model_path)
+        if shared_weights is None:
+            shared_weights = self.shared_weights
+        self._agents = _load_agents('AlphaDou', DeepAgent, model_dir, shared_weights)
 
     @classmethod
     def instance(cls):
@@ -406,14 +861,20 @@ class AlphaDouAdapter:
             cls._instance = cls()
         return cls._instance
 
+    @_in_backend
     def choose(self, next_move_types, next_moves, last_move_type,
                player, playrecords):
         dizhu_id = playrecords.dizhu_id
         position = _get_position(player.player_id, dizhu_id)
+        probes = getattr(player, 'probes', None)
+        if probes is not None:
+            t = probes.start()
 
         # Build InfoSet (AlphaDou uses (position, action) tuples in seq)
         infoset = _build_infoset(
             player, playrecords, position, dizhu_id, for_alphadou=True)
+        if probes is not None:
+            t = probes.lap("choose.infoset", t)
 
         if last_move_type == "start":
             rival_move = []
@@ -422,14 +883,34 @@ class AlphaDouAdapter:
 
         infoset.legal_actions = _get_legal_actions(
             infoset.player_hand_cards, rival_move,
-            self._MovesGener, self._md, self._ms)
+            self._MovesGener, self._md, self._ms,
+            cache=getattr(player, 'move_cache', None))
+        if probes is not None:
+            t = probes.lap("choose.legal", t)
+        if playrecords.level == "full":
+            player.next_moves = _LegalMoves(infoset.legal_actions, self._md, self._backend)
 
         if not infoset.legal_actions:
             return "yaobuqi", []
 
+        # Not brokered, one forward pass per decision (see act_batch)
         action = self._agents[position].act(infoset)
+        if probes is not None:
+            probes.lap("choose.inference", t)
         return _convert_action(action, player, self._md)
 
+    def act_batch(self, position, infosets):
+        """Not supported: AlphaDou decisions are not batched across games.
+
+        AlphaDou's DeepAgent builds its observation and combines its output
+        heads inside act(); scoring several infosets in one forward pass
+        would mean re-implementing that against a repo that is not part of
+        this tree.  AlphaDou games run with batch size 1
+        (inference.py --no-broker).
+        """
+        raise NotImplementedError("AlphaDou has no batched forward pass")
+
+    @_in_backend
     def suggest(self, infoset):
         """Get AI action from a pre-built InfoSet (used by MCP server).
 
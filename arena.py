@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+Duplicate-deal arena: compare two models on identical deals.
+
+Usage:
+    python arena.py --a douzero --b alphadou [--deals N] [--workers W]
+                    [--engine E] [--seed S] [--confidence C]
+                    [--sprt D [--delta X] [--alpha A] [--beta B]] [--shared-weights]
+                    [--pimc-workers N] [--pimc-budget SECONDS]
+
+Every deal (seeded with game_rng(seed, k), so the cards and the dizhu seat
+are the same) is played twice: once with A as dizhu against B as both
+nongmin, once with the roles swapped.  Deal luck then cancels in the
+per-deal difference
+
+    d_k = [A wins as dizhu] - [B wins as dizhu]
+
+which is also A's win rate minus B's over the two games of the deal.  Its
+mean and a normal confidence interval are reported, next to the interval
+the same number of independent games would give.
+
+With ``--sprt D`` the mean of d_k is tested against D (0: is A better than
+B at all?) with the normal SPRT of sequential.py after every deal, and the
+run stops once it is decided; ``--deals`` is then the upper limit.
+"""
+
+import argparse
+import os
+from statistics import NormalDist
+
+from myclass import Player
+from myutil import game_rng
+from sequential import SequentialTest
+from tournament import add_pimc_options, iter_pool, pimc_settings, play_game
+
+
+def play_deal(model_a, model_b, engine, seed, index):
+    """Both seatings of deal ``index``; returns the paired result."""
+    a = play_game({"dizhu": model_a, "nongmin": model_b}, engine, game_rng(seed, index))
+    b = play_game({"dizhu": model_b, "nongmin": model_a}, engine, game_rng(seed, index))
+    return {
+        'deal': index,
+        'a_dizhu_win': a['dizhu_win'],
+        'b_dizhu_win': b['dizhu_win'],
+        'turns': a['turns'] + b['turns'],
+        'cpu_seconds': a['cpu_seconds'] + b['cpu_seconds'],
+    }
+
+
+class PairedStats(object):
+    """Online paired statistics over deals."""
+    def __init__(self, confidence=0.95):
+        self.z = NormalDist().inv_cdf(0.5 + confidence / 2)
+        self.confidence = confidence
+        self.deals = 0
+        self.a_wins = 0
+        self.b_wins = 0
+        #d_k的和与平方和
+        self.diff_sum = 0
+        self.diff_sq = 0
+        self.cpu_seconds = 0.0
+
+    def add(self, result):
+        a, b = int(result['a_dizhu_win']), int(result['b_dizhu_win'])
+        self.deals += 1
+        self.a_wins += a
+        self.b_wins += b
+        self.diff_sum += a - b
+        self.diff_sq += (a - b) ** 2
+        self.cpu_seconds += result['cpu_seconds']
+
+    @property
+    def mean(self):
+        """A's win rate minus B's (equal to the dizhu win-rate difference)."""
+        return self.diff_sum / self.deals if self.deals else 0.0
+
+    def half_width(self):
+        """Confidence half-width of the paired mean."""
+        n = self.deals
+        if n < 2:
+            return float('inf')
+        var = (self.diff_sq - n * self.mean ** 2) / (n - 1)
+        return self.z * (var / n) ** 0.5
+
+    def unpaired_half_width(self):
+        """Half-width if the two seatings came from independent deals."""
+        n = self.deals
+        if n < 2:
+            return float('inf')
+        pa, pb = self.a_wins / n, self.b_wins / n
+        var = (pa * (1 - pa) + pb * (1 - pb)) * n / (n - 1)
+        return self.z * (var / n) ** 0.5
+
+    def show(self, name_a="A", name_b="B"):
+        n = max(self.deals, 1)
+        hw, uhw = self.half_width(), self.unpaired_half_width()
+        print(f"Deals: {self.deals} ({2 * self.deals} games)")
+        print(f"{name_a} as dizhu: {self.a_wins/n*100:.1f}%   "
+              f"{name_b} as dizhu: {self.b_wins/n*100:.1f}%")
+        print(f"{name_a} win rate: {(1 + self.mean)/2*100:.1f}% over both seats")
+        print(f"{name_a} - {name_b}: {self.mean*100:+.2f}% "
+              f"± {hw*100:.2f}% ({self.confidence:.0%} CI, paired)")
+        print(f"Unpaired CI would be ± {uhw*100:.2f}%; "
+              f"variance x{(uhw / hw) ** 2 if hw else float('inf'):.2f} smaller")
+        print(f"CPU in games: {self.cpu_seconds:.2f}s")
+
+
+def iter_deals(n_deals, model_a, model_b, workers=None, seed=0, engine="cards",
+               shared_weights=False, pimc=None):
+    """Yield paired deal results as they finish (see tournament.iter_pool)."""
+    return iter_pool(play_deal, range(n_deals), (model_a, model_b, engine, seed),
+                     workers, shared_weights, pimc)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--a", default="douzero", help="first model")
+    parser.add_argument("--b", default="alphadou", help="second model")
+    parser.add_argument("--deals", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--engine", default="cards", choices=sorted(Player.ENGINES))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--confidence", type=float, default=0.95)
+    parser.add_argument("--sprt", type=float, metavar="D",
+                        help="stop once A - B is decided above/below D")
+    parser.add_argument("--delta", type=float, default=0.04, help="SPRT indifference zone")
+    parser.add_argument("--alpha", type=float, default=0.05)
+    parser.add_argument("--beta", type=float, default=0.05)
+    parser.add_argument("--report-every", type=int, default=100)
+    parser.add_argument("--shared-weights", action="store_true",
+                        help="memory-map the NN checkpoints, shared by all workers")
+    add_pimc_options(parser)
+    args = parser.parse_args()
+    pimc = pimc_settings(parser, args)
+
+    stats = PairedStats(args.confidence)
+    test = None
+    if args.sprt is not None:
+        test = SequentialTest(args.sprt, args.delta, args.alpha, args.beta,
+                              args.confidence, model="normal", unit="deals")
+    for result in iter_deals(args.deals, args.a, args.b, args.workers, args.seed, args.engine,
+                             args.shared_weights, pimc):
+        stats.add(result)
+        if test is not None:
+            decision = test.add(int(result['a_dizhu_win']) - int(result['b_dizhu_win']))
+            if stats.deals % args.report_every == 0 or decision is not None:
+                print(test.status())
+            if decision is not None:
+                break
+    stats.show(args.a, args.b)
+    if test is not None:
+        test.show(f"{args.a} - {args.b}")
@@ -6,7 +6,7 @@ Used by Claude Code to interact with AlphaDou AI via Bash.
 Usage:
     python assistant.py new     <position> <hand> <dizhu_cards>
     python assistant.py move    <cards>
-    python assistant.py suggest
+    python assistant.py suggest [pimc]
     python assistant.py status
     python assistant.py undo
 
@@ -15,6 +15,7 @@ Examples:
     python assistant.py move "3 3 3 4"
     python assistant.py move pass
     python assistant.py suggest
+    python assistant.py suggest pimc
     python assistant.py undo
 """
 
@@ -100,7 +101,7 @@ def cmd_move(args):
     print(gs.status_text())
 
 
-def cmd_suggest(_args):
+def cmd_suggest(args):
     gs = load_state()
     if gs is None:
         print("还没开始游戏，先用 new 命令")
@@ -108,6 +109,17 @@ def cmd_suggest(_args):
     if gs.current_turn != gs.my_position:
         print(f"现在轮到{POSITION_CN[gs.current_turn]}，还没到你")
         sys.exit(1)
+    # pimc: 按已知信息采样对手手牌, 多进程模拟每个候选出牌
+    if args and args[0] == 'pimc':
+        from pimc import PIMC
+        pimc = PIMC.configure(workers=os.cpu_count())
+        action = pimc.suggest(gs)
+        stats = pimc.stats()
+        pimc.close()
+        print(f"AI建议(pimc): {format_cards(action)}")
+        print(f"  {stats['last_rollouts']} rollouts, {stats['last_ms']:.0f}ms, "
+              f"{stats['rollouts_per_second']:.0f} rollouts/s")
+        return
     from ai_adapter import AlphaDouAdapter
     adapter = AlphaDouAdapter.instance()
     infoset = gs.build_infoset()
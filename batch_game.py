@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+"""
+Lock-step batched engine: N random-policy games on NumPy arrays.
+
+Usage:
+    python batch_game.py [--games N] [--batch B] [--seed S]
+
+Every game is a row: three 15-slot rank-count hands (plus their packed form
+for the guard-bit ``fits`` test), the seat to act, the dizhu seat, and the
+last move as (index_key bucket, main rank).  One ``step`` advances every
+live game by one turn:
+
+1. per game, the catalogue segments (rows sharing type, length and main
+   rank, i.e. one move body) that answer the rival and whose body fits;
+2. the rows of those segments, expanded into (game, row) pairs and tested
+   against the hand;
+3. one uniform draw per game over its legal rows plus "buyao" (not when
+   leading), the same distribution as choose_random.
+
+The rules are Game's: 17 cards each, 3 底牌 to a random dizhu who leads,
+a lead after two passes in a row, and the first empty hand wins.  Finished
+games are retired and their rows refilled with new deals until the
+requested number of games has been dealt.
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from rank_moves import GUARD, index_key, MoveType
+from move_catalogue import MoveCatalogue
+from myclass import CARD_TABLE
+
+# Card.rank - 1 of every CARD_TABLE index
+CARD_RANKS = np.array([card.rank - 1 for card in CARD_TABLE], dtype=np.int64)
+# Card position → seat for the 51 dealt cards (the last 3 go to the dizhu)
+DEAL_SEATS = np.repeat(np.arange(3), 17)
+
+
+def _fits(hand, move):
+    guard = np.uint64(GUARD)
+    return ((hand | guard) - move) & guard == guard
+
+
+class BatchedGames(object):
+    """
+    批量对局: 每行一局, 所有对局同步出牌(random模型)
+    """
+    def __init__(self, batch, seed=None, catalogue=None):
+        self.batch = batch
+        self.rng = np.random.default_rng(seed)
+        catalogue = catalogue or MoveCatalogue.instance()
+
+        #出牌表: 每行的压缩计数, 计数, 张数, 主牌, 桶编号
+        self.move_packed = catalogue.packed
+        self.move_counts = catalogue.counts.astype(np.int8)
+        self.move_lengths = catalogue.lengths.astype(np.int64)
+        self.move_mains = catalogue.mains.astype(np.int64)
+        keys = sorted(catalogue.buckets, key=lambda key: catalogue.buckets[key])
+        self.move_keys = np.empty(len(catalogue), dtype=np.int64)
+        for key_id, key in enumerate(keys):
+            lo, hi = catalogue.buckets[key]
+            self.move_keys[lo:hi] = key_id
+        self.bomb_key = keys.index(index_key(MoveType.bomb, 0))
+
+        #分段: (牌型, 张数, 主牌)相同的连续行, 主体相同只差带牌
+        shape = np.stack([catalogue.types, catalogue.lengths, catalogue.mains], axis=1)
+        starts = np.flatnonzero(np.any(shape[1:] != shape[:-1], axis=1)) + 1
+        self.seg_lo = np.concatenate([[0], starts])
+        self.seg_hi = np.concatenate([starts, [len(catalogue)]])
+        self.seg_keys = self.move_keys[self.seg_lo]
+        self.seg_mains = self.move_mains[self.seg_lo]
+        self.seg_bomb = self.seg_keys == self.bomb_key
+        #段内所有出牌共有的部分(逐点数取最小), 放不下主体就不用展开
+        body = np.minimum.reduceat(catalogue.counts, self.seg_lo, axis=0)
+        shifts = np.arange(body.shape[1], dtype=np.uint64) * np.uint64(4)
+        self.seg_body = (body.astype(np.uint64) << shifts).sum(axis=1, dtype=np.uint64)
+
+        #对局状态
+        n = batch
+        self.counts = np.zeros((n, 3, 15), dtype=np.int8)
+        self.packed = np.zeros((n, 3), dtype=np.uint64)
+        self.left = np.zeros((n, 3), dtype=np.int64)
+        self.dizhu = np.zeros(n, dtype=np.int64)
+        self.cur = np.zeros(n, dtype=np.int64)
+        self.lead = np.ones(n, dtype=bool)
+        self.last_key = np.full(n, -1, dtype=np.int64)
+        self.last_main = np.zeros(n, dtype=np.int64)
+        self.passes = np.zeros(n, dtype=np.int64)
+        self.turns = np.zeros(n, dtype=np.int64)
+        self.active = np.zeros(n, dtype=bool)
+
+        #发牌计数与结果
+        self.dealt = 0
+        self.target = 0
+        self.results = []
+
+    #给指定行发新牌
+    def deal(self, rows):
+        k = len(rows)
+        if k == 0:
+            return
+        order = self.rng.permuted(np.tile(np.arange(len(CARD_RANKS)), (k, 1)), axis=1)
+        dizhu = self.rng.integers(0, 3, k)
+        seats = np.empty((k, len(CARD_RANKS)), dtype=np.int64)
+        seats[:, :51] = DEAL_SEATS
+        seats[:, 51:] = dizhu[:, None]
+        flat = (np.arange(k)[:, None] * 3 + seats) * 15 + CARD_RANKS[order]
+        counts = np.bincount(flat.ravel(), minlength=k * 45).reshape(k, 3, 15)
+        self.place(rows, counts, dizhu)
+
+    def place(self, rows, counts, dizhu):
+        """Start games in ``rows`` from given hands.
+
+        ``counts`` is (len(rows), 3, 15) rank counts per seat, the dizhu's
+        including the 底牌; ``dizhu`` the dizhu seat of each game, who leads.
+        """
+        k = len(rows)
+        counts = np.asarray(counts)
+        shifts = np.arange(15, dtype=np.uint64) * np.uint64(4)
+
+        self.counts[rows] = counts
+        self.packed[rows] = (counts.astype(np.uint64) << shifts).sum(axis=2, dtype=np.uint64)
+        self.left[rows] = counts.sum(axis=2)
+        self.dizhu[rows] = dizhu
+        self.cur[rows] = dizhu
+        self.lead[rows] = True
+        self.last_key[rows] = -1
+        self.last_main[rows] = 0
+        self.passes[rows] = 0
+        self.turns[rows] = 0
+        self.active[rows] = True
+        self.dealt += k
+
+    def legal_moves(self, games):
+        """(game, row) pairs of legal catalogue rows, grouped by game.
+
+        ``games`` are row indices of this batch; the returned game column
+        indexes into ``games``.
+        """
+        hand = self.packed[games, self.cur[games]]
+        lead = self.lead[games][:, None]
+        allowed = lead | (self.seg_bomb[None, :] & (self.last_key[games] != self.bomb_key)[:, None])
+        allowed |= ((self.seg_keys[None, :] == self.last_key[games][:, None]) &
+                    (self.seg_mains[None, :] > self.last_main[games][:, None]))
+        allowed &= _fits(hand[:, None], self.seg_body[None, :])
+        game, seg = np.nonzero(allowed)
+
+        #展开各段的行
+        sizes = self.seg_hi[seg] - self.seg_lo[seg]
+        offsets = np.cumsum(sizes) - sizes
+        game = np.repeat(game, sizes)
+        row = np.arange(sizes.sum()) + np.repeat(self.seg_lo[seg] - offsets, sizes)
+        ok = _fits(hand[game], self.move_packed[row])
+        return game[ok], row[ok]
+
+    def step(self):
+        """Advance every live game by one turn; return the number of live games."""
+        games = np.flatnonzero(self.active)
+        if len(games) == 0:
+            return 0
+        game, row = self.legal_moves(games)
+        n_legal = np.bincount(game, minlength=len(games))
+
+        #均匀随机: 可出的牌 + 不要(首出不能不要), 要不起只能不要
+        options = n_legal + ~self.lead[games]
+        r = (self.rng.random(len(games)) * options).astype(np.int64)
+        play = r < n_legal
+        chosen = row[(np.cumsum(n_legal) - n_legal + r)[play]]
+
+        #出牌
+        g = games[play]
+        seat = self.cur[g]
+        self.counts[g, seat] -= self.move_counts[chosen]
+        self.packed[g, seat] -= self.move_packed[chosen]
+        self.left[g, seat] -= self.move_lengths[chosen]
+        self.last_key[g] = self.move_keys[chosen]
+        self.last_main[g] = self.move_mains[chosen]
+        self.lead[g] = False
+        self.passes[g] = 0
+
+        #不要/要不起, 两家都不要则重新首出
+        p = games[~play]
+        self.passes[p] += 1
+        reset = p[self.passes[p] == 2]
+        self.lead[reset] = True
+        self.passes[reset] = 0
+        self.last_key[reset] = -1
+
+        self.turns[games] += 1
+        self.cur[games] = (self.cur[games] + 1) % 3
+        won = self.left[g, seat] == 0
+        if won.any():
+            self.finish(g[won], seat[won])
+        return len(games)
+
+    #记录结果, 补发新牌
+    def finish(self, rows, winners):
+        self.results.append(np.stack([self.dizhu[rows] + 1, winners + 1, self.turns[rows]], axis=1))
+        self.active[rows] = False
+        refill = rows[:max(0, self.target - self.dealt)]
+        self.deal(refill)
+
+    def run(self, n_games):
+        """Play ``n_games`` games; return an (n_games, 3) array of
+        (dizhu_id, winner, turns), ids 1..3 as in PlayRecords."""
+        self.target = self.dealt + n_games
+        self.deal(np.flatnonzero(~self.active)[:n_games])
+        while self.step():
+            pass
+        results = np.concatenate(self.results) if self.results else np.zeros((0, 3), dtype=np.int64)
+        self.results = []
+        return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--games", type=int, default=10000)
+    parser.add_argument("--batch", type=int, default=1024)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    begin = time.time()
+    results = BatchedGames(args.batch, args.seed).run(args.games)
+    total_games = len(results)
+    dizhu_wins = int((results[:, 0] == results[:, 1]).sum())
+    nongmin_wins = total_games - dizhu_wins
+    print(f"Total games: {total_games}")
+    print(f"Dizhu wins: {dizhu_wins} ({dizhu_wins/total_games*100:.1f}%)")
+    print(f"Nongmin wins: {nongmin_wins} ({nongmin_wins/total_games*100:.1f}%)")
+    print(f"Turns/game: {results[:, 2].mean():.1f}")
+    print(f"Time: {time.time()-begin:.2f}s, {total_games/(time.time()-begin):.0f} games/s")
@@ -0,0 +1,474 @@
+# -*- coding: utf-8 -*-
+"""
+Move generation benchmark: Moves vs RankMoves vs the precomputed catalogue.
+
+Usage:
+    python benchmark.py [--hands N] [--seed S] [--repeat R]
+                        [--baseline FILE] [--save-baseline] [--tolerance T]
+
+The corpus is fixed-seed random hands plus hand-built worst cases (many
+triples, several bombs, long straights, 20-card dizhu hands), each answered
+as a free lead and against the smallest move of every type.  Every engine
+answers the same (hand, rival move) pairs with get_moves + get_next_moves;
+the move totals must agree.
+
+The [answer/*] sections time get_next_moves alone on engines built
+beforehand, as in a game where the hand persists across turns: rivals come
+as Card lists to Moves and as Moves to the other engines, which is what
+Player hands them.  "scan" is RankMoves answering by a linear scan of the
+rival's family instead of the MoveIndex bisect.
+
+For each engine and each rival last_move_type, and for each move family
+(expanded alone with the rank engine's lazy family blocks), it reports:
+
+    moves       moves generated
+    ns/hand     best of --repeat timed samples
+    x cards     ns/hand over the cards engine's ns/hand on the whole corpus,
+                measured in the same run
+    retained    tracemalloc blocks still held by the results, per hand
+    peak        tracemalloc peak of one untimed run, in KiB
+
+The [timing] section is what timing is gated on: each engine's time over
+the whole corpus (and, for answer/*, over all answers) divided by the
+cards engine's, both sampled alternately, best of --repeat, with the
+garbage collector off.  On a busy single-core machine the whole-corpus
+ratios measured this way moved by up to 20% between runs and the
+answer-only ones (a few microseconds per answer) by up to 50%, so
+--time-tolerance defaults to 100%: the gate fails when an engine gets
+twice as slow relative to cards.  The per-row "x cards" figures above
+drift by 2x as machine load changes during a run; they are reported only.
+
+--save-baseline stores the numbers in --baseline (benchmark_baseline.json
+next to this file by default, committed).  Otherwise the run is checked
+against it and exits with status 1 if
+
+- the engines disagree on a move count (also checked, and fatal, before
+  saving a baseline),
+- a move count changed from the baseline,
+- retained or peak grew by more than --tolerance, or
+- an engine's [timing] ratio grew by more than --time-tolerance.
+
+A missing baseline is an error (status 2): save one with --save-baseline.
+"""
+
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+from itertools import combinations
+
+from myclass import Cards, Moves
+from rank_moves import (
+    BOMB, CHAIN_CODES, MOVE_CODES, MOVE_TYPES, MOVES, TYPE_CODES, Move, RankMoves,
+    counts_to_cards, describe, family_blocks, hand_counts,
+)
+from move_catalogue import CatalogueMoves, MoveCatalogue, FULL_DECK
+
+class ScanMoves(RankMoves):
+    """RankMoves answering a rival move by a linear scan of its family.
+
+    The reference the MoveIndex bisect is measured against.
+    """
+    def get_moves(self, cards_left):
+        super().get_moves(cards_left)
+        self.families = {code: self.index.family(code) for code in MOVE_CODES}
+
+    def get_next_moves(self, last_move_type, last_move):
+        if last_move_type == "start":
+            return super().get_next_moves(last_move_type, last_move)
+        code = TYPE_CODES[last_move_type]
+        last_rank, last_len = describe(last_move)
+        chain = code in CHAIN_CODES
+        self.next_moves = [move for move in self.families[code]
+                           if move.rank > last_rank and (not chain or move.length == last_len)]
+        if code != BOMB:
+            self.next_moves = self.next_moves + self.families[BOMB]
+        return self.next_moves_type, self.next_moves
+
+
+ENGINES = [("cards", Moves), ("rank", RankMoves), ("catalogue", CatalogueMoves)]
+ANSWER_ENGINES = ENGINES + [("scan", ScanMoves)]
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_FILE = os.path.join(BASE_DIR, 'benchmark_baseline.json')
+
+# Worst cases as Card names (see CARD_TYPES: '1' is A, '2' is 2, 14/15 jokers)
+ADVERSARIAL_HANDS = {
+    # Six triples in a row: feiji with every wing combination
+    "triples": "3 3 3 4 4 4 5 5 5 6 6 6 7 7 7 8 8 8 9 10",
+    # Four bombs: si_dai_er / si_dai_er_dui kickers and bomb answers
+    "bombs": "3 3 3 3 4 4 4 4 5 5 5 5 6 6 6 6 7 8 9 10",
+    # 3..A straight plus pairs: every shunzi and liandui length
+    "straights": "3 4 5 6 7 8 9 10 11 12 13 1 3 4 5 6 7 8 9 10",
+    # Ten pairs: long liandui and san_dai_er pools
+    "pairs": "3 3 4 4 5 5 6 6 7 7 8 8 9 9 10 10 11 11 12 12",
+    # 20-card dizhu hand with triples, a bomb and the rocket
+    "dizhu": "3 3 3 4 4 4 5 5 5 6 6 7 7 8 9 9 9 9 14 15",
+}
+
+
+def _label(move_type):
+    """Name of a move type given as name or MoveType code."""
+    return getattr(move_type, "name", move_type)
+
+
+def _hand_from_names(names):
+    """Sorted Card list for card names, taking suits in deck order."""
+    left = Cards().cards
+    hand = []
+    for name in names.split():
+        card = next(card for card in left if card.name == name)
+        left.remove(card)
+        hand.append(card)
+    return sorted(hand, key=lambda card: card.rank)
+
+
+def smallest_rivals():
+    """The lowest, shortest move of every type, bound to full-deck cards.
+
+    Answering these gives the largest legal-move sets, so they are the
+    rivals used against the adversarial hands.
+    """
+    deck = Cards().cards
+    rivals = []
+    for move_type in MOVE_TYPES:
+        blocks = family_blocks(FULL_DECK, move_type)
+        _, _, body, pool, k = min(blocks, key=lambda block: block[:2])
+        packed = body + sum(pool[:k])
+        cards = counts_to_cards(packed, deck)
+        rivals.append(MOVES[TYPE_CODES[move_type]][packed].bind(cards))
+    return rivals
+
+
+def make_cases(n_hands, seed):
+    """Fixed-seed (hand, last_move_type, last_move) triples.
+
+    Half lead freely, half answer a move drawn from another random hand.
+    """
+    rng = random.Random(seed)
+    deck = Cards().cards
+    cases = []
+    for i in range(n_hands):
+        hand = sorted(rng.sample(deck, rng.choice([17, 20])), key=lambda c: c.rank)
+        if i % 2 == 0:
+            cases.append((hand, "start", "start"))
+            continue
+        rival = sorted(rng.sample(deck, 20), key=lambda c: c.rank)
+        moves = Moves()
+        moves.get_moves(rival)
+        types, next_moves = moves.get_next_moves("start", "start")
+        k = rng.randrange(len(next_moves))
+        cases.append((hand, types[k], next_moves[k]))
+    return cases
+
+
+def adversarial_cases():
+    """Every worst-case hand as a free lead and against every smallest rival."""
+    rivals = smallest_rivals()
+    cases = []
+    for names in ADVERSARIAL_HANDS.values():
+        hand = _hand_from_names(names)
+        cases.append((hand, "start", "start"))
+        for rival in rivals:
+            cases.append((hand, rival.type, rival))
+    return cases
+
+
+def run_engine(engine_cls, cases, keep=None):
+    """Return (seconds, moves generated) over all cases.
+
+    With ``keep`` (a list) every result list is appended to it, so the
+    memory they hold can be measured afterwards.
+    """
+    total = 0
+    begin = time.perf_counter()
+    for hand, last_move_type, last_move in cases:
+        moves = engine_cls()
+        moves.get_moves(hand)
+        _, next_moves = moves.get_next_moves(last_move_type, last_move)
+        total += len(next_moves)
+        if keep is not None:
+            keep.append(next_moves)
+    return time.perf_counter() - begin, total
+
+
+def prebuilt(engine_cls, cases):
+    """(engine, last_move_type, rival) with each hand's engine built and
+    led from once, the rival in the form Player passes it to that engine.
+    """
+    prepared = []
+    for hand, last_move_type, last_move in cases:
+        moves = engine_cls()
+        moves.get_moves(hand)
+        moves.get_next_moves("start", "start")
+        if engine_cls is Moves:
+            rival = list(last_move.cards) if isinstance(last_move, Move) else last_move
+        else:
+            rival = last_move if isinstance(last_move, Move) else \
+                Move.from_cards(last_move_type, last_move)
+        prepared.append((moves, last_move_type, rival))
+    return prepared
+
+
+def run_answers(prepared, keep=None):
+    """Return (seconds, moves) answering every rival on prebuilt engines."""
+    total = 0
+    begin = time.perf_counter()
+    for moves, last_move_type, rival in prepared:
+        if isinstance(moves, Moves):
+            #Moves往列表里追加, 每次应答像新的一轮一样从空列表开始
+            moves.next_moves, moves.next_moves_type = [], []
+        _, next_moves = moves.get_next_moves(last_move_type, rival)
+        total += len(next_moves)
+        if keep is not None:
+            keep.append(next_moves)
+    return time.perf_counter() - begin, total
+
+
+def expand_family(counts_list, move_type, keep=None):
+    """Return (seconds, moves) expanding one family for every hand."""
+    code = TYPE_CODES[move_type]
+    table = MOVES[code]
+    total = 0
+    begin = time.perf_counter()
+    for counts in counts_list:
+        moves = [table[body + sum(combo)]
+                 for _, _, body, pool, k in family_blocks(counts, move_type)
+                 for combo in combinations(pool, k)]
+        total += len(moves)
+        if keep is not None:
+            keep.append(moves)
+    return time.perf_counter() - begin, total
+
+
+def sample(run, min_time):
+    """(seconds per call, moves) looping ``run(None)`` for ``min_time``."""
+    elapsed = loops = 0
+    while elapsed < min_time:
+        seconds, total = run(None)
+        elapsed += seconds
+        loops += 1
+    return elapsed / loops, total
+
+
+def measure(run, n_hands, repeat, min_time=0.02):
+    """Time ``run(keep)`` ``repeat`` times, then once under tracemalloc.
+
+    Each timed sample loops ``run`` for at least ``min_time`` seconds, so
+    small groups are not lost in timer noise.
+    """
+    best = None
+    for _ in range(repeat):
+        seconds, total = sample(run, min_time)
+        best = seconds if best is None else min(best, seconds)
+    keep = []
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    run(keep)
+    after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, 'filename'))
+    del keep
+    return {
+        'moves': total,
+        'ns_per_hand': round(1e9 * best / n_hands, 1),
+        'retained_blocks': round(blocks / n_hands, 2),
+        'peak_kib': round(peak / 1024, 1),
+    }
+
+
+def collect(cases, repeat):
+    """All benchmark numbers as a nested dict (the baseline format)."""
+    #计时基准: 同一次运行里cards引擎在全部样本上的ns/hand
+    results = {"reference": {
+        "cards": measure(lambda keep: run_engine(Moves, cases, keep), len(cases), repeat),
+    }}
+    groups = {}
+    for case in cases:
+        groups.setdefault(_label(case[1]), []).append(case)
+    for name, engine_cls in ENGINES:
+        results[name] = {
+            label: measure(lambda keep, group=group: run_engine(engine_cls, group, keep),
+                           len(group), repeat)
+            for label, group in groups.items()
+        }
+
+    #只计应答: 引擎事先建好
+    answers = {label: group for label, group in groups.items() if label != "start"}
+    for name, engine_cls in ANSWER_ENGINES:
+        results["answer/" + name] = {
+            label: measure(lambda keep, prepared=prebuilt(engine_cls, group):
+                           run_answers(prepared, keep), len(group), repeat)
+            for label, group in answers.items()
+        }
+
+    #每手牌只统计一次(对手牌型不影响整族生成)
+    hands = {id(hand): hand for hand, _, _ in cases}
+    counts_list = [hand_counts(hand) for hand in hands.values()]
+    results["family"] = {
+        move_type: measure(lambda keep, t=move_type: expand_family(counts_list, t, keep),
+                           len(counts_list), repeat)
+        for move_type in MOVE_TYPES
+    }
+
+    reference = results["reference"]["cards"]['ns_per_hand']
+    for rows in results.values():
+        for row in rows.values():
+            row['relative'] = round(row['ns_per_hand'] / reference, 3)
+    return results
+
+
+def timing(cases, repeat, min_time=0.05):
+    """{engine: {'x_cards': ratio}}: time over the cards engine's, same corpus.
+
+    The two are sampled alternately, so a change in machine load hits
+    both, and the best sample of each is kept.
+    """
+    def ratio(reference, run):
+        best_reference = best = float('inf')
+        for _ in range(repeat):
+            best_reference = min(best_reference, sample(reference, min_time)[0])
+            best = min(best, sample(run, min_time)[0])
+        return {'x_cards': round(best / best_reference, 3)}
+
+    answers = [case for case in cases if case[1] != "start"]
+    gc.collect()
+    gc.disable()
+    try:
+        rows = {}
+        for name, engine_cls in ENGINES[1:]:
+            rows[name] = ratio(lambda keep: run_engine(Moves, cases, keep),
+                               lambda keep, cls=engine_cls: run_engine(cls, cases, keep))
+        reference = prebuilt(Moves, answers)
+        for name, engine_cls in ANSWER_ENGINES[1:]:
+            prepared = prebuilt(engine_cls, answers)
+            rows["answer/" + name] = ratio(lambda keep: run_answers(reference, keep),
+                                           lambda keep, p=prepared: run_answers(p, keep))
+    finally:
+        gc.enable()
+    return rows
+
+
+def show(results):
+    for section, rows in results.items():
+        if section == "timing":
+            print("\n[timing]")
+            for name, row in rows.items():
+                print(f"{name:16s}{row['x_cards']:10.3f} x cards")
+            continue
+        print(f"\n[{section}]")
+        print(f"{'':16s}{'moves':>10s}{'ns/hand':>12s}{'x cards':>10s}"
+              f"{'retained':>10s}{'peak KiB':>10s}")
+        for label, row in rows.items():
+            print(f"{label:16s}{row['moves']:10d}{row['ns_per_hand']:12.0f}"
+                  f"{row['relative']:10.3f}{row['retained_blocks']:10.1f}{row['peak_kib']:10.1f}")
+
+
+# Checked memory metrics and the absolute change below which they are noise.
+# Timing is checked on the [timing] ratios only (see the module docstring).
+CHECKED = {'retained_blocks': 1, 'peak_kib': 1}
+
+
+def disagreements(results):
+    """Rows where an engine's move count differs from the cards engine's."""
+    problems = []
+    for prefix, engines in (("", ENGINES), ("answer/", ANSWER_ENGINES)):
+        expected = results[prefix + "cards"]
+        for name, _ in engines[1:]:
+            for label, row in results[prefix + name].items():
+                if row['moves'] != expected[label]['moves']:
+                    problems.append(f"{prefix}{name}/{label}: {row['moves']} moves, "
+                                    f"cards {expected[label]['moves']}")
+    return problems
+
+
+def compare(results, baseline, tolerance, time_tolerance):
+    """Regression messages against a stored baseline."""
+    problems = []
+    for name, base in baseline.get("timing", {}).items():
+        row = results["timing"].get(name)
+        if row is not None and row['x_cards'] > base['x_cards'] * (1 + time_tolerance):
+            problems.append(f"timing/{name}: x cards {base['x_cards']} -> {row['x_cards']}")
+    for section, rows in baseline.items():
+        if section == "timing":
+            continue
+        for label, base in rows.items():
+            row = results.get(section, {}).get(label)
+            if row is None:
+                continue
+            if row['moves'] != base['moves']:
+                problems.append(f"{section}/{label}: moves {base['moves']} -> {row['moves']}")
+            for metric, slack in CHECKED.items():
+                limit = base[metric] * (1 + tolerance)
+                if row[metric] > limit and row[metric] - base[metric] > slack:
+                    problems.append(f"{section}/{label}: {metric} "
+                                    f"{base[metric]} -> {row[metric]}")
+    return problems
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--hands", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed growth of retained blocks and peak memory")
+    parser.add_argument("--time-tolerance", type=float, default=1.0,
+                        help="allowed growth of an engine's [timing] ratio to cards")
+    args = parser.parse_args()
+
+    cases = make_cases(args.hands, args.seed) + adversarial_cases()
+
+    begin = time.perf_counter()
+    MoveCatalogue.instance()
+    print(f"Catalogue: {len(MoveCatalogue.instance())} shapes, "
+          f"load {1000 * (time.perf_counter() - begin):.1f}ms")
+
+    totals = {}
+    for name, engine_cls in ENGINES:
+        totals[name] = run_engine(engine_cls, cases)
+    base = totals["cards"][0]
+    for name, (seconds, total) in totals.items():
+        print(f"{name:10s} {1e9 * seconds / len(cases):10.0f}ns/hand  "
+              f"{total} moves  x{base / seconds:.2f}")
+    problems = []
+    if len({total for _, total in totals.values()}) != 1:
+        problems.append("total: " + ", ".join(f"{name} {total}"
+                                               for name, (_, total) in totals.items()))
+
+    results = collect(cases, args.repeat)
+    results["timing"] = timing(cases, args.repeat)
+    show(results)
+
+    problems += disagreements(results)
+    if problems:
+        print("\nERROR: engines disagree on the number of moves:", file=sys.stderr)
+        for problem in problems:
+            print("  " + problem, file=sys.stderr)
+        sys.exit(1)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nBaseline saved to {args.baseline}")
+        sys.exit(0)
+    if not os.path.exists(args.baseline):
+        print(f"\nERROR: no baseline at {args.baseline}, nothing was checked; "
+              f"record one with --save-baseline", file=sys.stderr)
+        sys.exit(2)
+    with open(args.baseline) as f:
+        problems = compare(results, json.load(f), args.tolerance, args.time_tolerance)
+    if problems:
+        print(f"\nREGRESSION (tolerance {args.tolerance:.0%}, "
+              f"time tolerance {args.time_tolerance:.0%}):")
+        for problem in problems:
+            print("  " + problem)
+        sys.exit(1)
+    print(f"\nNo regression against {args.baseline}")
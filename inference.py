@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+"""
+Cross-game batched inference for the DouZero adapter.
+
+Usage:
+    python inference.py [--model douzero|alphadou] [--games N] [--threads T]
+                        [--max-batch B] [--max-wait SECONDS] [--engine E] [--seed S]
+                        [--no-broker]
+
+Games run in T threads.  With a broker attached, an adapter's choose()
+hands its infoset to InferenceBroker.act and blocks; a broker thread
+groups the pending infosets by position (landlord / landlord_down /
+landlord_up, one network each) and answers a group with one forward pass
+(the adapter's act_batch) when
+
+- it holds ``max_batch`` infosets, or
+- its oldest infoset has waited ``max_wait`` seconds, or
+- every game thread is waiting, so nothing more can arrive.
+
+The forward pass releases the GIL, so the game threads keep building
+infosets while a batch runs.
+
+Only DouZero is batched.  AlphaDou's agent builds its observation and
+combines its output heads inside act(), and that code is not part of
+this tree, so AlphaDouAdapter has no batched forward pass
+(``batched = False``) and runs with ``--no-broker`` only.  The broker counts decisions, batches and the
+batch-size distribution; decisions/s is measured from the first request.
+"""
+
+import argparse
+import threading
+import time
+from collections import Counter
+
+from myutil import game_rng
+
+DEFAULT_MAX_BATCH = 32
+DEFAULT_MAX_WAIT = 0.002
+
+
+class _Request(object):
+    __slots__ = ("infoset", "arrived", "done", "action", "error")
+
+    def __init__(self, infoset):
+        self.infoset = infoset
+        self.arrived = time.perf_counter()
+        self.done = threading.Event()
+        self.action = None
+        self.error = None
+
+
+class InferenceBroker(object):
+    """
+    推理代理: 按position合并多个对局的infoset, 一次前向计算
+    """
+    def __init__(self, act_batch, max_batch=DEFAULT_MAX_BATCH, max_wait=DEFAULT_MAX_WAIT,
+                 clients=None):
+        #act_batch(position, infosets) → 每个infoset的出牌
+        self.act_batch = act_batch
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        #可能提交请求的线程数, 全部在等待时立即计算; None则只看max_batch/max_wait
+        self.clients = clients
+        self._pending = {}
+        self._cond = threading.Condition()
+        self._closed = False
+
+        #统计
+        self.decisions = 0
+        self.batch_sizes = Counter()
+        self.forward_seconds = 0.0
+        self.begin = None
+
+        self._thread = threading.Thread(target=self._run, name="inference-broker", daemon=True)
+        self._thread.start()
+
+    def act(self, position, infoset):
+        """Action for ``infoset``; blocks until its batch has run."""
+        request = _Request(infoset)
+        with self._cond:
+            if self.begin is None:
+                self.begin = request.arrived
+            self._pending.setdefault(position, []).append(request)
+            self._cond.notify()
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.action
+
+    def leave(self):
+        """A client thread is done; the rest need not wait for it."""
+        with self._cond:
+            if self.clients is not None:
+                self.clients -= 1
+            self._cond.notify()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+
+    #选出下一批: 满批, 超时或所有线程都在等待
+    def _next_batch(self):
+        while True:
+            if self._closed and not any(self._pending.values()):
+                return None, None
+            now = time.perf_counter()
+            waiting = sum(len(queue) for queue in self._pending.values())
+            everyone = self.clients is not None and waiting >= self.clients
+            ready = None
+            wake = None
+            for position, queue in self._pending.items():
+                if not queue:
+                    continue
+                due = queue[0].arrived + self.max_wait
+                if len(queue) >= self.max_batch or due <= now or everyone or self._closed:
+                    if ready is None or len(queue) > len(self._pending[ready]):
+                        ready = position
+                elif wake is None or due < wake:
+                    wake = due
+            if ready is not None:
+                queue = self._pending[ready]
+                batch, self._pending[ready] = queue[:self.max_batch], queue[self.max_batch:]
+                return ready, batch
+            self._cond.wait(None if wake is None else wake - now)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                position, batch = self._next_batch()
+            if batch is None:
+                return
+            begin = time.perf_counter()
+            try:
+                actions = self.act_batch(position, [request.infoset for request in batch])
+                for request, action in zip(batch, actions):
+                    request.action = action
+            except Exception as error:
+                for request in batch:
+                    request.error = error
+            self.forward_seconds += time.perf_counter() - begin
+            self.decisions += len(batch)
+            self.batch_sizes[len(batch)] += 1
+            for request in batch:
+                request.done.set()
+
+    def stats(self):
+        batches = sum(self.batch_sizes.values())
+        wall = time.perf_counter() - self.begin if self.begin is not None else 0.0
+        return {
+            'decisions': self.decisions,
+            'batches': batches,
+            'mean_batch': self.decisions / batches if batches else 0.0,
+            'batch_sizes': dict(sorted(self.batch_sizes.items())),
+            'decisions_per_second': self.decisions / wall if wall else 0.0,
+            'forward_seconds': self.forward_seconds,
+        }
+
+    def show(self):
+        stats = self.stats()
+        print(f"Decisions: {stats['decisions']} in {stats['batches']} batches "
+              f"(mean {stats['mean_batch']:.1f}), {stats['decisions_per_second']:.1f} decisions/s")
+        print(f"Forward: {stats['forward_seconds']:.2f}s")
+        print("Batch sizes: " + ", ".join(f"{size}x{count}"
+                                          for size, count in stats['batch_sizes'].items()))
+
+
+def adapter_class(model):
+    """The adapter class behind an AI model name."""
+    from ai_adapter import DouZeroAdapter, AlphaDouAdapter
+    return {"douzero": DouZeroAdapter, "alphadou": AlphaDouAdapter}[model]
+
+
+def adapter_for(model):
+    """The adapter singleton behind an AI model name."""
+    return adapter_class(model).instance()
+
+
+def run_threaded_games(n_games, model, threads, engine="cards", seed=0, brokers=()):
+    """Play ``n_games`` in ``threads`` threads; return the result dicts.
+
+    Every broker in ``brokers`` is told when a thread runs out of games.
+    """
+    from tournament import play_game
+    results = []
+    indices = iter(range(n_games))
+    lock = threading.Lock()
+
+    def worker():
+        try:
+            while True:
+                with lock:
+                    index = next(indices, None)
+                if index is None:
+                    return
+                result = play_game(model, engine, game_rng(seed, index))
+                result['game'] = index
+                with lock:
+                    results.append(result)
+        finally:
+            for broker in brokers:
+                broker.leave()
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--model", default="douzero", choices=("douzero", "alphadou"))
+    parser.add_argument("--games", type=int, default=64)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--max-batch", type=int, default=DEFAULT_MAX_BATCH)
+    parser.add_argument("--max-wait", type=float, default=DEFAULT_MAX_WAIT)
+    parser.add_argument("--engine", default="cards")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-broker", action="store_true", help="batch size 1 baseline")
+    args = parser.parse_args()
+    if not args.no_broker and not adapter_class(args.model).batched:
+        parser.error(f"{args.model} has no batched forward pass; use --no-broker")
+
+    adapter = adapter_for(args.model)
+    broker = None
+    if not args.no_broker:
+        broker = adapter.broker = InferenceBroker(adapter.act_batch, args.max_batch,
+                                                  args.max_wait, clients=args.threads)
+    begin = time.perf_counter()
+    results = run_threaded_games(args.games, args.model, args.threads, args.engine, args.seed,
+                                 brokers=[broker] if broker else [])
+    wall = time.perf_counter() - begin
+    dizhu_wins = sum(result['dizhu_win'] for result in results)
+    print(f"Games: {len(results)}, dizhu wins {dizhu_wins/len(results)*100:.1f}%, "
+          f"{wall:.2f}s, {len(results)/wall:.2f} games/s")
+    if broker is not None:
+        adapter.broker = None
+        broker.close()
+        broker.show()
@@ -1,14 +1,18 @@
 # -*- coding: utf-8 -*-
 
 from myclass import Cards, Player, PlayRecords, WebShow
-from myutil import game_init
+from myutil import game_init, game_rng, base_model, AI_MODELS
+from sequential import SequentialTest
+from move_cache import MoveCache
+from probes import Probes
 import jsonpickle
 import time
 import copy
 
 class Game(object):
 
-    def __init__(self, model):
+    def __init__(self, model, engine="cards", move_cache=None, seed=None,
+                 record="full", probes=None):
         #初始化一副扑克牌类
         self.cards = Cards()
 
@@ -19,25 +23,41 @@ class Game(object):
         self.i = 0
         self.yaobuqis = []
 
+        #出牌生成器 "cards"/"rank"/"lazy"/"catalogue"
+        self.engine = engine
+        #可选出牌缓存(MoveCache), 多局共用同一个实例
+        self.move_cache = move_cache
+        #随机数: None用全局np.random, 也可以是种子或np.random.Generator
+        #(game_rng(seed, k)得到第k局的计数器种子)
+        self.rng = game_rng(seed)
+
         #choose模型 — 支持字符串或字典 {"dizhu": model, "nongmin": model}
         if isinstance(model, dict):
             self.model_dict = model
         else:
             self.model_dict = {"dizhu": model, "nongmin": model}
 
+        #记录级别 "full"/"moves"/"none", AI模型根据出牌历史决策, 至少需要"moves"
+        models = {base_model(m) for m in self.model_dict.values()}
+        if record == "none" and models & set(AI_MODELS):
+            raise ValueError("models %s need record='moves' or 'full'" % (AI_MODELS,))
+        self.record = record
+        #分阶段计时(probes.Probes), 多局可共用一个实例
+        self.probes = probes
+
     #发牌
     def game_start(self):
 
         #初始化players
         self.players = []
         for i in range(1,4):
-            self.players.append(Player(i))
+            self.players.append(Player(i, self.engine, self.move_cache, self.rng, self.probes))
 
         #初始化扑克牌记录类
-        self.playrecords = PlayRecords()
+        self.playrecords = PlayRecords(self.record)
 
         #发牌 (标准规则: 17+3底牌, 地主先出)
-        dizhu_id = game_init(self.players, self.playrecords, self.cards)
+        dizhu_id = game_init(self.players, self.playrecords, self.cards, self.rng)
 
         #地主先出牌
         self.i = dizhu_id - 1  # 0-indexed
@@ -74,16 +94,33 @@ if __name__=="__main__":
 
     begin = time.time()
 
-    # 统计胜率
-    # model 可以是字符串 "random"/"douzero"/"alphadou"
+    # 统计胜率 (单进程; 多进程并行见 tournament.py)
+    # model 可以是字符串 "random"/"greedy"/"douzero"/"alphadou"/"pimc"/"solver"/"solver+douzero"
     # 也可以是字典指定混合模型: {"dizhu": "alphadou", "nongmin": "random"}
     model = "random"
     total_games = 1000
     dizhu_wins = 0
     nongmin_wins = 0
 
+    # 序贯检验: 地主胜率是否高于 sprt_threshold, 判定后提前结束
+    # (None 则固定打 total_games 局); total_games 同时是上限
+    sprt_threshold = None
+    report_every = 100
+    test = None
+    if sprt_threshold is not None:
+        test = SequentialTest(sprt_threshold, delta=0.02, alpha=0.05, beta=0.05)
+
+    # 分阶段计时: profile为True时打印各阶段耗时, profile_json给出文件名则另存为JSON
+    profile = False
+    profile_json = None
+    probes = Probes() if profile or profile_json else None
+
+    # 可选出牌缓存: move_cache_size为LRU容量, 0则不缓存
+    move_cache_size = 0
+    move_cache = MoveCache(move_cache_size) if move_cache_size else None
+
     for j in range(total_games):
-        game_ddz = Game(model)
+        game_ddz = Game(model, move_cache=move_cache, probes=probes)
         game_ddz.game_start()
 
         step = 0
@@ -99,7 +136,24 @@ if __name__=="__main__":
         else:
             nongmin_wins += 1
 
-    print(f"Total games: {total_games}")
-    print(f"Dizhu wins: {dizhu_wins} ({dizhu_wins/total_games*100:.1f}%)")
-    print(f"Nongmin wins: {nongmin_wins} ({nongmin_wins/total_games*100:.1f}%)")
+        if test is not None:
+            decision = test.add(int(winner_id == dizhu_id))
+            if (j + 1) % report_every == 0 or decision is not None:
+                print(test.status())
+            if decision is not None:
+                break
+
+    played = dizhu_wins + nongmin_wins
+    print(f"Total games: {played}")
+    print(f"Dizhu wins: {dizhu_wins} ({dizhu_wins/played*100:.1f}%)")
+    print(f"Nongmin wins: {nongmin_wins} ({nongmin_wins/played*100:.1f}%)")
+    if test is not None:
+        test.show("dizhu win rate")
+    if move_cache is not None:
+        print(f"Move cache: {move_cache.stats()}")
+    if probes is not None:
+        if profile:
+            probes.show()
+        if profile_json:
+            probes.dump(profile_json)
     print(f"Time: {time.time()-begin:.2f}s")
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""Cross-game LRU cache of legal moves.
+
+Keys are a canonical signature of the hand (its packed rank counts, or the
+sorted DouZero ints) plus the normalized rival move (type, length, main
+rank), so the same position reached in different games or with different
+suits shares one entry.  One cache can serve both Player.go and the
+DouZero/AlphaDou legal-action path; their keys are namespaced, Player.go's
+by engine, since each engine's lists hold its own kind of move.
+"""
+
+from collections import OrderedDict
+
+from rank_moves import TYPE_CODES, UNIT, describe, index_key
+
+DEFAULT_MAXSIZE = 100000
+
+
+def hand_key(cards_left):
+    """Canonical signature of a hand of Card objects (its packed rank counts)."""
+    return sum([UNIT[card.rank] for card in cards_left])
+
+
+def rival_key(last_move_type, last_move):
+    """Normalized rival move: (type code, length, main rank).
+
+    Length is 0 for non-chain types, where it does not change the answer.
+    """
+    if last_move_type == "start":
+        return "start", 0, 0
+    rank, length = describe(last_move)
+    return index_key(TYPE_CODES[last_move_type], length) + (rank,)
+
+
+class MoveCache(object):
+    """Bounded LRU mapping with hit / miss / eviction counters."""
+    _instance = None
+
+    def __init__(self, maxsize=DEFAULT_MAXSIZE):
+        if maxsize <= 0:
+            raise ValueError("maxsize must be positive")
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @classmethod
+    def instance(cls):
+        """Process-wide shared cache."""
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def get(self, key):
+        """Cached value or None; a hit makes the entry most recent."""
+        value = self._data.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._data.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        """Store ``value`` (must not be None), evicting the oldest entry."""
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+        return value
+
+    def clear(self):
+        self._data.clear()
+        self.hits = self.misses = self.evictions = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+"""Precomputed catalogue of every legal move shape.
+
+Doudizhu only has a finite set of move shapes as rank multisets (about 14k
+that fit in a 20-card hand).  They are enumerated once with the rank engine's
+family blocks, stored as a NumPy count matrix plus type / main rank / length
+columns and cached on disk.  Legal moves for a hand are then a vectorized
+"fits in hand" test over the whole catalogue plus a filter on the rival move.
+"""
+
+import os
+from bisect import bisect_right
+from itertools import combinations
+
+import numpy as np
+
+from rank_moves import (
+    MOVE_TYPES, TYPE_CODES, N_RANKS, GUARD, MOVES, UNIT, MoveType,
+    family_blocks, index_key, unpack, describe, hand_counts, pack,
+)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CATALOGUE_FILE = os.path.join(BASE_DIR, 'move_catalogue.npz')
+# Bump when the shapes or the file layout change
+CATALOGUE_VERSION = 2
+
+# Largest hand (dizhu) — longer shapes can never be played
+MAX_HAND = 20
+
+FULL_DECK = [4] * 13 + [1, 1]
+
+BOMB = MoveType.bomb
+
+
+def build_catalogue():
+    """Enumerate every move shape of at most MAX_HAND cards.
+
+    Returns a dict of arrays: counts (M x 15), packed, types, mains, lengths.
+    Rows are sorted by (type in MOVE_TYPES order, index_key length, main
+    rank), so each index_key bucket is a contiguous run sorted by main rank.
+    """
+    rows = []
+    for type_idx, move_type in enumerate(MOVE_TYPES):
+        for main, length, body, pool, k in family_blocks(FULL_DECK, move_type):
+            if length > MAX_HAND:
+                continue
+            key_len = index_key(type_idx, length)[1]
+            for combo in combinations(pool, k):
+                rows.append((type_idx, key_len, main, length, body + sum(combo)))
+    rows.sort()
+    types, _, mains, lengths, packed = zip(*rows)
+    return {
+        'counts': np.array([unpack(p) for p in packed], dtype=np.uint8),
+        'packed': np.array(packed, dtype=np.uint64),
+        'types': np.array(types, dtype=np.int8),
+        'mains': np.array(mains, dtype=np.int8),
+        'lengths': np.array(lengths, dtype=np.int8),
+    }
+
+
+class MoveCatalogue(object):
+    """All move shapes with vectorized legal-move lookup."""
+    _instance = None
+
+    def __init__(self, arrays):
+        self.counts = arrays['counts']
+        self.packed = arrays['packed']
+        self.types = arrays['types']
+        self.mains = arrays['mains']
+        self.lengths = arrays['lengths']
+        #每一行对应的Move, 查表结果直接共用
+        self.moves = [MOVES[t][p] for t, p in zip(self.types.tolist(), self.packed.tolist())]
+        #index_key → [start, end) rows, sorted by main rank inside
+        self.buckets = {}
+        for i, move in enumerate(self.moves):
+            key = index_key(move.type, move.length)
+            lo, _ = self.buckets.get(key, (i, i))
+            self.buckets[key] = (lo, i + 1)
+        #(点数下标, 张数c) → 该点数不超过c张的形状(bool数组), 出牌后增量更新用
+        self._fits = {}
+        #应答时用: 行号, 以及bisect用的主牌点数列表(比numpy小数组操作快)
+        self.rows = np.arange(len(self.moves))
+        self._mains = self.mains.tolist()
+
+    @classmethod
+    def load(cls, path=CATALOGUE_FILE):
+        """Load the cached catalogue, building and saving it if missing/stale."""
+        if os.path.exists(path):
+            with np.load(path) as data:
+                if int(data['version']) == CATALOGUE_VERSION:
+                    return cls({k: data[k] for k in data.files})
+        arrays = build_catalogue()
+        try:
+            np.savez(path, version=CATALOGUE_VERSION, **arrays)
+        except OSError:
+            pass  # read-only checkout: keep the in-memory copy
+        return cls(arrays)
+
+    @classmethod
+    def instance(cls):
+        if cls._instance is None:
+            cls._instance = cls.load()
+        return cls._instance
+
+    def __len__(self):
+        return len(self.packed)
+
+    def playable(self, hand, lo=0, hi=None):
+        """Boolean mask of the shapes in rows [lo, hi) that fit in ``hand``.
+
+        Same as ``(self.counts[lo:hi] <= hand).all(axis=1)``; done on the
+        packed column with guard bits, one uint64 operation per shape.
+        """
+        hand_packed = np.uint64(pack(hand) | GUARD)
+        guard = np.uint64(GUARD)
+        return ((hand_packed - self.packed[lo:hi]) & guard) == guard
+
+    def fits(self, slot, count):
+        """Boolean mask of the shapes using at most ``count`` cards of rank
+        slot ``slot``.
+
+        ANDing it into a playable() mask after that rank dropped to ``count``
+        cards gives the mask of the smaller hand.
+        """
+        mask = self._fits.get((slot, count))
+        if mask is None:
+            mask = self._fits[(slot, count)] = self.counts[:, slot] <= count
+        return mask
+
+    def select(self, mask, last_move_type, last_rank=0, last_len=0):
+        """Like legal(), for a hand given as its playable() mask."""
+        if last_move_type == "start":
+            return mask.nonzero()[0]
+        lo, hi = self.buckets.get(index_key(last_move_type, last_len), (0, 0))
+        lo = bisect_right(self._mains, last_rank, lo, hi)
+        idx = self.rows[lo:hi][mask[lo:hi]]
+        #除了bomb,都可以出炸
+        if last_move_type != BOMB:
+            lo, hi = self.buckets[(BOMB, 0)]
+            idx = np.concatenate([idx, self.rows[lo:hi][mask[lo:hi]]])
+        return idx
+
+    def legal(self, hand, last_move_type, last_rank=0, last_len=0):
+        """Indices of the shapes that fit in ``hand`` and answer the rival move.
+
+        ``last_move_type`` is "start" or a MoveType code.  The rival's bucket
+        is cut at ``last_rank`` with a binary search, so only the rows that
+        beat it (plus the bombs) are tested.
+        """
+        if last_move_type == "start":
+            return np.flatnonzero(self.playable(hand))
+        lo, hi = self.buckets.get(index_key(last_move_type, last_len), (0, 0))
+        lo = bisect_right(self._mains, last_rank, lo, hi)
+        idx = self.rows[lo:hi][self.playable(hand, lo, hi)]
+        #除了bomb,都可以出炸
+        if last_move_type != BOMB:
+            lo, hi = self.buckets[(BOMB, 0)]
+            idx = np.concatenate([idx, self.rows[lo:hi][self.playable(hand, lo, hi)]])
+        return idx
+
+
+class MoveView(object):
+    """Read-only sequence of catalogue Moves picked by row index.
+
+    get_next_moves hands this out instead of a list, so only the moves a
+    caller actually looks at are fetched.
+    """
+    __slots__ = ("moves", "rows")
+
+    def __init__(self, moves, rows):
+        self.moves = moves
+        self.rows = rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.moves[j] for j in self.rows[i].tolist()]
+        return self.moves[self.rows[i]]
+
+    def __iter__(self):
+        moves = self.moves
+        return (moves[j] for j in self.rows.tolist())
+
+    def __repr__(self):
+        return "MoveView(%r)" % list(self)
+
+
+class CatalogueMoves(object):
+    """
+    出牌类(查表版), 接口与Moves/RankMoves相同, 出牌是共用的Move
+    """
+    def __init__(self, catalogue=None):
+        self.catalogue = catalogue or MoveCatalogue.instance()
+        self.counts = [0] * N_RANKS
+        #手牌点数打包, 同RankMoves.hand(缓存的key)
+        self.hand = 0
+        #能放进手牌的形状(bool数组), 第一次主动出牌时全量计算, 之后随出牌增量更新
+        self.mask = None
+
+        #下次出牌
+        self.next_moves = []
+        #下次出牌类型, Move自带牌型, 不再单独记录
+        self.next_moves_type = None
+
+    #获取全部出牌列表(只记录手牌, 查表在get_next_moves)
+    def get_moves(self, cards_left):
+        self.counts = hand_counts(cards_left)
+        self.hand = pack(self.counts)
+        self.mask = None
+
+    #出牌后同步: 清掉已出点数不再放得下的形状
+    def remove_cards(self, cards):
+        for card in cards:
+            self.counts[card.rank - 1] -= 1
+            self.hand -= UNIT[card.rank]
+        if self.mask is None:
+            return
+        for slot in {card.rank - 1 for card in cards}:
+            np.logical_and(self.mask, self.catalogue.fits(slot, self.counts[slot]), out=self.mask)
+
+    #获取下次出牌列表
+    def get_next_moves(self, last_move_type, last_move):
+        last_rank = last_len = 0
+        if last_move_type != "start":
+            last_move_type = TYPE_CODES.get(last_move_type)
+            if last_move_type is None:
+                print("last_move_type_wrong")
+                self.next_moves = []
+                return self.next_moves_type, self.next_moves
+            last_rank, last_len = describe(last_move)
+        if self.mask is not None:
+            idx = self.catalogue.select(self.mask, last_move_type, last_rank, last_len)
+        elif last_move_type != "start":
+            #还没有整手牌的mask: 只检查对手牌型那一段和炸弹
+            idx = self.catalogue.legal(self.counts, last_move_type, last_rank, last_len)
+        else:
+            self.mask = self.catalogue.playable(self.counts)
+            idx = self.mask.nonzero()[0]
+        self.next_moves = MoveView(self.catalogue.moves, idx)
+        return self.next_moves_type, self.next_moves
+
+    #转换成扑克牌
+    def to_cards(self, move, cards_left):
+        return move.bind(cards_left)
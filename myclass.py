@@ -1,54 +1,87 @@
 # -*- coding: utf-8 -*-
 
 from itertools import combinations
-from myutil import card_show, choose
+import numpy as np
+from myutil import card_show, choose, choose_lazy, generates_own_moves
+from rank_moves import Move, MoveType, RankMoves, counts_to_cards
+from move_catalogue import CatalogueMoves
+from move_cache import hand_key, rival_key
 
 
 ############################################
 #              扑克牌相关类                 #
 ############################################
+#54张牌类型: 名称-花色-大小
+CARD_TYPES = ['1-a-12', '1-b-12','1-c-12','1-d-12',
+              '2-a-13', '2-b-13','2-c-13','2-d-13',
+              '3-a-1', '3-b-1','3-c-1','3-d-1',
+              '4-a-2', '4-b-2','4-c-2','4-d-2',
+              '5-a-3', '5-b-3','5-c-3','5-d-3',
+              '6-a-4', '6-b-4','6-c-4','6-d-4',
+              '7-a-5', '7-b-5','7-c-5','7-d-5',
+              '8-a-6', '8-b-6','8-c-6','8-d-6',
+              '9-a-7', '9-b-7','9-c-7','9-d-7',
+              '10-a-8', '10-b-8','10-c-8','10-d-8',
+              '11-a-9', '11-b-9','11-c-9','11-d-9',
+              '12-a-10', '12-b-10','12-c-10','12-d-10',
+              '13-a-11', '13-b-11','13-c-11','13-d-11',
+              '14-a-14', '15-a-15']
+
 class Cards(object):
     """
     一副扑克牌类,54张排,abcd四种花色,小王14-a,大王15-a
+    牌本身是全局共享的CARD_TABLE, 一副牌只是下标的排列
     """
     def __init__(self):
         #初始化扑克牌类型
-        self.cards_type = ['1-a-12', '1-b-12','1-c-12','1-d-12',
-                           '2-a-13', '2-b-13','2-c-13','2-d-13',
-                           '3-a-1', '3-b-1','3-c-1','3-d-1',
-                           '4-a-2', '4-b-2','4-c-2','4-d-2',
-                           '5-a-3', '5-b-3','5-c-3','5-d-3',
-                           '6-a-4', '6-b-4','6-c-4','6-d-4',
-                           '7-a-5', '7-b-5','7-c-5','7-d-5',
-                           '8-a-6', '8-b-6','8-c-6','8-d-6',
-                           '9-a-7', '9-b-7','9-c-7','9-d-7',
-                           '10-a-8', '10-b-8','10-c-8','10-d-8',
-                           '11-a-9', '11-b-9','11-c-9','11-d-9',
-                           '12-a-10', '12-b-10','12-c-10','12-d-10',
-                           '13-a-11', '13-b-11','13-c-11','13-d-11',
-                           '14-a-14', '15-a-15']
-        #初始化扑克牌类
-        self.cards = self.get_cards()
-
-    #初始化扑克牌类
+        self.cards_type = CARD_TYPES
+        #牌序(CARD_TABLE下标), 洗牌只打乱下标
+        self.deck = np.arange(len(CARD_TYPES))
+
+    #按牌序取出扑克牌
+    @property
+    def cards(self):
+        return self.get_cards()
+
     def get_cards(self):
-        cards = []
-        for card_type in self.cards_type:
-            cards.append(Card(card_type))
-        return cards
+        return [CARD_TABLE[i] for i in self.deck]
 
 class Card(object):
     """
-    扑克牌类
+    扑克牌类, 享元: 同一card_type只有一个不可修改的实例
     """
-    def __init__(self, card_type):
-        self.card_type = card_type
-        #名称
-        self.name = self.card_type.split('-')[0]
-        #花色
-        self.color = self.card_type.split('-')[1]
-        #大小
-        self.rank = int(self.card_type.split('-')[2])
+    __slots__ = ("card_type", "name", "color", "rank", "display", "index")
+    _interned = {}
+
+    def __new__(cls, card_type):
+        card = cls._interned.get(card_type)
+        if card is None:
+            card = object.__new__(cls)
+            name, color, rank = card_type.split('-')
+            init = object.__setattr__
+            init(card, "card_type", card_type)
+            #名称
+            init(card, "name", name)
+            #花色
+            init(card, "color", color)
+            #大小
+            init(card, "rank", int(rank))
+            #展示用名称
+            init(card, "display", name + color)
+            #CARD_TABLE下标
+            init(card, "index", len(cls._interned))
+            cls._interned[card_type] = card
+        return card
+
+    def __setattr__(self, key, value):
+        raise AttributeError("Card is immutable")
+
+    #pickle/copy得到同一个实例
+    def __reduce__(self):
+        return (Card, (self.card_type,))
+
+    def __repr__(self):
+        return "Card(%r)" % self.card_type
 
     #判断大小
     def bigger_than(self, card_instance):
@@ -57,11 +90,22 @@ class Card(object):
         else:
             return False
 
+#全局54张牌
+CARD_TABLE = [Card(card_type) for card_type in CARD_TYPES]
+
 class PlayRecords(object):
     """
     扑克牌记录类
+    记录级别: "full"全部(含每回合可选出牌), "moves"只记出牌(AI需要),
+    "none"不保留每回合历史(批量模拟只看胜者)
     """
-    def __init__(self):
+    LEVELS = ("none", "moves", "full")
+
+    def __init__(self, level="full"):
+        if level not in self.LEVELS:
+            raise ValueError("unknown record level: %s" % level)
+        self.level = level
+
         #当前手牌
         self.cards_left1 = []
         self.cards_left2 = []
@@ -79,6 +123,10 @@ class PlayRecords(object):
 
         #出牌记录
         self.records = []
+        #连续不要/要不起的次数(任何记录级别都保留), 用来找到上一手牌是谁出的
+        self.passes = 0
+        #AI模型的出牌历史(ai_adapter.InfosetTracker), 按records增量更新
+        self.infoset_tracker = None
 
         #胜利者
         #winner=0,1,2,3 0表示未结束,1,2,3表示winner
@@ -322,6 +370,11 @@ class Moves(object):
 
     #获取下次出牌列表
     def get_next_moves(self, last_move_type, last_move):
+        #Move的牌型代码转成名称, 比较时直接用绑定的扑克牌
+        if isinstance(last_move_type, MoveType):
+            last_move_type = last_move_type.name
+        if isinstance(last_move, Move):
+            last_move = last_move.cards
         #没有last,全加上,除了bomb最后加
         if last_move_type == "start":
             moves_types = ["dan", "dui", "san", "san_dai_yi", "san_dai_er",
@@ -456,10 +509,25 @@ class Player(object):
     """
     player类
     """
-    def __init__(self, player_id):
+    #出牌生成器: "cards"逐张牌, "rank"点数计数, "lazy"点数计数按需生成, "catalogue"查表
+    ENGINES = {"cards": Moves, "rank": RankMoves, "lazy": RankMoves,
+               "catalogue": CatalogueMoves}
+
+    def __init__(self, player_id, engine="cards", move_cache=None, rng=None, probes=None):
         self.player_id = player_id
         self.cards_left = []
         self.role = "nongmin"  # "dizhu" 或 "nongmin"
+        if engine not in self.ENGINES:
+            raise ValueError("unknown move engine: %s" % engine)
+        self.engine = engine
+        #出牌生成器, rank/lazy/catalogue引擎跨回合保留
+        self.total_moves = None
+        #跨局共享的可选出牌缓存(MoveCache), 缓存的出牌是未绑定花色的Move
+        self.move_cache = move_cache
+        #本局随机数生成器(random模型), None为全局np.random
+        self.rng = rng
+        #分阶段计时(probes.Probes), None时不计时
+        self.probes = probes
 
     #展示
     def show(self, info):
@@ -469,48 +537,146 @@ class Player(object):
 
     #根据next_move同步cards_left
     def record_move(self, playrecords):
+        #记录级别: none不记历史, moves记出牌, full再记可选出牌
+        keep_moves = playrecords.level != "none"
+        keep_next_moves = playrecords.level == "full"
         #playrecords中records记录[id,next_move]
         if self.next_move_type in ["yaobuqi", "buyao"]:
             self.next_move = self.next_move_type
-            playrecords.records.append([self.player_id, self.next_move_type])
+            playrecords.passes += 1
+            if keep_moves:
+                playrecords.records.append([self.player_id, self.next_move_type])
         else:
-            playrecords.records.append([self.player_id, self.next_move])
+            playrecords.passes = 0
+            if keep_moves:
+                playrecords.records.append([self.player_id, self.next_move])
             for i in self.next_move:
                self.cards_left.remove(i)
+            #rank/lazy/catalogue引擎只更新受影响的出牌
+            if self.engine in ("rank", "lazy", "catalogue") and self.total_moves is not None:
+                self.total_moves.remove_cards(self.next_move)
         #同步playrecords
         if self.player_id == 1:
             playrecords.cards_left1 = self.cards_left
-            playrecords.next_moves1.append(self.next_moves)
-            playrecords.next_move1.append(self.next_move)
+            if keep_next_moves:
+                playrecords.next_moves1.append(self.next_moves)
+            if keep_moves:
+                playrecords.next_move1.append(self.next_move)
         elif self.player_id == 2:
             playrecords.cards_left2 = self.cards_left
-            playrecords.next_moves2.append(self.next_moves)
-            playrecords.next_move2.append(self.next_move)
+            if keep_next_moves:
+                playrecords.next_moves2.append(self.next_moves)
+            if keep_moves:
+                playrecords.next_move2.append(self.next_move)
         elif self.player_id == 3:
             playrecords.cards_left3 = self.cards_left
-            playrecords.next_moves3.append(self.next_moves)
-            playrecords.next_move3.append(self.next_move)
+            if keep_next_moves:
+                playrecords.next_moves3.append(self.next_moves)
+            if keep_moves:
+                playrecords.next_move3.append(self.next_move)
         #是否牌局结束
         end = False
         if len(self.cards_left) == 0:
             end = True
         return end
 
+    #生成下次出牌列表
+    def get_next_moves(self, last_move_type, last_move):
+        probes = self.probes
+        if probes is not None:
+            t = probes.start()
+        #所有出牌可选列表, rank/catalogue引擎只在第一次全量生成
+        if self.engine not in ("rank", "catalogue") or self.total_moves is None:
+            self.total_moves = self.ENGINES[self.engine]()
+            if probes is not None:
+                t = probes.lap("construct", t)
+            #获取全部出牌列表
+            self.total_moves.get_moves(self.cards_left)
+            if probes is not None:
+                t = probes.lap("get_moves", t)
+        #获取下次出牌列表
+        next_move_types, next_moves = self.total_moves.get_next_moves(last_move_type, last_move)
+        if probes is not None:
+            probes.lap("get_next_moves", t)
+        return next_move_types, next_moves
+
     #出牌
     def go(self, last_move_type, last_move, playrecords, model):
-        #所有出牌可选列表
-        self.total_moves = Moves()
-        #获取全部出牌列表
-        self.total_moves.get_moves(self.cards_left)
-        #获取下次出牌列表
-        self.next_move_types, self.next_moves = self.total_moves.get_next_moves(last_move_type, last_move)
-        #在next_moves中选择出牌方法
-        self.next_move_type, self.next_move = choose(
-            self.next_move_types, self.next_moves, last_move_type, model,
-            player=self, playrecords=playrecords
-        )
+        probes = self.probes
+        if probes is not None:
+            probes.begin(model, self.role)
+            begin = probes.start()
+        if self.engine == "lazy":
+            #只统计手牌, 按last_move_type惰性生成
+            if self.total_moves is None:
+                self.total_moves = RankMoves()
+                self.total_moves.set_hand(self.cards_left)
+            self.next_move_types, self.next_moves = [], []
+            if probes is not None:
+                t = probes.start()
+            self.next_move_type, self.next_move = choose_lazy(
+                self.total_moves, last_move_type, last_move, model,
+                player=self, playrecords=playrecords
+            )
+            if probes is not None:
+                probes.lap("choose", t)
+        else:
+            #命中缓存时cards引擎拿到的是别的手牌里的扑克牌, 选中后换成自己的
+            foreign = False
+            if generates_own_moves(model):
+                #AI模型/pimc自己生成一次; 记录级别为full时由adapter/PIMC填入next_moves
+                self.next_move_types, self.next_moves = None, []
+            elif self.move_cache is None:
+                self.next_move_types, self.next_moves = self.get_next_moves(last_move_type, last_move)
+            else:
+                #按(引擎, 手牌点数, 对手出牌)查缓存; rank/catalogue引擎直接用自己维护的打包手牌
+                if self.engine in ("rank", "catalogue") and self.total_moves is not None:
+                    hand = self.total_moves.hand
+                else:
+                    hand = hand_key(self.cards_left)
+                key = (self.engine, hand) + rival_key(last_move_type, last_move)
+                cached = self.move_cache.get(key)
+                if cached is None:
+                    #每回合的出牌列表都是新建的, 之后不再修改, 直接缓存
+                    cached = self.move_cache.put(key, self.get_next_moves(last_move_type, last_move))
+                    self.next_move_types, self.next_moves = cached
+                elif self.engine == "cards" and playrecords.level == "full":
+                    #要记录可选出牌: 整个列表换成自己手牌里的扑克牌
+                    self.next_move_types = cached[0]
+                    self.next_moves = [counts_to_cards(hand_key(move), self.cards_left)
+                                       for move in cached[1]]
+                else:
+                    foreign = self.engine == "cards"
+                    self.next_move_types, self.next_moves = cached
+            #在next_moves中选择出牌方法
+            if probes is not None:
+                t = probes.start()
+            self.next_move_type, self.next_move = choose(
+                self.next_move_types, self.next_moves, last_move_type, model,
+                player=self, playrecords=playrecords, last_move=last_move
+            )
+            if probes is not None:
+                probes.lap("choose", t)
+            #solver/pimc返回的已是Move, 只转换别的手牌里的扑克牌列表
+            if (foreign and self.next_move_type not in ["yaobuqi", "buyao"]
+                    and not isinstance(self.next_move, Move)):
+                self.next_move = Move.from_cards(self.next_move_type, self.next_move).unbound()
+        if isinstance(self.next_move, Move):
+            #点数计数出牌只在选中后分配花色
+            if self.next_move.cards is None:
+                self.next_move = self.next_move.bind(self.cards_left)
+        elif self.engine != "cards" and self.next_move_type not in ["yaobuqi", "buyao"]:
+            #AI模型返回扑克牌列表, 转成Move
+            self.next_move = Move.from_cards(self.next_move_type, self.next_move)
+        if isinstance(self.next_move, Move):
+            self.next_move_type = self.next_move.type
         #记录
+        if probes is not None:
+            t = probes.start()
         end = self.record_move(playrecords)
+        if probes is not None:
+            probes.lap("record_move", t)
+            probes.lap("turn", begin)
         #展示
         #self.show("Player " + str(self.player_id))
         #要不起&不要
@@ -539,44 +705,35 @@ class WebShow(object):
         self.dizhu_id = playrecords.dizhu_id
         self.dizhu_cards = []
         for i in playrecords.dizhu_cards:
-            self.dizhu_cards.append(i.name+i.color)
+            self.dizhu_cards.append(i.display)
 
         #剩余手牌
         self.cards_left1 = []
         for i in playrecords.cards_left1:
-            self.cards_left1.append(i.name+i.color)
+            self.cards_left1.append(i.display)
         self.cards_left2 = []
         for i in playrecords.cards_left2:
-            self.cards_left2.append(i.name+i.color)
+            self.cards_left2.append(i.display)
         self.cards_left3 = []
         for i in playrecords.cards_left3:
-            self.cards_left3.append(i.name+i.color)
+            self.cards_left3.append(i.display)
 
         #可能出牌
         self.next_moves1 = []
         if len(playrecords.next_moves1) != 0:
             next_moves = playrecords.next_moves1[-1]
             for move in next_moves:
-                cards = []
-                for card in move:
-                    cards.append(card.name+card.color)
-                self.next_moves1.append(cards)
+                self.next_moves1.append(self.move_names(move))
         self.next_moves2 = []
         if len(playrecords.next_moves2) != 0:
             next_moves = playrecords.next_moves2[-1]
             for move in next_moves:
-                cards = []
-                for card in move:
-                    cards.append(card.name+card.color)
-                self.next_moves2.append(cards)
+                self.next_moves2.append(self.move_names(move))
         self.next_moves3 = []
         if len(playrecords.next_moves3) != 0:
             next_moves = playrecords.next_moves3[-1]
             for move in next_moves:
-                cards = []
-                for card in move:
-                    cards.append(card.name+card.color)
-                self.next_moves3.append(cards)
+                self.next_moves3.append(self.move_names(move))
 
         #出牌
         self.next_move1 = []
@@ -586,7 +743,7 @@ class WebShow(object):
                 self.next_move1.append(next_move)
             else:
                 for card in next_move:
-                    self.next_move1.append(card.name+card.color)
+                    self.next_move1.append(card.display)
         self.next_move2 = []
         if len(playrecords.next_move2) != 0:
             next_move = playrecords.next_move2[-1]
@@ -594,7 +751,7 @@ class WebShow(object):
                 self.next_move2.append(next_move)
             else:
                 for card in next_move:
-                    self.next_move2.append(card.name+card.color)
+                    self.next_move2.append(card.display)
         self.next_move3 = []
         if len(playrecords.next_move3) != 0:
             next_move = playrecords.next_move3[-1]
@@ -602,7 +759,7 @@ class WebShow(object):
                 self.next_move3.append(next_move)
             else:
                 for card in next_move:
-                    self.next_move3.append(card.name+card.color)
+                    self.next_move3.append(card.display)
 
         #记录
         self.records = []
@@ -613,10 +770,20 @@ class WebShow(object):
             #处理要不起
             try:
                 for j in i[1]:
-                    tmp_name.append(j.name+j.color)
+                    tmp_name.append(j.display)
                 tmp.append(tmp_name)
             except:
                 tmp.append(i[1])
             self.records.append(tmp)
 
+    #出牌名称, 可选出牌的Move可能尚未分配花色
+    @staticmethod
+    def move_names(move):
+        if isinstance(move, Move):
+            return move.names()
+        cards = []
+        for card in move:
+            cards.append(card.display)
+        return cards
+
 
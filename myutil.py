@@ -11,7 +11,7 @@ def card_show(cards, info, n):
         print(info)
         names = []
         for i in cards:
-            names.append(i.name+i.color)
+            names.append(i.display)
         print(names)
     #Moves展示
     elif n == 2:
@@ -22,7 +22,7 @@ def card_show(cards, info, n):
         for i in cards:
             names = []
             for j in i:
-                names.append(j.name+j.color)
+                names.append(j.display)
             moves.append(names)
         print(moves)
     #record展示
@@ -36,7 +36,7 @@ def card_show(cards, info, n):
             #处理要不起
             try:
                 for j in i[1]:
-                    tmp_name.append(j.name+j.color)
+                    tmp_name.append(j.display)
                 tmp.append(tmp_name)
             except:
                 tmp.append(i[1])
@@ -44,11 +44,65 @@ def card_show(cards, info, n):
         print(names)
 
 
-#在Player的next_moves中选择出牌方法
-def choose(next_move_types, next_moves, last_move_type, model, player=None, playrecords=None):
+#每局的随机数生成器
+def game_rng(seed=None, game=None):
+    """Random generator of one game.
+
+    ``seed`` may be None (use the global np.random state, as before), an
+    int, or a ready np.random.Generator.  With ``game`` set, the generator
+    is counter-based: Philox keyed on (seed, game), so game k of a run can
+    be regenerated on its own without replaying games 0..k-1.
+    """
+    if seed is None or isinstance(seed, np.random.Generator):
+        return seed
+    if game is None:
+        return np.random.default_rng(seed)
+    return np.random.Generator(np.random.Philox(key=np.array([seed, game], dtype=np.uint64)))
+
+#[low, high)的随机整数, rng为None时用全局状态
+def randint(rng, low, high):
+    if rng is None:
+        return np.random.randint(low, high)
+    return int(rng.integers(low, high))
+
+#需要出牌历史(PlayRecords.records)的模型
+AI_MODELS = ("douzero", "alphadou")
+
+#"solver+X": 剩余牌少时用残局求解(solver.py), 没有必胜走法时由X出牌
+#单独"solver"时X为random
+def base_model(model):
+    if model == "solver":
+        return "random"
+    if model.startswith("solver+"):
+        return model[len("solver+"):]
+    return model
+
+#自己生成合法出牌的模型: AI模型用MovesGener, pimc用solver的打包出牌
+OWN_MOVES_MODELS = AI_MODELS + ("pimc",)
+
+#这些模型Player不再生成原生出牌列表
+def generates_own_moves(model):
+    return base_model(model) in OWN_MOVES_MODELS
 
-    if model == "random":
-        return choose_random(next_move_types, next_moves, last_move_type)
+#在Player的next_moves中选择出牌方法
+def choose(next_move_types, next_moves, last_move_type, model, player=None, playrecords=None,
+           last_move=None):
+
+    if model.startswith("solver"):
+        from solver import Solver
+        chosen = Solver.instance().choose(last_move_type, last_move, player, playrecords)
+        if chosen is not None:
+            return chosen
+        return choose(next_move_types, next_moves, last_move_type, base_model(model),
+                      player=player, playrecords=playrecords, last_move=last_move)
+    elif model == "pimc":
+        from pimc import PIMC
+        return PIMC.instance().choose(last_move_type, last_move, player, playrecords)
+    elif model == "random":
+        return choose_random(next_move_types, next_moves, last_move_type,
+                             rng=getattr(player, 'rng', None))
+    elif model == "greedy":
+        return choose_greedy(next_move_types, next_moves)
     elif model == "douzero":
         from ai_adapter import DouZeroAdapter
         return DouZeroAdapter.instance().choose(
@@ -60,8 +114,52 @@ def choose(next_move_types, next_moves, last_move_type, model, player=None, play
             next_move_types, next_moves, last_move_type, player, playrecords
         )
 
+#惰性出牌生成器中选择出牌方法, total_moves为RankMoves
+def choose_lazy(total_moves, last_move_type, last_move, model, player=None, playrecords=None):
+
+    #求解失败时base模型仍按惰性方式出牌
+    if model.startswith("solver"):
+        from solver import Solver
+        chosen = Solver.instance().choose(last_move_type, last_move, player, playrecords)
+        if chosen is not None:
+            return chosen
+        return choose_lazy(total_moves, last_move_type, last_move, base_model(model),
+                           player=player, playrecords=playrecords)
+
+    #random/greedy只需要一个出牌, 不展开全部出牌
+    if model == "random":
+        return total_moves.sample_next_move(last_move_type, last_move,
+                                            rng=getattr(player, 'rng', None))
+    elif model == "greedy":
+        for move in total_moves.iter_next_moves(last_move_type, last_move):
+            return move.type, move
+        return "yaobuqi", []
+
+    #AI模型和pimc自己生成合法出牌
+    if generates_own_moves(model):
+        return choose(None, [], last_move_type, model,
+                      player=player, playrecords=playrecords, last_move=last_move)
+
+    #其他模型需要完整列表
+    next_moves = list(total_moves.iter_next_moves(last_move_type, last_move))
+    return choose(None, next_moves, last_move_type, model,
+                  player=player, playrecords=playrecords, last_move=last_move)
+
+#next_move_types为None时出牌是Move, 牌型取move.type
+def move_type_of(next_move_types, next_moves, i):
+    if next_move_types is None:
+        return next_moves[i].type
+    return next_move_types[i]
+
+#greedy: 出第一个可出的牌(最小的单张/同牌型最小的), 能出就不会不要
+def choose_greedy(next_move_types, next_moves):
+    #要不起
+    if len(next_moves) == 0:
+        return "yaobuqi", []
+    return move_type_of(next_move_types, next_moves, 0), next_moves[0]
+
 #random
-def choose_random(next_move_types, next_moves, last_move_type):
+def choose_random(next_move_types, next_moves, last_move_type, rng=None):
     #要不起
     if len(next_moves) == 0:
         return "yaobuqi", []
@@ -71,27 +169,28 @@ def choose_random(next_move_types, next_moves, last_move_type):
             r_max = len(next_moves)
         else:
             r_max = len(next_moves)+1
-        r = np.random.randint(0,r_max)
+        r = randint(rng, 0, r_max)
         #添加不要
         if r == len(next_moves):
             return "buyao", []
 
-    return next_move_types[r], next_moves[r]
+    return move_type_of(next_move_types, next_moves, r), next_moves[r]
 
 #发牌 (标准斗地主规则: 17+17+17+3底牌)
-def game_init(players, playrecords, cards):
+def game_init(players, playrecords, cards, rng=None):
 
-    #洗牌
-    np.random.shuffle(cards.cards)
+    #洗牌(只打乱牌序下标)
+    (np.random if rng is None else rng).shuffle(cards.deck)
+    deck = cards.cards
 
     #每人17张
-    p1_cards = list(cards.cards[:17])
-    p2_cards = list(cards.cards[17:34])
-    p3_cards = list(cards.cards[34:51])
-    dizhu_cards = list(cards.cards[51:])  # 3张底牌
+    p1_cards = deck[:17]
+    p2_cards = deck[17:34]
+    p3_cards = deck[34:51]
+    dizhu_cards = deck[51:]  # 3张底牌
 
     #随机选地主
-    dizhu_id = np.random.randint(1, 4)  # 1, 2, 或 3
+    dizhu_id = randint(rng, 1, 4)  # 1, 2, 或 3
 
     #底牌给地主 (地主共20张)
     if dizhu_id == 1:
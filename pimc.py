@@ -0,0 +1,402 @@
+# -*- coding: utf-8 -*-
+"""
+Perfect-information Monte Carlo: the "pimc" model.
+
+Usage:
+    python pimc.py [--positions N] [--samples S] [--budget SECONDS]
+                   [--workers W] [--policy greedy|random] [--seed S]
+
+The player to act only knows its own hand, the cards already played (so
+the union of the other two hands), how many cards each of them holds, and
+which 底牌 the dizhu has not played yet.  A decision:
+
+1. deals the unknown cards to the other two seats at random, consistent
+   with that knowledge (a determinization), ``samples`` times;
+2. for every candidate move (the legal moves, plus "buyao" when
+   answering) plays it and finishes the game with a cheap rollout policy
+   on every determinization; all candidates share the same
+   determinizations and rollout seeds;
+3. picks the candidate whose side wins most often.
+
+Samples are split over a process pool; each chunk stops at the shared
+deadline (``time_budget`` seconds), so the budget holds whatever the
+number of workers.  Positions use solver's layout (packed hands, seats
+rotated so the dizhu is seat 0).  The same search serves choose() in
+simulation (Position.from_playrecords) and the assistant's suggest
+command (Position.from_game_state).
+"""
+
+import argparse
+import atexit
+import multiprocessing
+import os
+import random
+import time
+
+import numpy as np
+
+from ai_adapter import RANK_TO_DZ, DZ_TO_RANK
+from rank_moves import UNIT, answer_moves, hand_counts, pack, rival_move, unpack
+
+DEFAULT_SAMPLES = 40
+DEFAULT_TIME_BUDGET = 1.0
+ROLLOUT_POLICIES = ("greedy", "random")
+#可出牌缓存上限(每个进程)
+LEGAL_CACHE_SIZE = 200000
+
+_legal = {}
+
+
+def legal(hand, rival):
+    """answer_moves with a per-process cache."""
+    key = (hand, rival)
+    moves = _legal.get(key)
+    if moves is None:
+        if len(_legal) >= LEGAL_CACHE_SIZE:
+            _legal.clear()
+        moves = _legal[key] = answer_moves(hand, rival)
+    return moves
+
+
+def ranks_packed(ranks):
+    """Packed counts of a list of Card.rank values."""
+    return sum(UNIT[rank] for rank in ranks)
+
+
+def classify(packed):
+    """Unbound Move of a played rank multiset (first matching type)."""
+    for move in legal(packed, None):
+        if move.packed == packed:
+            return move
+    raise ValueError("not a legal move: %s" % unpack(packed))
+
+
+def rollout(hands, turn, rival, owner, policy, rng):
+    """Finish the game from a position; True if the dizhu (seat 0) wins.
+
+    "greedy" plays the first legal move (smallest, like choose_greedy),
+    "random" draws uniformly over the legal moves plus "buyao".
+    """
+    hands = list(hands)
+    greedy = policy == "greedy"
+    while True:
+        hand = hands[turn]
+        moves = legal(hand, rival)
+        if greedy:
+            move = moves[0] if moves else None
+        else:
+            n = len(moves) + (rival is not None)
+            r = int(rng.random() * n)
+            move = moves[r] if r < len(moves) else None
+        if move is None:
+            turn = (turn + 1) % 3
+            if turn == owner:
+                rival = None
+            continue
+        hands[turn] = hand - move.packed
+        if not hands[turn]:
+            return turn == 0
+        rival, owner = move, turn
+        turn = (turn + 1) % 3
+
+
+class Position(object):
+    """
+    一个决策点: 当前玩家已知的信息, 座位按地主为0旋转
+    """
+    def __init__(self, turn, hand, unknown, counts, dizhu_known, rival, owner):
+        #当前玩家座位
+        self.turn = turn
+        #当前玩家手牌(压缩计数)
+        self.hand = hand
+        #另外两家的未知牌(点数列表, 不含地主未出的底牌)
+        self.unknown = unknown
+        #各座位剩余张数
+        self.counts = counts
+        #地主手里一定有的底牌点数(当前玩家是地主时为空)
+        self.dizhu_known = dizhu_known
+        #要压的牌(None为首出)和出牌者
+        self.rival = rival
+        self.owner = owner
+
+    @classmethod
+    def from_playrecords(cls, player, playrecords, last_move_type, last_move):
+        """The decision of ``player`` in a simulated game.
+
+        Only the union of the other hands is used, which is what the
+        played cards already tell.
+        """
+        dizhu = playrecords.dizhu_id - 1
+        hands_by_id = (playrecords.cards_left1, playrecords.cards_left2, playrecords.cards_left3)
+        seats = [hands_by_id[(dizhu + seat) % 3] for seat in range(3)]
+        turn = (player.player_id - 1 - dizhu) % 3
+        unknown = [card.rank for seat in range(3) if seat != turn for card in seats[seat]]
+        dizhu_known = []
+        if turn != 0:
+            dizhu_known = [card.rank for card in playrecords.dizhu_cards if card in seats[0]]
+            for rank in dizhu_known:
+                unknown.remove(rank)
+        rival = rival_move(last_move_type, last_move)
+        owner = turn if rival is None else (turn - 1 - playrecords.passes) % 3
+        return cls(turn, pack(hand_counts(seats[turn])), unknown,
+                   [len(cards) for cards in seats], dizhu_known, rival, owner)
+
+    @classmethod
+    def from_game_state(cls, gs):
+        """The assistant's decision (game_state.GameState, DouZero ints)."""
+        from game_state import TURN_ORDER
+        turn = TURN_ORDER.index(gs.my_position)
+        unknown = [DZ_TO_RANK[c] for c in gs.get_other_hand_cards()]
+        dizhu_known = []
+        if turn != 0:
+            played = list(gs.played_cards['landlord'])
+            for c in gs.dizhu_cards:
+                if c in played:
+                    played.remove(c)
+                else:
+                    dizhu_known.append(DZ_TO_RANK[c])
+            for rank in dizhu_known:
+                unknown.remove(rank)
+        #末尾连续不要的次数
+        passes = 0
+        for _, action in reversed(gs.play_history):
+            if action:
+                break
+            passes += 1
+        rival_cards = gs.get_rival_move()
+        rival = None
+        owner = turn
+        if rival_cards and passes < 2:
+            rival = classify(ranks_packed(DZ_TO_RANK[c] for c in rival_cards))
+            owner = (turn - 1 - passes) % 3
+        return cls(turn, ranks_packed(DZ_TO_RANK[c] for c in gs.my_hand), unknown,
+                   [gs.cards_left[p] for p in TURN_ORDER], dizhu_known, rival, owner)
+
+    def candidates(self):
+        """Legal moves, plus None ("buyao") when answering."""
+        moves = list(legal(self.hand, self.rival))
+        if self.rival is not None:
+            moves.append(None)
+        return moves
+
+    def sample(self, rng):
+        """Packed hands of one determinization."""
+        pool = list(self.unknown)
+        rng.shuffle(pool)
+        hands = [0, 0, 0]
+        hands[self.turn] = self.hand
+        i = 0
+        for seat in range(3):
+            if seat == self.turn:
+                continue
+            fixed = self.dizhu_known if seat == 0 else []
+            need = self.counts[seat] - len(fixed)
+            hands[seat] = ranks_packed(fixed) + ranks_packed(pool[i:i + need])
+            i += need
+        return tuple(hands)
+
+
+def evaluate(position, candidates, samples, deadline, policy, seed):
+    """Wins of every candidate over up to ``samples`` determinizations.
+
+    Returns (wins per candidate, determinizations played).  Stops early at
+    ``deadline`` (time.time()), after at least one determinization.
+    """
+    rng = random.Random(seed)
+    wins = [0] * len(candidates)
+    turn = position.turn
+    nxt = (turn + 1) % 3
+    done = 0
+    while done < samples and (done == 0 or time.time() < deadline):
+        hands = position.sample(rng)
+        rollout_seed = rng.random()
+        for i, move in enumerate(candidates):
+            rng_i = random.Random(rollout_seed)
+            if move is None:
+                rival = None if nxt == position.owner else position.rival
+                dizhu_win = rollout(hands, nxt, rival, position.owner, policy, rng_i)
+            elif move.packed == position.hand:
+                dizhu_win = turn == 0
+            else:
+                rest = list(hands)
+                rest[turn] -= move.packed
+                dizhu_win = rollout(rest, nxt, move, turn, policy, rng_i)
+            wins[i] += dizhu_win == (turn == 0)
+        done += 1
+    return wins, done
+
+
+def _evaluate(args):
+    return evaluate(*args)
+
+
+def default_workers():
+    """os.cpu_count() in a main process, 1 inside a pool worker.
+
+    tournament/arena workers already keep every core busy with games, and
+    a daemonic pool worker cannot start a pool of its own.
+    """
+    if multiprocessing.current_process().daemon:
+        return 1
+    return os.cpu_count() or 1
+
+
+class PIMC(object):
+    """Determinized rollout search, optionally over a process pool."""
+    _instance = None
+
+    def __init__(self, samples=DEFAULT_SAMPLES, time_budget=DEFAULT_TIME_BUDGET,
+                 workers=None, policy="greedy"):
+        if policy not in ROLLOUT_POLICIES:
+            raise ValueError("policy must be one of %s" % (ROLLOUT_POLICIES,))
+        #每次决策的采样数(确定化次数)和时间上限(秒)
+        self.samples = samples
+        self.time_budget = time_budget
+        #workers为1时在本进程内计算, None为default_workers()
+        self.workers = workers or default_workers()
+        self.policy = policy
+        self._pool = None
+
+        #统计
+        self.decisions = 0
+        self.rollouts = 0
+        self.seconds = 0.0
+        self.last_rollouts = 0
+        self.last_seconds = 0.0
+
+    @classmethod
+    def instance(cls):
+        """Process-wide default instance (default_workers() workers)."""
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    @classmethod
+    def configure(cls, **kwargs):
+        """Replace the process-wide instance with new settings."""
+        if cls._instance is not None:
+            cls._instance.close()
+        cls._instance = cls(**kwargs)
+        return cls._instance
+
+    def close(self):
+        """Stop the worker pool and wait for its processes; idempotent."""
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+            atexit.unregister(self.close)
+
+    def search(self, position, seed=None):
+        """(best candidate, win rate per candidate) for a Position.
+
+        The best candidate is a Move or None for "buyao"; a single
+        candidate is returned without rollouts.
+        """
+        candidates = position.candidates()
+        if len(candidates) <= 1:
+            return (candidates[0] if candidates else None), [1.0] * len(candidates)
+
+        begin = time.perf_counter()
+        deadline = time.time() + self.time_budget
+        if seed is None:
+            seed = random.getrandbits(62)
+        chunks = min(self.workers, self.samples)
+        tasks = [(position, candidates, self.samples // chunks + (k < self.samples % chunks),
+                  deadline, self.policy, seed * chunks + k) for k in range(chunks)]
+        if chunks == 1:
+            results = [_evaluate(tasks[0])]
+        else:
+            if self._pool is None:
+                self._pool = multiprocessing.Pool(self.workers)
+                #调用者没有close()时, 退出前回收工作进程
+                atexit.register(self.close)
+            results = self._pool.map(_evaluate, tasks)
+
+        wins = np.sum([w for w, _ in results], axis=0)
+        done = sum(n for _, n in results)
+        best = int(np.argmax(wins))
+
+        self.decisions += 1
+        self.last_rollouts = done * len(candidates)
+        self.last_seconds = time.perf_counter() - begin
+        self.rollouts += self.last_rollouts
+        self.seconds += self.last_seconds
+        return candidates[best], list(wins / done)
+
+    def choose(self, last_move_type, last_move, player, playrecords):
+        """choose() entry: (move_type, move) for ``player``."""
+        position = Position.from_playrecords(player, playrecords, last_move_type, last_move)
+        candidates = position.candidates()
+        if not candidates:
+            return "yaobuqi", []
+        rng = getattr(player, 'rng', None)
+        seed = None if rng is None else int(rng.integers(1 << 62))
+        move, _ = self.search(position, seed)
+        if playrecords.level == "full":
+            #Player不再生成出牌列表, 记录的可选出牌由这里填入
+            player.next_moves = [candidate for candidate in candidates if candidate is not None]
+        if move is None:
+            return "buyao", []
+        return move.type, move
+
+    def suggest(self, gs):
+        """Assistant entry: suggested move as sorted DouZero ints ([] = pass)."""
+        move, _ = self.search(Position.from_game_state(gs))
+        if move is None:
+            return []
+        return sorted(RANK_TO_DZ[rank + 1] for rank, n in enumerate(unpack(move.packed))
+                      for _ in range(n))
+
+    def stats(self):
+        return {
+            'decisions': self.decisions,
+            'rollouts': self.rollouts,
+            'seconds': self.seconds,
+            'rollouts_per_second': self.rollouts / self.seconds if self.seconds else 0.0,
+            'last_rollouts': self.last_rollouts,
+            'last_ms': 1000 * self.last_seconds,
+        }
+
+
+def game_positions(n, seed):
+    """Decision points taken from greedy self-play games (rank engine)."""
+    from main import Game
+    positions = []
+    rng = np.random.default_rng(seed)
+    while len(positions) < n:
+        game = Game("greedy", "rank", seed=int(rng.integers(1 << 31)), record="none")
+        game.game_start()
+        stop = int(rng.integers(0, 30))
+        turns = 0
+        while game.playrecords.winner == 0:
+            if turns == stop:
+                player = game.players[game.i]
+                positions.append(Position.from_playrecords(
+                    player, game.playrecords, game.last_move_type, game.last_move))
+                break
+            game.next_move()
+            turns += 1
+    return positions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--positions", type=int, default=20)
+    parser.add_argument("--samples", type=int, default=DEFAULT_SAMPLES)
+    parser.add_argument("--budget", type=float, default=DEFAULT_TIME_BUDGET)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--policy", default="greedy", choices=ROLLOUT_POLICIES)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    positions = game_positions(args.positions, args.seed)
+    for workers in sorted({1, args.workers}):
+        pimc = PIMC(args.samples, args.budget, workers, args.policy)
+        for k, position in enumerate(positions):
+            pimc.search(position, args.seed + k)
+        pimc.close()
+        stats = pimc.stats()
+        print(f"workers {workers}: {stats['decisions']} decisions, "
+              f"{stats['rollouts']} rollouts, {stats['rollouts_per_second']:.0f} rollouts/s, "
+              f"{1000 * stats['seconds'] / max(stats['decisions'], 1):.0f}ms/decision")
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+Per-phase timing probes for Game.next_move / Player.go.
+
+A Probes instance handed to Game(probes=...) is shared by the three
+players.  Each turn records the time spent in
+
+    construct        Moves()/RankMoves()/... construction
+    get_moves        full move generation for the hand
+    get_next_moves   answers to the rival move
+    choose           the model's decision (for the AI models split further
+                     into choose.infoset, choose.legal and choose.inference)
+    record_move      PlayRecords bookkeeping
+    turn             the whole Player.go call
+
+into one histogram per (model, role, phase).  Histograms are log-bucketed
+(8 buckets per octave, so p50/p99 are within about 5%), which keeps memory
+constant however many turns are played.
+
+Probes are off by default (Player.probes is None): every probe point is a
+single ``is not None`` test.  When on, a probe costs about 1us, so short
+phases (record_move, greedy choose) read a little high.
+"""
+
+import json
+import math
+import time
+
+PHASES = ("construct", "get_moves", "get_next_moves", "choose",
+          "choose.infoset", "choose.legal", "choose.inference", "record_move", "turn")
+
+#每倍频程的桶数
+BUCKETS_PER_OCTAVE = 8
+
+
+class Histogram(object):
+    """Count, sum and log-bucketed distribution of durations (seconds)."""
+    __slots__ = ("count", "total", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        #桶编号 → 次数, 桶k覆盖[2^(k/8), 2^((k+1)/8)) 纳秒
+        self.buckets = {}
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        ns = seconds * 1e9
+        k = int(math.log2(ns) * BUCKETS_PER_OCTAVE) if ns >= 1 else 0
+        self.buckets[k] = self.buckets.get(k, 0) + 1
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, q):
+        """Approximate q-th percentile (0-100) in seconds (bucket midpoint)."""
+        if not self.count:
+            return 0.0
+        rank = q / 100 * self.count
+        seen = 0
+        for k in sorted(self.buckets):
+            seen += self.buckets[k]
+            if seen >= rank:
+                return 2 ** ((k + 0.5) / BUCKETS_PER_OCTAVE) * 1e-9
+        return 0.0
+
+    def summary(self):
+        """JSON-friendly numbers, times in microseconds."""
+        return {
+            'count': self.count,
+            'total_ms': round(self.total * 1e3, 3),
+            'mean_us': round(self.mean * 1e6, 2),
+            'p50_us': round(self.percentile(50) * 1e6, 2),
+            'p99_us': round(self.percentile(99) * 1e6, 2),
+        }
+
+
+class Probes(object):
+    """
+    计时探针: (模型, 角色, 阶段) → Histogram
+    """
+    def __init__(self):
+        self.histograms = {}
+        #(模型, 角色) → {阶段: Histogram}
+        self._contexts = {}
+        #当前出牌的(模型, 角色)及其阶段表, Player.go开始时设置
+        self._context = ("", "")
+        self._active = {}
+
+    def begin(self, model, role):
+        """Set the (model, role) that the following laps belong to."""
+        self._context = (model, role)
+        active = self._contexts.get(self._context)
+        if active is None:
+            active = self._contexts[self._context] = {}
+        self._active = active
+
+    def start(self):
+        return time.perf_counter()
+
+    def lap(self, phase, since):
+        """Record the time since ``since`` under ``phase``; return now."""
+        now = time.perf_counter()
+        histogram = self._active.get(phase)
+        if histogram is None:
+            histogram = self._active[phase] = Histogram()
+            self.histograms[self._context + (phase,)] = histogram
+        histogram.add(now - since)
+        return now
+
+    def to_dict(self):
+        """{model: {role: {phase: summary}}}"""
+        result = {}
+        for (model, role, phase), histogram in sorted(
+                self.histograms.items(), key=lambda item: (item[0][:2], PHASES.index(item[0][2]))):
+            result.setdefault(model, {}).setdefault(role, {})[phase] = histogram.summary()
+        return result
+
+    def dump(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def show(self):
+        print(f"{'model/role':24s}{'phase':18s}{'count':>9s}{'mean us':>10s}"
+              f"{'p50 us':>10s}{'p99 us':>10s}{'total ms':>11s}")
+        for model, roles in self.to_dict().items():
+            for role, phases in roles.items():
+                for phase, row in phases.items():
+                    print(f"{model + '/' + role:24s}{phase:18s}{row['count']:9d}"
+                          f"{row['mean_us']:10.1f}{row['p50_us']:10.1f}{row['p99_us']:10.1f}"
+                          f"{row['total_ms']:11.1f}")
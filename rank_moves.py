@@ -0,0 +1,746 @@
+# -*- coding: utf-8 -*-
+"""Rank-count move generator.
+
+A hand is held as a 15-slot list where slot ``rank - 1`` is the number of
+cards of that Card.rank (1 = '3' ... 12 = 'A', 13 = '2', 14/15 = 小王/大王).
+Every move kind that ``Moves`` knows about is generated as a packed count
+vector: an int with 4 bits per rank, so building a move is a few integer
+additions.  Counts never exceed 4, which leaves the top bit of every slot
+free as a guard: ``fits(hand, move)`` checks all 15 ranks with a single
+subtraction.  Moves are handed out as interned ``Move`` values (type code,
+main rank, length, packed counts); no Card objects are touched until a
+chosen move is bound to a hand with ``Move.bind``.
+"""
+
+from bisect import bisect_right
+from enum import IntEnum
+from itertools import combinations
+from math import comb
+
+import numpy as np
+
+N_RANKS = 15
+RANK_BITS = 4
+RANK_MASK = (1 << RANK_BITS) - 1
+
+# Chains (shunzi / liandui / feiji) stop at 'A'
+MAX_CHAIN_RANK = 12
+XIAOWANG, DAWANG = 14, 15
+
+# Same order as Moves.get_next_moves uses for a free lead, bombs last
+MOVE_TYPES = ["dan", "dui", "san", "san_dai_yi", "san_dai_er",
+              "shunzi", "liandui", "feiji", "feiji_dai_dan",
+              "feiji_dai_dui", "si_dai_er", "si_dai_er_dui", "bomb"]
+
+# Int code of each type, in MOVE_TYPES order
+MoveType = IntEnum("MoveType", MOVE_TYPES, start=0)
+
+# All codes in MOVE_TYPES order (iterating the enum itself is slow)
+MOVE_CODES = tuple(MoveType)
+
+# Type name or code → MoveType
+TYPE_CODES = {move_type: MoveType[move_type] for move_type in MOVE_TYPES}
+TYPE_CODES.update({code: code for code in MOVE_CODES})
+
+# Types whose answer must have the same number of cards as the rival move
+CHAIN_TYPES = {"shunzi", "liandui", "feiji", "feiji_dai_dan", "feiji_dai_dui"}
+CHAIN_CODES = frozenset(TYPE_CODES[move_type] for move_type in CHAIN_TYPES)
+
+# Card.rank → Card.name (as used in Cards.cards_type)
+RANK_NAMES = ['3', '4', '5', '6', '7', '8', '9', '10', '11', '12', '13',
+              '1', '2', '14', '15']
+
+# UNIT[rank] is one card of that rank in packed form (index 0 unused)
+UNIT = [0] + [1 << (RANK_BITS * (r - 1)) for r in range(1, N_RANKS + 1)]
+# Top bit of every slot
+GUARD = sum(8 * unit for unit in UNIT)
+# All Card.rank values, ascending
+RANKS = range(1, N_RANKS + 1)
+
+
+# ============================================================
+#  Conversion utilities
+# ============================================================
+
+def hand_counts(cards):
+    """Count Card objects into a 15-slot rank list."""
+    counts = [0] * N_RANKS
+    for card in cards:
+        counts[card.rank - 1] += 1
+    return counts
+
+
+def pack(counts):
+    """15-slot count list → packed int."""
+    packed = 0
+    for i, n in enumerate(counts):
+        packed += n << (RANK_BITS * i)
+    return packed
+
+
+def unpack(packed):
+    """Packed int → 15-slot count list."""
+    return [(packed >> (RANK_BITS * i)) & RANK_MASK for i in range(N_RANKS)]
+
+
+def fits(hand, move):
+    """True if packed ``move`` only uses cards available in packed ``hand``.
+
+    With the guard bits set no slot can borrow from its neighbour, so a slot
+    keeps its guard bit exactly when hand count >= move count.
+    """
+    return ((hand | GUARD) - move) & GUARD == GUARD
+
+
+def main_rank(counts):
+    """Rank that decides who wins: the lowest rank holding the most cards.
+
+    Works for every move kind: the triple of san_dai_yi, the lowest triple of
+    a feiji, the four of si_dai_er, the low end of a chain, 小王 for 王炸.
+    """
+    top = max(counts)
+    return counts.index(top) + 1
+
+
+def describe(move):
+    """Return (main_rank, length) of a Move, Card list or packed int."""
+    if isinstance(move, Move):
+        return move.rank, move.length
+    if isinstance(move, int):
+        counts = unpack(move)
+        return main_rank(counts), sum(counts)
+    return main_rank(hand_counts(move)), len(move)
+
+
+def counts_to_cards(packed, cards_left):
+    """Pick the cards of a packed move out of ``cards_left``.
+
+    Takes the first cards of each rank in hand order, like Moves does, and
+    orders the result main rank first so ``move[0]`` keeps its meaning.
+    """
+    counts = unpack(packed)
+    need = list(counts)
+    picked = []
+    for card in cards_left:
+        if need[card.rank - 1]:
+            need[card.rank - 1] -= 1
+            picked.append(card)
+    picked.sort(key=lambda card: (-counts[card.rank - 1], card.rank))
+    return picked
+
+
+def counts_to_names(packed):
+    """Card names of a packed move, suits not yet assigned."""
+    counts = unpack(packed)
+    names = []
+    for rank in sorted(range(1, N_RANKS + 1),
+                       key=lambda r: (-counts[r - 1], r)):
+        names.extend([RANK_NAMES[rank - 1]] * counts[rank - 1])
+    return names
+
+
+# ============================================================
+#  Move value type
+# ============================================================
+
+class Move(object):
+    """
+    出牌: 牌型代码, 主牌点数, 张数, 压缩计数, 绑定后带扑克牌
+    """
+    __slots__ = ("type", "rank", "length", "packed", "cards")
+
+    def __init__(self, move_type, rank, length, packed, cards=None):
+        #MoveType
+        self.type = move_type
+        #主牌点数
+        self.rank = rank
+        #张数
+        self.length = length
+        #压缩计数
+        self.packed = packed
+        #分配花色后的扑克牌(tuple), 未绑定为None
+        self.cards = cards
+
+    @classmethod
+    def from_cards(cls, move_type, cards):
+        """Typed, bound Move of a Card list (``move_type`` name or code)."""
+        counts = hand_counts(cards)
+        return cls(TYPE_CODES[move_type], main_rank(counts), len(cards),
+                   pack(counts), tuple(cards))
+
+    #分配花色: 从手牌中取出对应的扑克牌
+    def bind(self, cards_left):
+        return Move(self.type, self.rank, self.length, self.packed,
+                    tuple(counts_to_cards(self.packed, cards_left)))
+
+    #去掉花色, 只保留点数(共用MOVES中的实例)
+    def unbound(self):
+        return MOVES[self.type][self.packed]
+
+    #牌名, 未绑定时按点数
+    def names(self):
+        if self.cards is None:
+            return counts_to_names(self.packed)
+        return [card.display for card in self.cards]
+
+    #绑定后可以像扑克牌列表一样使用
+    def __iter__(self):
+        if self.cards is None:
+            raise TypeError("move is not bound to cards")
+        return iter(self.cards)
+
+    def __getitem__(self, i):
+        if self.cards is None:
+            raise TypeError("move is not bound to cards")
+        return self.cards[i]
+
+    def __len__(self):
+        return self.length
+
+    #同一点数组合就是同一出牌, 与花色无关
+    def __eq__(self, other):
+        if not isinstance(other, Move):
+            return NotImplemented
+        return self.packed == other.packed and self.type == other.type
+
+    def __hash__(self):
+        return hash(self.packed)
+
+    def __repr__(self):
+        return "Move(%s, %s)" % (self.type.name, " ".join(self.names()))
+
+
+class MoveTable(dict):
+    """Interned unbound Moves of one type, keyed by packed counts.
+
+    Like Card, an unbound Move is a value shared by every hand, engine and
+    game; rank and length are derived from the counts on first use.
+    """
+    __slots__ = ("type",)
+
+    def __init__(self, move_type):
+        dict.__init__(self)
+        self.type = move_type
+
+    def __missing__(self, packed):
+        counts = unpack(packed)
+        move = self[packed] = Move(self.type, main_rank(counts), sum(counts), packed)
+        return move
+
+
+# MOVES[type code][packed] → Move
+MOVES = [MoveTable(code) for code in MOVE_CODES]
+
+
+def index_key(move_type, length):
+    """Bucket key of a move type code: chains are split by length, others not.
+
+    Bombs stay in one bucket although 王炸 has 2 cards and a four has 4,
+    since they answer each other on main rank alone.
+    """
+    return move_type, length if move_type in CHAIN_CODES else 0
+
+
+def _runs(ranks, min_len):
+    """(first, last) of every run of consecutive chain ranks in ``ranks``.
+
+    ``ranks`` is ascending; runs shorter than ``min_len`` are left out.
+    Works on the ranks a hand holds (usually few) instead of scanning all
+    twelve chain ranks.
+    """
+    runs = []
+    first = prev = None
+    for rank in ranks:
+        if rank > MAX_CHAIN_RANK:
+            break
+        if prev is None or rank != prev + 1:
+            if prev is not None and prev - first >= min_len - 1:
+                runs.append((first, prev))
+            first = rank
+        prev = rank
+    if prev is not None and prev - first >= min_len - 1:
+        runs.append((first, prev))
+    return runs
+
+
+# SPAN[start][n]: one card of each rank start .. start + n - 1, packed
+SPAN = [[sum(UNIT[start:start + n]) for n in range(MAX_CHAIN_RANK + 1)]
+        for start in range(MAX_CHAIN_RANK + 1)]
+
+
+def _chains(counts, width, min_len):
+    """Yield (start_rank, length) for every chain of ranks with >= width cards."""
+    ranks = [r for r in range(1, MAX_CHAIN_RANK + 1) if counts[r - 1] >= width]
+    for first, last in _runs(ranks, min_len):
+        for length in range(min_len, last - first + 2):
+            for start in range(first, last - length + 2):
+                yield start, length
+
+
+# ============================================================
+#  Move families as blocks
+# ============================================================
+#
+# A block is (main_rank, length, body, pool, k): the moves of the block are
+# ``body + sum(combo)`` for every ``combo in combinations(pool, k)``.
+# Kicker-free families have an empty pool and k == 0, i.e. one move.
+
+# Cards per rank of the main part (dan/dui/san) or of each kicker
+_WIDTH = {"dan": 1, "dui": 2, "san": 3,
+          "san_dai_yi": 1, "san_dai_er": 2,
+          "feiji": 0, "feiji_dai_dan": 1, "feiji_dai_dui": 2,
+          "si_dai_er": 1, "si_dai_er_dui": 2}
+
+
+def family_blocks(counts, move_type, above=0, length=None):
+    """Yield the blocks of one family whose main rank is above ``above``.
+
+    ``length`` (number of cards) restricts chain families to one size.
+    """
+    if move_type in ("dan", "dui", "san"):
+        width = _WIDTH[move_type]
+        for r in range(above + 1, N_RANKS + 1):
+            if counts[r - 1] >= width:
+                yield r, width, width * UNIT[r], (), 0
+    elif move_type == "bomb":
+        if above < XIAOWANG and counts[XIAOWANG - 1] and counts[DAWANG - 1]:
+            yield XIAOWANG, 2, UNIT[XIAOWANG] + UNIT[DAWANG], (), 0
+        for r in range(above + 1, XIAOWANG):
+            if counts[r - 1] == 4:
+                yield r, 4, 4 * UNIT[r], (), 0
+    elif move_type in ("san_dai_yi", "san_dai_er"):
+        width = _WIDTH[move_type]
+        for s in range(above + 1, XIAOWANG):
+            if counts[s - 1] >= 3:
+                pool = [width * UNIT[r] for r in range(1, N_RANKS + 1)
+                        if r != s and counts[r - 1] >= width]
+                yield s, 3 + width, 3 * UNIT[s], pool, 1
+    elif move_type == "shunzi":
+        for start, n in _chains(counts, 1, 5):
+            if start > above and length in (None, n):
+                yield start, n, SPAN[start][n], (), 0
+    elif move_type == "liandui":
+        for start, n in _chains(counts, 2, 3):
+            if start > above and length in (None, n * 2):
+                yield start, n * 2, 2 * SPAN[start][n], (), 0
+    elif move_type in ("feiji", "feiji_dai_dan", "feiji_dai_dui"):
+        width = _WIDTH[move_type]
+        for start, n in _chains(counts, 3, 2):
+            if start <= above or length not in (None, n * (3 + width)):
+                continue
+            body = 3 * SPAN[start][n]
+            if not width:
+                yield start, n * 3, body, (), 0
+                continue
+            pool = [width * UNIT[r] for r in range(1, N_RANKS + 1)
+                    if not start <= r < start + n and counts[r - 1] >= width]
+            yield start, n * (3 + width), body, pool, n
+    elif move_type in ("si_dai_er", "si_dai_er_dui"):
+        width = _WIDTH[move_type]
+        for b in range(above + 1, XIAOWANG):
+            if counts[b - 1] == 4:
+                pool = [width * UNIT[r] for r in range(1, N_RANKS + 1)
+                        if r != b and counts[r - 1] >= width]
+                yield b, 4 + 2 * width, 4 * UNIT[b], pool, 2
+
+
+def block_size(block):
+    """Number of moves in a block, without expanding it."""
+    _, _, _, pool, k = block
+    return comb(len(pool), k)
+
+
+def block_move(block, index):
+    """The ``index``-th move of a block in combinations() order."""
+    _, _, body, pool, k = block
+    start = 0
+    while k:
+        # Moves that take pool[start] as their next kicker
+        with_first = comb(len(pool) - start - 1, k - 1)
+        if index < with_first:
+            body += pool[start]
+            k -= 1
+        else:
+            index -= with_first
+        start += 1
+    return body
+
+
+def answer_moves(hand, rival):
+    """Moves of packed ``hand`` that answer Move ``rival`` (None: free lead).
+
+    The same moves as RankMoves.get_next_moves, family by family in
+    MOVE_TYPES order, built straight from the packed counts (for searches
+    that never hold Card objects).
+    """
+    counts = unpack(hand)
+    if rival is None:
+        families = [(code, family_blocks(counts, MOVE_TYPES[code])) for code in MOVE_CODES]
+    else:
+        length = rival.length if rival.type in CHAIN_CODES else None
+        families = [(rival.type, family_blocks(counts, MOVE_TYPES[rival.type],
+                                               rival.rank, length))]
+        if rival.type != MoveType.bomb:
+            families.append((MoveType.bomb, family_blocks(counts, "bomb")))
+    moves = []
+    for code, blocks in families:
+        table = MOVES[code]
+        for _, _, body, pool, k in blocks:
+            if k == 0:
+                moves.append(table[body])
+            else:
+                moves.extend(table[body + sum(combo)] for combo in combinations(pool, k))
+    return moves
+
+
+def rival_move(last_move_type, last_move):
+    """Unbound Move of a rival move given as Card list or Move; None for "start"."""
+    if last_move_type == "start":
+        return None
+    packed = last_move.packed if isinstance(last_move, Move) else pack(hand_counts(last_move))
+    return MOVES[TYPE_CODES[last_move_type]][packed]
+
+
+# ============================================================
+#  "What beats this move" index
+# ============================================================
+
+class MoveIndex(object):
+    """Moves bucketed by index_key, each bucket sorted by main rank.
+
+    Answering a rival move is a dict lookup, a bisect on the bucket's main
+    ranks and a slice, instead of a scan over the whole family.
+    """
+    def __init__(self, buckets=None):
+        #index_key → [主牌点数列表, Move列表]
+        self.buckets = {} if buckets is None else buckets
+        #每种牌型的key(按张数排序), 用到时才整理
+        self._keys = None
+
+    def bucket(self, move_type, length=0):
+        """[ranks, moves] lists of a bucket, created empty if missing.
+
+        Callers append in ascending main rank, which is the order every
+        generator here produces moves of one length in.
+        """
+        key = (move_type, length)
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = [[], []]
+            self._keys = None
+        return bucket
+
+    def add(self, move_type, rank, length, packed):
+        """Append one move to its bucket."""
+        bucket = self.bucket(move_type, length if move_type in CHAIN_CODES else 0)
+        bucket[0].append(rank)
+        bucket[1].append(MOVES[move_type][packed])
+
+    @property
+    def keys(self):
+        """Type code → its bucket keys, shorter chains first."""
+        if self._keys is None:
+            self._keys = {code: [] for code in MOVE_CODES}
+            for key in sorted(self.buckets):
+                self._keys[key[0]].append(key)
+        return self._keys
+
+    def family(self, move_type):
+        """All moves of a type, shorter chains first."""
+        moves = []
+        for key in self.keys[move_type]:
+            moves.extend(self.buckets[key][1])
+        return moves
+
+    def all_moves(self):
+        """Every move in MOVE_TYPES order (keys sort by type code, then length)."""
+        moves = []
+        buckets = self.buckets
+        for key in sorted(buckets):
+            moves.extend(buckets[key][1])
+        return moves
+
+    def beating(self, move_type, rank, length):
+        """Moves of ``move_type`` with main rank above ``rank``.
+
+        ``length`` only matters for chain types.
+        """
+        bucket = self.buckets.get(index_key(move_type, length))
+        if bucket is None:
+            return []
+        ranks, moves = bucket
+        return moves[bisect_right(ranks, rank):]
+
+    def drop_unfit(self, hand, touched):
+        """Remove moves using a ``touched`` rank that no longer fit ``hand``."""
+        for bucket in self.buckets.values():
+            ranks, moves = bucket
+            keep = [i for i, move in enumerate(moves)
+                    if not move.packed & touched or fits(hand, move.packed)]
+            if len(keep) != len(moves):
+                bucket[0] = [ranks[i] for i in keep]
+                bucket[1] = [moves[i] for i in keep]
+
+    def __len__(self):
+        return sum(len(bucket[1]) for bucket in self.buckets.values())
+
+
+def _extend_chain(buckets, key, starts, moves):
+    """Append chains starting at ``starts`` (ascending) to a bucket."""
+    bucket = buckets.get(key)
+    if bucket is None:
+        buckets[key] = [list(starts), moves]
+    else:
+        bucket[0].extend(starts)
+        bucket[1].extend(moves)
+
+
+def _extend(buckets, key, rank, moves):
+    """Append ``moves`` (all of main rank ``rank``) to a bucket."""
+    if not moves:
+        return
+    bucket = buckets.get(key)
+    if bucket is None:
+        bucket = buckets[key] = [[], []]
+    bucket[0].extend([rank] * len(moves))
+    bucket[1].extend(moves)
+
+
+# ============================================================
+#  Move generator
+# ============================================================
+
+DAN, DUI, SAN, SAN_DAI_YI, SAN_DAI_ER, SHUNZI, LIANDUI, FEIJI, \
+    FEIJI_DAI_DAN, FEIJI_DAI_DUI, SI_DAI_ER, SI_DAI_ER_DUI, BOMB = MOVE_CODES
+
+# SINGLES[rank] ... FOURS[rank]: interned kicker-free Moves by main rank
+SINGLES = [None] + [MOVES[DAN][UNIT[r]] for r in RANKS]
+PAIRS = [None] + [MOVES[DUI][2 * UNIT[r]] for r in range(1, XIAOWANG)]
+TRIPLES = [None] + [MOVES[SAN][3 * UNIT[r]] for r in range(1, XIAOWANG)]
+FOURS = [None] + [MOVES[BOMB][4 * UNIT[r]] for r in range(1, XIAOWANG)]
+ROCKET = MOVES[BOMB][UNIT[XIAOWANG] + UNIT[DAWANG]]
+# TRIO_SINGLE[s][d] / TRIO_PAIR[s][d]: three of s with one / two of d
+TRIO_SINGLE = [None] + [[None] + [MOVES[SAN_DAI_YI][3 * UNIT[s] + UNIT[d]] if d != s else None
+                                  for d in RANKS] for s in range(1, XIAOWANG)]
+TRIO_PAIR = [None] + [[None] + [MOVES[SAN_DAI_ER][3 * UNIT[s] + 2 * UNIT[d]] if d != s else None
+                                for d in range(1, XIAOWANG)] for s in range(1, XIAOWANG)]
+# STRAIGHTS[start][n] / PAIR_CHAINS[start][n]: shunzi / liandui of n ranks
+STRAIGHTS = [[MOVES[SHUNZI][SPAN[start][n]] if 5 <= n <= MAX_CHAIN_RANK + 1 - start else None
+              for n in range(MAX_CHAIN_RANK + 1)] for start in range(MAX_CHAIN_RANK + 1)]
+PAIR_CHAINS = [[MOVES[LIANDUI][2 * SPAN[start][n]] if 3 <= n <= MAX_CHAIN_RANK + 1 - start else None
+                for n in range(MAX_CHAIN_RANK + 1)] for start in range(MAX_CHAIN_RANK + 1)]
+
+
+class RankMoves(object):
+    """
+    出牌类(点数计数版), 与Moves牌型相同, 每个出牌是一个Move
+    """
+    def __init__(self):
+        #当前手牌计数
+        self.counts = [0] * N_RANKS
+        self.hand = 0
+        #各牌型出牌, 按(牌型, 张数)分桶, 桶内按主牌排序
+        self.index = MoveIndex()
+
+        #下次出牌
+        self.next_moves = []
+        #下次出牌类型, Move自带牌型, 不再单独记录
+        self.next_moves_type = None
+
+    #只统计手牌, 不生成出牌(惰性模式)
+    def set_hand(self, cards_left):
+        counts = [0] * N_RANKS
+        hand = 0
+        for card in cards_left:
+            counts[card.rank - 1] += 1
+            hand += UNIT[card.rank]
+        self.counts = counts
+        self.hand = hand
+
+    #获取全部出牌列表
+    def get_moves(self, cards_left):
+        self.set_hand(cards_left)
+        counts = self.counts
+
+        ranks = [r for r in RANKS if counts[r - 1]]
+        duis = [r for r in ranks if counts[r - 1] >= 2]
+        sans = [r for r in duis if counts[r - 1] >= 3]
+        bombs = [r for r in sans if counts[r - 1] == 4]
+        #index_key → [主牌点数列表, Move列表], 各桶按主牌升序直接生成
+        buckets = {}
+
+        #单,对,三,炸弹
+        buckets[DAN, 0] = [ranks, [SINGLES[r] for r in ranks]]
+        if duis:
+            buckets[DUI, 0] = [duis, [PAIRS[r] for r in duis]]
+        if sans:
+            buckets[SAN, 0] = [sans, [TRIPLES[r] for r in sans]]
+        if counts[XIAOWANG - 1] and counts[DAWANG - 1]:
+            buckets[BOMB, 0] = [bombs + [XIAOWANG], [FOURS[r] for r in bombs] + [ROCKET]]
+        elif bombs:
+            buckets[BOMB, 0] = [list(bombs), [FOURS[r] for r in bombs]]
+
+        #三带一,三带二
+        if sans:
+            yi_ranks, yi_moves, er_ranks, er_moves = [], [], [], []
+            for s in sans:
+                row = TRIO_SINGLE[s]
+                yi_ranks.extend([s] * (len(ranks) - 1))
+                yi_moves.extend([row[d] for d in ranks if d != s])
+                row = TRIO_PAIR[s]
+                er_ranks.extend([s] * (len(duis) - 1))
+                er_moves.extend([row[d] for d in duis if d != s])
+            if yi_moves:
+                buckets[SAN_DAI_YI, 0] = [yi_ranks, yi_moves]
+            if er_moves:
+                buckets[SAN_DAI_ER, 0] = [er_ranks, er_moves]
+
+        #顺子,连对: 每个连续段按张数分桶, 桶内起点升序
+        if len(ranks) >= 5:
+            for first, last in _runs(ranks, 5):
+                for n in range(5, last - first + 2):
+                    starts = range(first, last - n + 2)
+                    _extend_chain(buckets, (SHUNZI, n), starts,
+                                  [STRAIGHTS[start][n] for start in starts])
+        if len(duis) >= 3:
+            for first, last in _runs(duis, 3):
+                for n in range(3, last - first + 2):
+                    starts = range(first, last - n + 2)
+                    _extend_chain(buckets, (LIANDUI, n * 2), starts,
+                                  [PAIR_CHAINS[start][n] for start in starts])
+
+        #飞机,飞机带单,飞机带对
+        if len(sans) >= 2:
+            feiji = MOVES[FEIJI]
+            feiji_dai_dan, feiji_dai_dui = MOVES[FEIJI_DAI_DAN], MOVES[FEIJI_DAI_DUI]
+            for first, last in _runs(sans, 2):
+                for n in range(2, last - first + 2):
+                    for start in range(first, last - n + 2):
+                        body = 3 * SPAN[start][n]
+                        _extend(buckets, (FEIJI, n * 3), start, [feiji[body]])
+                        wing_dans = [UNIT[r] for r in ranks if not start <= r < start + n]
+                        _extend(buckets, (FEIJI_DAI_DAN, n * 4), start,
+                                [feiji_dai_dan[body + sum(combo)]
+                                 for combo in combinations(wing_dans, n)])
+                        wing_duis = [2 * UNIT[r] for r in duis if not start <= r < start + n]
+                        _extend(buckets, (FEIJI_DAI_DUI, n * 5), start,
+                                [feiji_dai_dui[body + sum(combo)]
+                                 for combo in combinations(wing_duis, n)])
+
+        #四带两单,四带两对
+        if bombs:
+            si_dai_er, si_dai_er_dui = MOVES[SI_DAI_ER], MOVES[SI_DAI_ER_DUI]
+            for b in bombs:
+                body = 4 * UNIT[b]
+                _extend(buckets, (SI_DAI_ER, 0), b,
+                        [si_dai_er[body + x + y] for x, y in
+                         combinations([UNIT[r] for r in ranks if r != b], 2)])
+                _extend(buckets, (SI_DAI_ER_DUI, 0), b,
+                        [si_dai_er_dui[body + x + y] for x, y in
+                         combinations([2 * UNIT[r] for r in duis if r != b], 2)])
+
+        self.index = MoveIndex(buckets)
+
+    #出牌后同步, 只删除用到已出点数的出牌
+    def remove_cards(self, cards):
+        """Drop the moves that are no longer playable after ``cards`` left.
+
+        Taking cards out of a hand can only invalidate moves, never create
+        new ones: every family (including chains and kicker combinations) is
+        exactly the set of legal shapes that fit in the hand.  So the
+        persistent lists are refreshed by filtering, without re-enumerating.
+        """
+        touched = 0
+        for card in cards:
+            self.counts[card.rank - 1] -= 1
+            self.hand -= UNIT[card.rank]
+            touched |= RANK_MASK * UNIT[card.rank]
+        self.index.drop_unfit(self.hand, touched)
+
+    #获取下次出牌列表
+    def get_next_moves(self, last_move_type, last_move):
+        #没有last,全加上,bomb在MOVE_TYPES最后
+        if last_move_type == "start":
+            self.next_moves = self.index.all_moves()
+            return self.next_moves_type, self.next_moves
+
+        code = TYPE_CODES.get(last_move_type)
+        if code is None:
+            print("last_move_type_wrong")
+            self.next_moves = []
+            return self.next_moves_type, self.next_moves
+
+        #同牌型,主牌更大,连牌张数相同: 二分查找
+        last_rank, last_len = describe(last_move)
+        self.next_moves = self.index.beating(code, last_rank, last_len)
+
+        #除了bomb,都可以出炸
+        if code != BOMB:
+            bombs = self.index.buckets.get((BOMB, 0))
+            if bombs is not None:
+                self.next_moves = self.next_moves + bombs[1]
+
+        return self.next_moves_type, self.next_moves
+
+    #应对last_move需要生成的牌型及条件
+    def _next_blocks(self, last_move_type, last_move):
+        if last_move_type == "start":
+            for code, move_type in zip(MOVE_CODES, MOVE_TYPES):
+                for block in family_blocks(self.counts, move_type):
+                    yield code, block
+            return
+        code = TYPE_CODES.get(last_move_type)
+        if code is None:
+            print("last_move_type_wrong")
+            return
+        last_rank, last_len = describe(last_move)
+        length = last_len if code in CHAIN_CODES else None
+        for block in family_blocks(self.counts, MOVE_TYPES[code], last_rank, length):
+            yield code, block
+        #除了bomb,都可以出炸
+        if code != BOMB:
+            for block in family_blocks(self.counts, "bomb"):
+                yield BOMB, block
+
+    #惰性生成下次出牌, 只生成last_move_type相关牌型
+    def iter_next_moves(self, last_move_type, last_move):
+        """Yield the Moves that answer the rival move.
+
+        Built straight from the hand counts, family by family, so a caller
+        that stops early never pays for the kicker combinations after it.
+        """
+        for code, (_, _, body, pool, k) in self._next_blocks(last_move_type, last_move):
+            table = MOVES[code]
+            if k == 0:
+                yield table[body]
+            else:
+                for combo in combinations(pool, k):
+                    yield table[body + sum(combo)]
+
+    #均匀随机选一个出牌, 与choose_random同分布, 不展开出牌列表
+    def sample_next_move(self, last_move_type, last_move, rng=None):
+        """Pick uniformly among the legal moves plus "buyao" (unless leading).
+
+        Only block sizes are counted; the chosen move is built directly from
+        its combination index.  ``rng`` is a np.random.Generator, or None
+        for the global state.
+        """
+        blocks = list(self._next_blocks(last_move_type, last_move))
+        sizes = [comb(len(block[3]), block[4]) for _, block in blocks]
+        total = sum(sizes)
+        #要不起
+        if total == 0:
+            return "yaobuqi", []
+        #start不能不要
+        high = total if last_move_type == "start" else total + 1
+        r = np.random.randint(0, high) if rng is None else int(rng.integers(0, high))
+        if r == total:
+            return "buyao", []
+        for (code, block), size in zip(blocks, sizes):
+            if r < size:
+                return code, MOVES[code][block_move(block, r)]
+            r -= size
+
+    #转换成扑克牌
+    def to_cards(self, move, cards_left):
+        return move.bind(cards_left)
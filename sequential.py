@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""
+Sequential testing: stop a win-rate experiment once the answer is known.
+
+A SequentialTest is fed one observation per game (1/0 for a win, or the
+paired arena difference d_k in [-1, 1]) and keeps, after every game:
+
+- the running mean and a normal confidence interval;
+- Wald's log-likelihood ratio for
+
+      H0: mean = threshold - delta   against   H1: mean = threshold + delta
+
+  with stopping bounds log(beta / (1 - alpha)) and log((1 - beta) / alpha).
+  ``delta`` is the indifference zone: a true mean inside
+  threshold ± delta may be decided either way, outside it the wrong
+  decision has probability at most alpha (resp. beta).
+
+model="bernoulli" uses the exact Bernoulli likelihood (win / loss
+observations); model="normal" is the generalized SPRT with the sample
+variance, for observations that are not 0/1 such as paired differences.
+
+Both LLRs are linear in the observation sum, so the expected increment per
+game at the current mean gives Wald's projection of the games (and, with
+the measured rate, the time) still needed to reach a bound.
+"""
+
+import math
+import time
+from statistics import NormalDist
+
+ABOVE = "above"
+BELOW = "below"
+
+
+class SequentialTest(object):
+    """Online mean, confidence interval and SPRT over a stream of games."""
+    MODELS = ("bernoulli", "normal")
+
+    def __init__(self, threshold, delta=0.02, alpha=0.05, beta=0.05,
+                 confidence=0.95, model="bernoulli", min_games=30, unit="games"):
+        if model not in self.MODELS:
+            raise ValueError("model must be one of %s" % (self.MODELS,))
+        if delta <= 0:
+            raise ValueError("delta must be positive")
+        self.threshold = threshold
+        self.mu0 = threshold - delta
+        self.mu1 = threshold + delta
+        if model == "bernoulli" and not 0 < self.mu0 < self.mu1 < 1:
+            raise ValueError("threshold ± delta must lie inside (0, 1)")
+        self.alpha = alpha
+        self.beta = beta
+        self.lower = math.log(beta / (1 - alpha))
+        self.upper = math.log((1 - beta) / alpha)
+        self.z = NormalDist().inv_cdf(0.5 + confidence / 2)
+        self.confidence = confidence
+        self.model = model
+        #方差估计太少时不下结论
+        self.min_games = min_games
+        #进度里的计数单位(arena为"deals")
+        self.unit = unit
+
+        self.games = 0
+        #续跑时读回的观测, 不算进本次运行的速度
+        self.resumed = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.decision = None
+        #做出结论时的局数
+        self.decided_at = None
+        self.begin = time.perf_counter()
+
+    def add(self, x, resumed=False):
+        """Record one observation; return the decision (None while open).
+
+        ``resumed`` observations come from an earlier run: they count in
+        the test but not in this run's rate.
+        """
+        self.games += 1
+        self.resumed += resumed
+        self.total += x
+        self.total_sq += x * x
+        if self.decision is None and self.games >= self.min_games:
+            llr = self.llr()
+            if llr >= self.upper:
+                self.decision = ABOVE
+            elif llr <= self.lower:
+                self.decision = BELOW
+            if self.decision is not None:
+                self.decided_at = self.games
+        return self.decision
+
+    # ------------------------------------------------------------
+    #  Estimates
+    # ------------------------------------------------------------
+
+    @property
+    def mean(self):
+        return self.total / self.games if self.games else 0.0
+
+    def variance(self):
+        n = self.games
+        if n < 2:
+            return float('inf')
+        return max((self.total_sq - n * self.mean ** 2) / (n - 1), 0.0)
+
+    def half_width(self):
+        """Confidence half-width of the mean."""
+        if self.games < 2:
+            return float('inf')
+        return self.z * (self.variance() / self.games) ** 0.5
+
+    # ------------------------------------------------------------
+    #  SPRT
+    # ------------------------------------------------------------
+
+    def _llr(self, total, n):
+        """LLR of ``n`` observations summing to ``total``."""
+        if self.model == "bernoulli":
+            return (total * math.log(self.mu1 / self.mu0)
+                    + (n - total) * math.log((1 - self.mu1) / (1 - self.mu0)))
+        #方差为0(全胜/全负)时取一个下限, 避免除零
+        var = max(self.variance(), 1e-6)
+        return (self.mu1 - self.mu0) / var * (total - n * (self.mu0 + self.mu1) / 2)
+
+    def llr(self):
+        return self._llr(self.total, self.games) if self.games else 0.0
+
+    def games_to_decision(self):
+        """Wald's estimate of the further games needed to hit a bound.
+
+        0 once decided; inf when the current mean sits at the midpoint of
+        the hypotheses (no expected drift).
+        """
+        if self.decision is not None:
+            return 0
+        llr = self.llr()
+        drift = self._llr(self.mean, 1) if self.games else 0.0
+        if drift > 0:
+            remaining = (self.upper - llr) / drift
+        elif drift < 0:
+            remaining = (llr - self.lower) / -drift
+        else:
+            return float('inf')
+        return max(remaining, self.min_games - self.games, 0)
+
+    @property
+    def wall_seconds(self):
+        return time.perf_counter() - self.begin
+
+    def games_per_second(self):
+        wall = self.wall_seconds
+        return (self.games - self.resumed) / wall if wall > 0 else 0.0
+
+    def seconds_to_decision(self):
+        rate = self.games_per_second()
+        remaining = self.games_to_decision()
+        if remaining == 0:
+            return 0.0
+        return remaining / rate if rate else float('inf')
+
+    # ------------------------------------------------------------
+    #  Report
+    # ------------------------------------------------------------
+
+    def status(self, scale=100):
+        """One progress line; ``scale`` 100 prints means as percentages."""
+        hw = self.half_width()
+        line = (f"{self.games} {self.unit}: {self.mean*scale:.2f} ± {hw*scale:.2f} "
+                f"({self.confidence:.0%} CI), LLR {self.llr():+.2f} "
+                f"[{self.lower:.2f}, {self.upper:.2f}], "
+                f"{self.games_per_second():.1f} {self.unit}/s")
+        if self.decision is not None:
+            return line + f", decided: {self.decision} {self.threshold*scale:g}"
+        remaining = self.games_to_decision()
+        eta = self.seconds_to_decision()
+        if math.isinf(remaining):
+            return line + ", no decision in sight"
+        return line + f", ~{remaining:.0f} {self.unit} / {eta:.0f}s to decision"
+
+    def show(self, label="mean", scale=100):
+        print(f"SPRT {label} {self.threshold*scale:g} ± {(self.mu1-self.threshold)*scale:g}"
+              f" (alpha {self.alpha:g}, beta {self.beta:g}): "
+              + (f"{self.decision} after {self.decided_at} {self.unit}"
+                 if self.decision is not None else "undecided"))
+        print(self.status(scale))
@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+"""
+Exact endgame solver: the "solver" model.
+
+Usage:
+    python solver.py [--positions N] [--cards C] [--seed S]
+
+Once few cards are left, the game is searched exhaustively with all three
+hands known (perfect information).  Seats are rotated so the dizhu is seat
+0; a position is
+
+    (packed hands, seat to act, rival Move or None when leading, its owner)
+
+and its value is whether the dizhu wins with best play by both sides.  The
+search is a boolean minimax with alpha-beta cut-offs (the dizhu needs one
+winning move, a nongmin one move that beats the dizhu) and a transposition
+table on that key, shared across decisions and games.  Moves are generated
+from the packed counts (rank_moves.answer_moves), so no Card objects are
+touched while searching.
+
+As a model, "solver" plays a provably winning move when the cards left in
+all hands are at most ``max_cards`` and the search finishes within
+``max_nodes``; otherwise (too many cards, budget exceeded, or no winning
+line) the decision goes to the base model: "solver+douzero" falls back to
+douzero, plain "solver" to random.
+"""
+
+import argparse
+import time
+import numpy as np
+
+from rank_moves import answer_moves, hand_counts, pack, rival_move
+
+DEFAULT_MAX_CARDS = 12
+DEFAULT_MAX_NODES = 200000
+#置换表上限, 超过后整体清空
+DEFAULT_TABLE_SIZE = 1000000
+
+
+class _OutOfNodes(Exception):
+    pass
+
+
+class Solver(object):
+    """Perfect-information alpha-beta over packed hands."""
+    _instance = None
+
+    def __init__(self, max_cards=DEFAULT_MAX_CARDS, max_nodes=DEFAULT_MAX_NODES,
+                 table_size=DEFAULT_TABLE_SIZE):
+        #三家剩余牌总数不超过max_cards才求解
+        self.max_cards = max_cards
+        #每次求解的节点上限, 超过则放弃交给base模型
+        self.max_nodes = max_nodes
+        self.table_size = table_size
+        #置换表: 局面 → 地主是否必胜
+        self.table = {}
+        #(手牌, 对手出牌) → 有序的可出牌(None为不要)
+        self._legal = {}
+
+        #统计
+        self.nodes = 0
+        self.solves = 0
+        self.aborted = 0
+        self.wins_found = 0
+        self.seconds = 0.0
+        self.last_nodes = 0
+        self.last_seconds = 0.0
+        #当前求解的节点上限(直接调用dizhu_wins时不限)
+        self._budget = float('inf')
+
+    @classmethod
+    def instance(cls):
+        """Process-wide solver (its table is reused across games)."""
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    # ------------------------------------------------------------
+    #  Search
+    # ------------------------------------------------------------
+
+    def legal(self, hand, rival):
+        """Moves of packed ``hand`` answering ``rival`` (None: leading).
+
+        Ordered for the search: moves that empty the hand, then longer
+        moves first; None ("buyao") last when answering.
+        """
+        key = (hand, rival)
+        moves = self._legal.get(key)
+        if moves is not None:
+            return moves
+        moves = answer_moves(hand, rival)
+        moves.sort(key=lambda move: (move.packed != hand, -move.length))
+        if rival is not None:
+            moves.append(None)
+        self._legal[key] = moves
+        return moves
+
+    def dizhu_wins(self, hands, turn, rival, owner):
+        """Whether seat 0 (the dizhu) wins from this position."""
+        key = (hands, turn, rival, owner)
+        value = self.table.get(key)
+        if value is not None:
+            return value
+        self.nodes += 1
+        if self.nodes > self._budget:
+            raise _OutOfNodes()
+
+        #地主找一个必胜走法, 农民找一个让地主输的走法
+        goal = turn == 0
+        hand = hands[turn]
+        nxt = (turn + 1) % 3
+        value = not goal
+        for move in self.legal(hand, rival):
+            if move is None:
+                #不要; 另外两家都不要则由出牌者重新首出
+                child = self.dizhu_wins(hands, nxt, None if nxt == owner else rival, owner)
+            elif move.packed == hand:
+                child = goal
+            else:
+                rest = list(hands)
+                rest[turn] = hand - move.packed
+                child = self.dizhu_wins(tuple(rest), nxt, move, turn)
+            if child == goal:
+                value = goal
+                break
+
+        if len(self.table) >= self.table_size:
+            self.table.clear()
+            self._legal.clear()
+        self.table[key] = value
+        return value
+
+    def solve(self, hands, turn, rival, owner):
+        """Winning move for the side of seat ``turn``, or None.
+
+        Returns a Move, "buyao" when passing wins, or None if there is no
+        winning line or the node budget ran out.
+        """
+        begin = time.perf_counter()
+        start_nodes = self.nodes
+        self._budget = self.nodes + self.max_nodes
+        goal = turn == 0
+        nxt = (turn + 1) % 3
+        best = None
+        try:
+            for move in self.legal(hands[turn], rival):
+                if move is None:
+                    child = self.dizhu_wins(hands, nxt, None if nxt == owner else rival, owner)
+                elif move.packed == hands[turn]:
+                    child = goal
+                else:
+                    rest = list(hands)
+                    rest[turn] = hands[turn] - move.packed
+                    child = self.dizhu_wins(tuple(rest), nxt, move, turn)
+                if child == goal:
+                    best = "buyao" if move is None else move
+                    break
+        except _OutOfNodes:
+            self.aborted += 1
+        finally:
+            self._budget = float('inf')
+        self.solves += 1
+        self.wins_found += best is not None
+        self.last_nodes = self.nodes - start_nodes
+        self.last_seconds = time.perf_counter() - begin
+        self.seconds += self.last_seconds
+        return best
+
+    # ------------------------------------------------------------
+    #  Model interface
+    # ------------------------------------------------------------
+
+    def choose(self, last_move_type, last_move, player, playrecords):
+        """(move_type, move) of a winning line for ``player``, or None.
+
+        None when too many cards are left or no win was proven; the caller
+        then asks the base model.
+        """
+        hands_by_id = (playrecords.cards_left1, playrecords.cards_left2, playrecords.cards_left3)
+        if sum(len(cards) for cards in hands_by_id) > self.max_cards:
+            return None
+        #座位按地主为0旋转
+        dizhu = playrecords.dizhu_id - 1
+        hands = tuple(pack(hand_counts(hands_by_id[(dizhu + seat) % 3])) for seat in range(3))
+        turn = (player.player_id - 1 - dizhu) % 3
+        rival = rival_move(last_move_type, last_move)
+        #上一手牌的出牌者: 之后连续不要了passes次
+        owner = turn if rival is None else (turn - 1 - playrecords.passes) % 3
+
+        move = self.solve(hands, turn, rival, owner)
+        if move is None:
+            return None
+        if move == "buyao":
+            return "buyao", []
+        return move.type, move
+
+    def stats(self):
+        return {
+            'solves': self.solves,
+            'wins_found': self.wins_found,
+            'aborted': self.aborted,
+            'nodes': self.nodes,
+            'seconds': self.seconds,
+            'nodes_per_solve': self.nodes / self.solves if self.solves else 0.0,
+            'ms_per_solve': 1000 * self.seconds / self.solves if self.solves else 0.0,
+            'last_nodes': self.last_nodes,
+            'last_ms': 1000 * self.last_seconds,
+            'table_size': len(self.table),
+        }
+
+
+def random_endgame(rng, n_cards):
+    """Random dizhu-to-lead position with ``n_cards`` cards in all hands."""
+    deck = np.repeat(np.arange(1, 16), [4] * 13 + [1, 1])
+    cards = rng.choice(deck, n_cards, replace=False)
+    seats = rng.integers(0, 3, n_cards)
+    seats[:3] = [0, 1, 2]
+    hands = []
+    for seat in range(3):
+        counts = [0] * 15
+        for rank in cards[seats == seat]:
+            counts[rank - 1] += 1
+        hands.append(pack(counts))
+    return tuple(hands)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--positions", type=int, default=200)
+    parser.add_argument("--cards", type=int, default=DEFAULT_MAX_CARDS)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-nodes", type=int, default=DEFAULT_MAX_NODES)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    solver = Solver(args.cards, args.max_nodes)
+    times = []
+    nodes = []
+    for _ in range(args.positions):
+        hands = random_endgame(rng, args.cards)
+        solver.solve(hands, 0, None, 0)
+        times.append(solver.last_seconds)
+        nodes.append(solver.last_nodes)
+    stats = solver.stats()
+    print(f"Positions: {args.positions} ({args.cards} cards, dizhu to lead)")
+    print(f"Dizhu wins proven: {stats['wins_found']}, aborted: {stats['aborted']}")
+    print(f"Nodes/solve: mean {np.mean(nodes):.0f}, max {max(nodes)}")
+    print(f"Time/solve: mean {np.mean(times)*1000:.2f}ms, "
+          f"p99 {np.percentile(times, 99)*1000:.2f}ms")
+    print(f"Table: {stats['table_size']} positions")
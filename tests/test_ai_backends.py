@@ -0,0 +1,85 @@
+"""Two ``douzero`` packages side by side (ai_adapter._Backend)."""
+
+import threading
+
+import pytest
+
+import ai_adapter
+
+FILES = {
+    "__init__.py": "",
+    "env/__init__.py": "",
+    "env/tag.py": "NAME = {name!r}\n",
+    "env/move_generator.py": (
+        "from douzero.env.tag import NAME\n"
+        "class MovesGener(object):\n"
+        "    repo = NAME\n"
+    ),
+    "evaluation/__init__.py": "",
+    "evaluation/deep_agent.py": (
+        "class DeepAgent(object):\n"
+        "    def act(self, infoset):\n"
+        "        import douzero.env.tag as tag\n"
+        "        from douzero.env.tag import NAME\n"
+        "        return tag.NAME, NAME\n"
+    ),
+}
+
+
+@pytest.fixture
+def backends(tmp_path):
+    made = []
+    for name in ("FakeA", "FakeB"):
+        root = tmp_path / name / "douzero"
+        for path, text in FILES.items():
+            (root / path).parent.mkdir(parents=True, exist_ok=True)
+            (root / path).write_text(text.format(name=name))
+        backend = ai_adapter._Backend(name, str(root))
+        ai_adapter._BackendFinder.install().backends[backend.prefix] = backend
+        made.append(backend)
+    yield made
+    finder = ai_adapter._BackendFinder.install()
+    for backend in made:
+        del finder.backends[backend.prefix]
+
+
+def test_modules_stay_separate(backends):
+    a, b = backends
+    gen_a = a.import_module("env.move_generator").MovesGener
+    gen_b = b.import_module("env.move_generator").MovesGener
+    assert (gen_a.repo, gen_b.repo) == ("FakeA", "FakeB")
+    assert gen_a.__module__ == "douzero_FakeA.env.move_generator"
+
+
+def test_function_level_import_after_loading(backends):
+    a, b = backends
+    agent_a = a.import_module("evaluation.deep_agent").DeepAgent()
+    agent_b = b.import_module("evaluation.deep_agent").DeepAgent()
+    with a.active():
+        assert agent_a.act(None) == ("FakeA", "FakeA")
+    with b.active():
+        assert agent_b.act(None) == ("FakeB", "FakeB")
+    #不在active()中: 别名不知道该用哪个backend
+    with pytest.raises((AttributeError, ImportError)):
+        agent_a.act(None)
+
+
+def test_backends_in_threads(backends):
+    agents = [(backend, backend.import_module("evaluation.deep_agent").DeepAgent())
+              for backend in backends]
+    errors = []
+    barrier = threading.Barrier(len(agents))
+
+    def run(backend, agent):
+        barrier.wait()
+        for _ in range(200):
+            with backend.active():
+                if agent.act(None) != (backend.repo_name, backend.repo_name):
+                    errors.append(backend.repo_name)
+
+    threads = [threading.Thread(target=run, args=pair) for pair in agents]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
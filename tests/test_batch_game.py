@@ -0,0 +1,75 @@
+"""BatchedGames (batch_game.py) against main.Game with the rank engine."""
+
+import numpy as np
+import pytest
+
+from batch_game import BatchedGames
+from main import Game
+from move_catalogue import MoveCatalogue
+from rank_moves import hand_counts
+
+
+class ScriptedDraws(object):
+    """Stands in for BatchedGames.rng in step(): each draw picks a given option."""
+
+    def __init__(self):
+        self.index = None
+        self.options = None
+
+    def random(self, n):
+        assert n == 1
+        #step()按floor(u * options)选第index个选项
+        return np.array([(self.index + 0.5) / self.options])
+
+
+def game_turns(seed):
+    """Play a seeded random Game; its deal and every turn's (seat, legal set, move)."""
+    game = Game("random", "rank", seed=seed, record="full")
+    game.game_start()
+    counts = [hand_counts(player.cards_left) for player in game.players]
+    while game.playrecords.winner == 0:
+        game.next_move()
+    records = game.playrecords
+    history = {1: iter(records.next_moves1), 2: iter(records.next_moves2),
+               3: iter(records.next_moves3)}
+    turns = []
+    for pid, move in records.records:
+        legal = {(int(m.type), m.packed) for m in next(history[pid])}
+        played = None if isinstance(move, str) else (int(move.type), move.packed)
+        turns.append((pid - 1, legal, played))
+    return counts, records.dizhu_id - 1, turns, records.winner
+
+
+@pytest.mark.parametrize("seed", range(8))
+def test_batched_game_follows_game(seed):
+    catalogue = MoveCatalogue.instance()
+    counts, dizhu, turns, winner = game_turns(seed)
+
+    batch = BatchedGames(1, catalogue=catalogue)
+    draws = batch.rng = ScriptedDraws()
+    batch.target = 1
+    batch.place(np.array([0]), np.array([counts]), np.array([dizhu]))
+    for seat, legal, played in turns:
+        assert batch.active[0]
+        assert batch.cur[0] == seat
+        _, rows = batch.legal_moves(np.array([0]))
+        options = [(int(catalogue.types[row]), int(catalogue.packed[row])) for row in rows]
+        assert len(options) == len(set(options))
+        assert set(options) == legal
+        #出同一手牌, 或者不要(排在可出的牌之后)
+        draws.index = len(options) if played is None else options.index(played)
+        draws.options = len(options) + (not batch.lead[0])
+        batch.step()
+
+    assert not batch.active[0]
+    (dizhu_id, batch_winner, batch_turns), = np.concatenate(batch.results)
+    assert dizhu_id == dizhu + 1
+    assert batch_winner == winner
+    assert batch_turns == len(turns)
+
+
+def test_run_plays_every_game():
+    results = BatchedGames(16, seed=3).run(50)
+    assert len(results) == 50
+    assert set(results[:, 0]) <= {1, 2, 3} and set(results[:, 1]) <= {1, 2, 3}
+    assert (results[:, 2] >= 1).all()
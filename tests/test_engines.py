@@ -0,0 +1,90 @@
+"""Every move engine yields the same move set as Moves."""
+
+import random
+
+import pytest
+
+from benchmark import ScanMoves
+from myclass import CARD_TABLE, Moves, Player
+from rank_moves import RankMoves, TYPE_CODES, hand_counts, pack
+
+
+def by_rank(cards):
+    return sorted(cards, key=lambda card: card.rank)
+
+
+def cards_key(moves):
+    """Moves' (types, card lists) as sorted (type code, packed ranks)."""
+    types, cards = moves
+    return sorted((TYPE_CODES[t], pack(hand_counts(c))) for t, c in zip(types, cards))
+
+
+def moves_key(moves):
+    return sorted((int(move.type), move.packed) for move in moves)
+
+
+def reference(hand, last_move_type, last_move):
+    engine = Moves()
+    engine.get_moves(hand)
+    return cards_key(engine.get_next_moves(last_move_type, last_move))
+
+
+def rivals(rng, n):
+    """("start", "start") and n leads taken from random 20-card hands."""
+    found = [("start", "start")]
+    while len(found) <= n:
+        engine = Moves()
+        engine.get_moves(by_rank(rng.sample(CARD_TABLE, 20)))
+        types, moves = engine.get_next_moves("start", "start")
+        k = rng.randrange(len(moves))
+        found.append((types[k], moves[k]))
+    return found
+
+
+def fresh_moves(engine_cls, hand, last_move_type, last_move):
+    engine = engine_cls()
+    engine.get_moves(hand)
+    return engine.get_next_moves(last_move_type, last_move)[1]
+
+
+def lazy_moves(hand, last_move_type, last_move):
+    engine = RankMoves()
+    engine.set_hand(hand)
+    return engine.iter_next_moves(last_move_type, last_move)
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_fresh_engines_equal_moves(seed):
+    rng = random.Random(seed)
+    for _ in range(150):
+        hand = by_rank(rng.sample(CARD_TABLE, rng.choice([5, 10, 17, 20])))
+        for last_move_type, last_move in rivals(rng, 4):
+            expected = reference(hand, last_move_type, last_move)
+            for name, engine_cls in Player.ENGINES.items():
+                if name in ("cards", "lazy"):
+                    continue
+                got = fresh_moves(engine_cls, hand, last_move_type, last_move)
+                assert moves_key(got) == expected, (name, last_move_type)
+            got = fresh_moves(ScanMoves, hand, last_move_type, last_move)
+            assert moves_key(got) == expected, ("scan", last_move_type)
+            assert moves_key(lazy_moves(hand, last_move_type, last_move)) == expected, \
+                ("lazy", last_move_type)
+
+
+@pytest.mark.parametrize("engine", ["rank", "catalogue"])
+def test_persistent_engines_follow_played_cards(engine):
+    """rank and catalogue keep their moves across turns via remove_cards."""
+    rng = random.Random(engine)
+    for _ in range(60):
+        hand = by_rank(rng.sample(CARD_TABLE, 20))
+        moves = Player.ENGINES[engine]()
+        moves.get_moves(hand)
+        answers = rivals(rng, 2)
+        while hand:
+            for last_move_type, last_move in answers:
+                got = moves.get_next_moves(last_move_type, last_move)[1]
+                assert moves_key(got) == reference(hand, last_move_type, last_move)
+            #打出一手随机的牌
+            played = rng.choice(list(moves.get_next_moves("start", "start")[1])).bind(hand)
+            hand = [card for card in hand if card not in played]
+            moves.remove_cards(played)
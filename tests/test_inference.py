@@ -0,0 +1,161 @@
+"""InferenceBroker batching, and DouZero's batched forward pass."""
+
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from inference import InferenceBroker
+
+POSITIONS = ("landlord", "landlord_down", "landlord_up")
+
+
+class FakeAgent(object):
+    """act() of one infoset; act_batch() the same, recording each batch."""
+
+    def __init__(self):
+        self.batches = []
+        self.lock = threading.Lock()
+
+    def act(self, position, infoset):
+        return (position, infoset * 7 % 11)
+
+    def act_batch(self, position, infosets):
+        with self.lock:
+            self.batches.append((time.perf_counter(), position, list(infosets)))
+        return [self.act(position, infoset) for infoset in infosets]
+
+
+def submit(broker, requests):
+    """Send every (position, infoset) from its own thread; {request: action}.
+
+    Each thread leaves the broker after its one request.
+    """
+    answers = {}
+    lock = threading.Lock()
+
+    def client(request):
+        try:
+            action = broker.act(*request)
+            with lock:
+                answers[request] = action
+        finally:
+            #与run_threaded_games一样, 线程结束时通知broker
+            broker.leave()
+
+    threads = [threading.Thread(target=client, args=(request,)) for request in requests]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return answers
+
+
+def test_broker_equals_act():
+    agent = FakeAgent()
+    broker = InferenceBroker(agent.act_batch, max_batch=4, max_wait=0.001)
+    requests = [(POSITIONS[i % 3], i) for i in range(60)]
+    answers = submit(broker, requests)
+    broker.close()
+
+    assert answers == {request: agent.act(*request) for request in requests}
+    for _, position, infosets in agent.batches:
+        assert 1 <= len(infosets) <= 4
+        assert all((position, infoset) in answers for infoset in infosets)
+    assert broker.decisions == 60
+    assert sum(size * count for size, count in broker.batch_sizes.items()) == 60
+
+
+def test_full_batch_does_not_wait():
+    agent = FakeAgent()
+    broker = InferenceBroker(agent.act_batch, max_batch=4, max_wait=60.0)
+    begin = time.perf_counter()
+    submit(broker, [("landlord", i) for i in range(8)])
+    broker.close()
+    #满批立即计算, 不等max_wait
+    assert time.perf_counter() - begin < 30.0
+    assert [len(infosets) for _, _, infosets in agent.batches] == [4, 4]
+
+
+def test_partial_batch_waits_max_wait():
+    agent = FakeAgent()
+    max_wait = 0.05
+    broker = InferenceBroker(agent.act_batch, max_batch=100, max_wait=max_wait)
+    begin = time.perf_counter()
+    answers = submit(broker, [("landlord", i) for i in range(3)])
+    broker.close()
+    assert len(answers) == 3
+    #未满批: 最早的请求等满max_wait才计算
+    first_batch = agent.batches[0][0]
+    assert first_batch - begin >= max_wait
+    assert sum(len(infosets) for _, _, infosets in agent.batches) == 3
+
+
+def test_all_clients_waiting_runs_at_once():
+    agent = FakeAgent()
+    broker = InferenceBroker(agent.act_batch, max_batch=100, max_wait=60.0, clients=3)
+    begin = time.perf_counter()
+    submit(broker, [(position, 1) for position in POSITIONS])
+    broker.close()
+    assert time.perf_counter() - begin < 30.0
+    assert sorted(position for _, position, _ in agent.batches) == sorted(POSITIONS)
+
+
+def test_batched_act_equals_act():
+    torch = pytest.importorskip("torch")
+    import ai_adapter
+
+    class Model(torch.nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.z = torch.nn.Linear(6, 4)
+            self.x = torch.nn.Linear(5, 4)
+            self.out = torch.nn.Linear(4, 1)
+
+        def forward(self, z, x, return_value=False):
+            values = self.out(torch.tanh(self.z(z) + self.x(x)))
+            return dict(values=values)
+
+    def get_obs(infoset):
+        n = len(infoset.legal_actions)
+        rng = np.random.default_rng(infoset.seed)
+        return {'z_batch': np.repeat(rng.standard_normal((1, 6)), n, axis=0),
+                'x_batch': rng.standard_normal((n, 5))}
+
+    class Agent(object):
+        """DouZero's DeepAgent.act, one infoset at a time."""
+
+        def __init__(self):
+            self.model = Model().eval()
+
+        def act(self, infoset):
+            if len(infoset.legal_actions) == 1:
+                return infoset.legal_actions[0]
+            obs = get_obs(infoset)
+            z = torch.from_numpy(obs['z_batch']).float()
+            x = torch.from_numpy(obs['x_batch']).float()
+            with torch.no_grad():
+                values = self.model.forward(z, x, return_value=True)['values']
+            return infoset.legal_actions[int(np.argmax(values.numpy().reshape(-1)))]
+
+    class InfoSet(object):
+        def __init__(self, seed, n):
+            self.seed = seed
+            self.legal_actions = [[seed, k] for k in range(n)]
+
+    torch.manual_seed(0)
+    agent = Agent()
+    infosets = [InfoSet(seed, 1 + seed % 9) for seed in range(40)]
+    assert (ai_adapter._batched_act(agent, get_obs, infosets)
+            == [agent.act(infoset) for infoset in infosets])
+
+
+def test_alphadou_is_not_brokered():
+    from ai_adapter import AlphaDouAdapter, DouZeroAdapter
+    from inference import adapter_class
+    assert adapter_class("douzero").batched
+    assert not adapter_class("alphadou").batched
+    assert DouZeroAdapter.batched and not AlphaDouAdapter.batched
+    with pytest.raises(NotImplementedError):
+        AlphaDouAdapter.__new__(AlphaDouAdapter).act_batch("landlord", [])
@@ -0,0 +1,112 @@
+"""Incremental InfoSet history (ai_adapter.InfosetTracker) against a full replay."""
+
+import copy
+
+import pytest
+
+import ai_adapter
+from ai_adapter import _BOMBS, _cards_to_dz, _get_position
+from main import Game
+from myutil import game_rng
+
+FIELDS = ["player_position", "player_hand_cards", "three_landlord_cards",
+          "num_cards_left_dict", "all_handcards", "other_hand_cards",
+          "card_play_action_seq", "played_cards", "last_move_dict", "bomb_num",
+          "last_move", "last_two_moves", "last_pid"]
+
+
+def replay(playrecords, dizhu_id, for_alphadou):
+    """History fields rebuilt from every record, as before the tracker."""
+    action_seq = []
+    played_cards = {'landlord': [], 'landlord_down': [], 'landlord_up': []}
+    last_move_dict = {'landlord': [], 'landlord_down': [], 'landlord_up': []}
+    bomb_num = 0
+    for rec_pid, rec_move in ((record[0], record[1]) for record in playrecords.records):
+        rec_pos = _get_position(rec_pid, dizhu_id)
+        dz_action = [] if isinstance(rec_move, str) else _cards_to_dz(rec_move)
+        action_seq.append((rec_pos, dz_action) if for_alphadou else dz_action)
+        if dz_action:
+            played_cards[rec_pos] += dz_action
+            last_move_dict[rec_pos] = dz_action.copy()
+            if dz_action in _BOMBS:
+                bomb_num += 1
+
+    actions = [entry[1] if for_alphadou else entry for entry in action_seq]
+    last_move = []
+    if actions:
+        prev = actions[-2] if len(actions) >= 2 else []
+        last_move = prev if len(actions[-1]) == 0 else actions[-1]
+    last_two_moves = [actions[-1] if actions else [],
+                      actions[-2] if len(actions) >= 2 else []]
+    last_pid = 'landlord'
+    for record in reversed(playrecords.records):
+        if not isinstance(record[1], str):
+            last_pid = _get_position(record[0], dizhu_id)
+            break
+    return {
+        "card_play_action_seq": action_seq,
+        "played_cards": played_cards,
+        "last_move_dict": last_move_dict,
+        "bomb_num": bomb_num,
+        "last_move": last_move,
+        "last_two_moves": last_two_moves,
+        "last_pid": last_pid,
+    }
+
+
+@pytest.mark.parametrize("engine", ["cards", "rank"])
+@pytest.mark.parametrize("index", range(6))
+def test_incremental_equals_replay(engine, index):
+    game = Game("random", engine, seed=game_rng(22, index), record="moves")
+    game.game_start()
+    built = []
+    while game.playrecords.winner == 0:
+        player = game.players[game.i]
+        dizhu_id = game.playrecords.dizhu_id
+        position = _get_position(player.player_id, dizhu_id)
+        for for_alphadou in (False, True):
+            infoset = ai_adapter._build_infoset(
+                player, game.playrecords, position, dizhu_id, for_alphadou)
+            expected = replay(game.playrecords, dizhu_id, for_alphadou)
+            for field, value in expected.items():
+                assert getattr(infoset, field) == value, field
+            built.append((infoset, {f: copy.deepcopy(getattr(infoset, f)) for f in FIELDS}))
+        game.next_move()
+
+    #后续出牌不会改变已经交出去的InfoSet
+    for infoset, fields in built:
+        for field, value in fields.items():
+            assert getattr(infoset, field) == value, field
+
+
+def test_history_views_are_fixed_and_list_like():
+    history = [[3], [], [4, 4]]
+    view = ai_adapter._Prefix(history)
+    history.append([5])
+    history[-1].append(5)
+    assert len(view) == 3 and list(view) == [[3], [], [4, 4]]
+    assert view == [[3], [], [4, 4]] and view != history
+    assert view[-1] == [4, 4] and view[0] == [3]
+    with pytest.raises(IndexError):
+        view[3]
+    #get_obs: sequence[-15:].copy(), 不足15个时在前面补[]
+    assert view[-15:].copy() == [[3], [], [4, 4]]
+    assert view[1:] == [[], [4, 4]] and view[::-1] == [[4, 4], [], [3]]
+    assert [4, 4] in view and [5] not in view
+
+
+def test_infoset_history_is_not_copied():
+    """Handing out the history costs O(1), not O(turns played)."""
+    game = Game("random", "rank", seed=game_rng(22, 0), record="moves")
+    game.game_start()
+    for _ in range(30):
+        game.next_move()
+    player = game.players[game.i]
+    dizhu_id = game.playrecords.dizhu_id
+    position = _get_position(player.player_id, dizhu_id)
+    infoset = ai_adapter._build_infoset(player, game.playrecords, position, dizhu_id, False)
+    tracker = game.playrecords.infoset_tracker
+    assert isinstance(infoset.card_play_action_seq, ai_adapter._Prefix)
+    assert infoset.card_play_action_seq._items is tracker.douzero_seq
+    for pos, cards in infoset.played_cards.items():
+        assert cards._items is tracker.played_cards[pos]
@@ -0,0 +1,80 @@
+"""Player.go with a shared MoveCache, for every engine and model kind."""
+
+import pytest
+
+from main import Game
+from move_cache import MoveCache
+from pimc import PIMC
+from rank_moves import Move
+
+ENGINES = ["cards", "rank", "lazy", "catalogue"]
+#solver与pimc返回Move, random从next_moves里选
+MODELS = ["solver", "pimc", "random"]
+GAMES = 12
+
+
+@pytest.fixture(autouse=True)
+def small_pimc():
+    #本进程内少量采样, 时间上限足够大, 结果只由种子决定
+    PIMC.configure(samples=2, time_budget=60.0, workers=1)
+    yield
+    PIMC._instance.close()
+    PIMC._instance = None
+
+
+def play(model, engine, cache, record):
+    games = []
+    for k in range(GAMES):
+        game = Game({"dizhu": model, "nongmin": "random"}, engine, move_cache=cache,
+                    seed=k, record=record)
+        game.game_start()
+        dealt = {player.player_id: set(player.cards_left) for player in game.players}
+        while game.playrecords.winner == 0:
+            game.next_move()
+        games.append((game, dealt))
+    return games
+
+
+def moves_of(game):
+    return [(pid, move if isinstance(move, str) else sorted(card.rank for card in move))
+            for pid, move in game.playrecords.records]
+
+
+@pytest.mark.parametrize("model", MODELS)
+@pytest.mark.parametrize("engine", ENGINES)
+def test_cache_plays_the_same_games(engine, model):
+    cache = MoveCache(10000)
+    cached = play(model, engine, cache, "moves")
+    fresh = play(model, engine, None, "moves")
+    if engine != "lazy":
+        assert cache.hits > 0
+    for (a, _), (b, _) in zip(cached, fresh):
+        assert moves_of(a) == moves_of(b)
+        assert a.playrecords.winner == b.playrecords.winner
+
+
+@pytest.mark.parametrize("model", MODELS)
+@pytest.mark.parametrize("engine", ENGINES)
+def test_recorded_moves_use_own_cards(engine, model):
+    cache = MoveCache(10000)
+    for game, dealt in play(model, engine, cache, "full"):
+        records = game.playrecords
+        for pid, history in ((1, records.next_moves1), (2, records.next_moves2),
+                             (3, records.next_moves3)):
+            for next_moves in history:
+                for move in next_moves:
+                    cards = move.cards if isinstance(move, Move) else move
+                    #rank/catalogue记录未绑定花色的Move
+                    if cards is not None:
+                        assert set(cards) <= dealt[pid]
+        for pid, move in records.records:
+            if not isinstance(move, str):
+                assert set(move) <= dealt[pid]
+
+
+def test_engines_do_not_share_entries():
+    cache = MoveCache(10000)
+    play("random", "rank", cache, "moves")
+    play("random", "cards", cache, "moves")
+    engines = {key[0] for key in cache._data}
+    assert engines == {"rank", "cards"}
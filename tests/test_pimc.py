@@ -0,0 +1,68 @@
+"""PIMC's worker pool, and Player.go leaving move generation to pimc."""
+
+import atexit
+
+import pytest
+
+from main import Game
+from move_cache import hand_key
+from myclass import Player
+from pimc import PIMC, Position
+
+ENGINES = ["cards", "rank", "lazy", "catalogue"]
+
+
+@pytest.fixture
+def small_pimc():
+    #本进程内少量采样, 时间上限足够大, 结果只由种子决定
+    pimc = PIMC.configure(samples=2, time_budget=60.0, workers=1)
+    yield pimc
+    pimc.close()
+    PIMC._instance = None
+
+
+def first_decision(seed):
+    game = Game("random", "rank", seed=seed, record="moves")
+    game.game_start()
+    player = game.players[game.i]
+    return Position.from_playrecords(player, game.playrecords, "start", [])
+
+
+def test_pool_is_closed_and_joined(monkeypatch):
+    registered = []
+    monkeypatch.setattr(atexit, "register", registered.append)
+    monkeypatch.setattr(atexit, "unregister", registered.remove)
+    pimc = PIMC(samples=2, time_budget=60.0, workers=2)
+    pimc.search(first_decision(0), seed=1)
+    pool = pimc._pool
+    processes = list(pool._pool)
+    #建池时注册退出时回收
+    assert registered.count(pimc.close) == 1
+    pimc.close()
+    assert pimc._pool is None and pimc.close not in registered
+    assert not any(process.is_alive() for process in processes)
+    #重复close无操作
+    pimc.close()
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_pimc_does_not_generate_native_moves(engine, small_pimc, monkeypatch):
+    def get_next_moves(self, last_move_type, last_move):
+        raise AssertionError("pimc generates its own candidates")
+
+    monkeypatch.setattr(Player, "get_next_moves", get_next_moves)
+    for seed in range(3):
+        game = Game("pimc", engine, seed=seed, record="full")
+        game.game_start()
+        while game.playrecords.winner == 0:
+            game.next_move()
+        records = game.playrecords
+        assert small_pimc.decisions > 0
+        #记录级别full时PIMC填入自己的候选出牌, 选中的出牌在其中
+        for pid in (1, 2, 3):
+            history = getattr(records, "next_moves%d" % pid)
+            played = [move for p, move in records.records if p == pid]
+            assert len(history) == len(played)
+            for next_moves, move in zip(history, played):
+                if not isinstance(move, str):
+                    assert hand_key(move) in [candidate.packed for candidate in next_moves]
@@ -0,0 +1,88 @@
+"""Resuming tournament.ResultsLog after an interrupted run."""
+
+import json
+
+import pytest
+
+from sequential import SequentialTest
+from tournament import ResultsLog, Summary
+
+CONFIG = {'seed': 0, 'model': 'random', 'engine': 'cards'}
+
+
+def result(game):
+    return {'game': game, 'seed': [0, game], 'dizhu_id': 1 + game % 3,
+            'winner': 1 + game % 2, 'turns': 20 + game, 'models': ['random'] * 3,
+            'cpu_seconds': 0.001, 'extra': 'not saved'}
+
+
+def saved(game):
+    return {key: result(game)[key] for key in ResultsLog.FIELDS}
+
+
+def write(path, games, flush_every):
+    log = ResultsLog(str(path), CONFIG, flush_every)
+    assert log.resume() == []
+    for game in games:
+        log.add(result(game))
+    return log
+
+
+def test_resume_keeps_committed_lines(tmp_path):
+    path = tmp_path / "results.jsonl"
+    log = write(path, range(10), flush_every=4)
+    log.commit()
+    assert ResultsLog(str(path), CONFIG).resume() == [saved(game) for game in range(10)]
+
+
+def test_resume_drops_truncated_last_line(tmp_path):
+    path = tmp_path / "results.jsonl"
+    #8局已提交, 之后的2局只写了一半就中断
+    write(path, range(10), flush_every=4)
+    committed = path.stat().st_size
+    with open(path, 'ab') as f:
+        f.write((json.dumps(saved(8)) + '\n').encode('utf-8'))
+        f.write(json.dumps(saved(9)).encode('utf-8')[:15])
+
+    log = ResultsLog(str(path), CONFIG, flush_every=4)
+    assert log.resume() == [saved(game) for game in range(8)]
+    assert path.stat().st_size == committed
+
+    #续跑: 从第8局接着写, 文件里没有残行
+    for game in range(8, 12):
+        log.add(result(game))
+    assert ResultsLog(str(path), CONFIG).resume() == [saved(game) for game in range(12)]
+    with open(path) as f:
+        assert [json.loads(line) for line in f] == [saved(game) for game in range(12)]
+
+
+def test_resume_refuses_other_config(tmp_path):
+    path = tmp_path / "results.jsonl"
+    write(path, range(4), flush_every=4)
+    with pytest.raises(ValueError):
+        ResultsLog(str(path), dict(CONFIG, seed=1)).resume()
+
+
+def test_resume_refuses_file_without_checkpoint(tmp_path):
+    path = tmp_path / "results.jsonl"
+    path.write_text(json.dumps(saved(0)) + '\n')
+    with pytest.raises(ValueError):
+        ResultsLog(str(path), CONFIG).resume()
+
+
+def test_resumed_results_stay_out_of_rates():
+    summary = Summary()
+    test = SequentialTest(0.5)
+    for game in range(1000):
+        summary.add(dict(saved(game), cpu_seconds=5.0), resumed=True)
+        test.add(1, resumed=True)
+    summary.add(saved(1000))
+    test.add(0)
+    assert summary.games == 1001 and summary.resumed == 1000
+    assert summary.dizhu_wins + summary.nongmin_wins == 1001
+    #只有本次运行的一局算进CPU时间和速度
+    assert summary.cpu_seconds == saved(1000)['cpu_seconds']
+    assert test.games == 1001
+    #本次运行1秒下了1局
+    test.begin -= 1.0
+    assert test.games_per_second() < 1.1
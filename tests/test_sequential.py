@@ -0,0 +1,92 @@
+"""SPRT decisions (sequential.SequentialTest) on known Bernoulli streams."""
+
+import math
+import random
+
+import pytest
+
+from sequential import ABOVE, BELOW, SequentialTest
+
+
+def run(test, p, rng, limit=100000):
+    """Feed Bernoulli(p) games until a decision; return it."""
+    for _ in range(limit):
+        decision = test.add(1 if rng.random() < p else 0)
+        if decision is not None:
+            return decision
+    return None
+
+
+def test_all_wins_decides_at_wald_bound():
+    test = SequentialTest(0.5, delta=0.05, min_games=1)
+    step = math.log(test.mu1 / test.mu0)
+    expected = math.ceil(test.upper / step)
+    for game in range(1, expected):
+        assert test.add(1) is None, game
+    assert test.add(1) == ABOVE
+    assert test.decided_at == expected
+    assert test.games_to_decision() == 0
+
+
+def test_all_losses_decides_below():
+    test = SequentialTest(0.5, delta=0.05, min_games=1)
+    step = math.log((1 - test.mu1) / (1 - test.mu0))
+    expected = math.ceil(test.lower / step)
+    decisions = [test.add(0) for _ in range(expected)]
+    assert decisions[:-1] == [None] * (expected - 1)
+    assert decisions[-1] == BELOW
+
+
+def test_min_games_delays_decision():
+    test = SequentialTest(0.5, delta=0.2, min_games=30)
+    assert [test.add(1) for _ in range(29)] == [None] * 29
+    assert test.add(1) == ABOVE
+    assert test.decided_at == 30
+
+
+def test_decision_is_kept():
+    test = SequentialTest(0.5, delta=0.1, min_games=1)
+    while test.add(1) is None:
+        pass
+    decided_at = test.decided_at
+    for _ in range(200):
+        assert test.add(0) == ABOVE
+    assert test.decided_at == decided_at
+
+
+@pytest.mark.parametrize("p, decision", [(0.7, ABOVE), (0.3, BELOW), (0.6, ABOVE), (0.4, BELOW)])
+def test_clear_streams_are_decided_right(p, decision):
+    rng = random.Random(p)
+    for _ in range(20):
+        assert run(SequentialTest(0.5, delta=0.05), p, rng) == decision
+
+
+@pytest.mark.parametrize("model", ["bernoulli", "normal"])
+def test_error_rates_at_the_hypotheses(model):
+    """At mean mu0 / mu1 the wrong decision comes at most about alpha / beta of the time."""
+    rng = random.Random(model)
+    runs = 300
+    for p, wrong in ((0.45, ABOVE), (0.55, BELOW)):
+        errors = sum(run(SequentialTest(0.5, delta=0.05, model=model), p, rng) == wrong
+                     for _ in range(runs))
+        #alpha = beta = 0.05; 300次中超过30次(10%)的概率可以忽略
+        assert errors <= 30, (p, errors)
+
+
+def test_paired_differences_normal_model():
+    rng = random.Random(5)
+    #配对差值d in {-1, 0, 1}, 均值0.2
+    test = SequentialTest(0.0, delta=0.05, model="normal")
+    while test.add(rng.choices([-1, 0, 1], weights=[0.2, 0.4, 0.4])[0]) is None:
+        pass
+    assert test.decision == ABOVE
+    assert test.mean > 0
+
+
+def test_invalid_settings():
+    with pytest.raises(ValueError):
+        SequentialTest(0.5, model="poisson")
+    with pytest.raises(ValueError):
+        SequentialTest(0.5, delta=0)
+    with pytest.raises(ValueError):
+        SequentialTest(0.98, delta=0.05)
@@ -0,0 +1,98 @@
+"""Memory-mapped checkpoint weights (ai_adapter._mapped_agent)."""
+
+import os
+
+import numpy as np
+import pytest
+
+torch = pytest.importorskip("torch")
+
+import ai_adapter
+
+
+class TinyNet(torch.nn.Module):
+    def __init__(self):
+        super().__init__()
+        self.norm = torch.nn.BatchNorm1d(8)
+        self.dense = torch.nn.Linear(8, 16)
+        self.out = torch.nn.Linear(16, 1)
+
+    def forward(self, x):
+        return self.out(torch.relu(self.dense(self.norm(x))))
+
+
+class DeepAgent(object):
+    """Same shape as the repos' DeepAgent: builds the net, loads the checkpoint."""
+
+    def __init__(self, position, model_path):
+        self.position = position
+        self.model = TinyNet()
+        state = self.model.state_dict()
+        pretrained = torch.load(model_path, map_location='cpu')
+        state.update({k: v for k, v in pretrained.items() if k in state})
+        self.model.load_state_dict(state)
+        self.model.eval()
+
+    def act(self, infoset):
+        with torch.no_grad():
+            values = self.model(torch.from_numpy(infoset)).reshape(-1)
+        return int(torch.argmax(values)), values.numpy()
+
+
+@pytest.fixture
+def checkpoint(tmp_path):
+    torch.manual_seed(0)
+    net = TinyNet()
+    #让BatchNorm的running统计量不是默认值
+    net.train()
+    net(torch.randn(64, 8))
+    model_dir = tmp_path / "model"
+    model_dir.mkdir()
+    path = model_dir / "landlord.ckpt"
+    #旧格式checkpoint(DouZero的baseline就是这种), 需要先转换才能mmap
+    torch.save(net.state_dict(), path, _use_new_zipfile_serialization=False)
+    return path
+
+
+def test_mapped_agent_acts_like_copied(checkpoint, tmp_path):
+    cache = tmp_path / "cache"
+    copied = DeepAgent("landlord", str(checkpoint))
+    mapped = ai_adapter._mapped_agent(DeepAgent, "landlord", str(checkpoint), str(cache))
+
+    rng = np.random.default_rng(0)
+    for _ in range(20):
+        infoset = rng.standard_normal((int(rng.integers(1, 30)), 8)).astype(np.float32)
+        action_c, values_c = copied.act(infoset)
+        action_m, values_m = mapped.act(infoset)
+        assert action_c == action_m
+        np.testing.assert_array_equal(values_c, values_m)
+
+    #转换后的副本只写进缓存目录, 模型目录不变
+    assert os.listdir(checkpoint.parent) == ["landlord.ckpt"]
+    assert len(os.listdir(cache)) == 1
+
+
+def test_zip_checkpoint_is_mapped_in_place(checkpoint, tmp_path):
+    path = tmp_path / "zip.ckpt"
+    torch.save(torch.load(checkpoint), path)
+    assert ai_adapter._mappable_checkpoint(str(path), str(tmp_path / "cache")) == str(path)
+    assert not (tmp_path / "cache").exists()
+
+
+def test_checkpoint_is_only_mapped(checkpoint, tmp_path, monkeypatch):
+    """Start-up maps the checkpoint; nothing reads it into private memory."""
+    cache = str(tmp_path / "cache")
+    #旧格式只转换一次(写进缓存), 之后的worker直接映射
+    ai_adapter._mappable_checkpoint(str(checkpoint), cache)
+    calls = []
+    real_load = torch.load
+
+    def spy(f, *args, **kwargs):
+        calls.append(kwargs.get('mmap', False))
+        return real_load(f, *args, **kwargs)
+
+    monkeypatch.setattr(torch, "load", spy)
+    agent = ai_adapter._mapped_agent(DeepAgent, "landlord", str(checkpoint), cache)
+    assert calls == [True]
+    assert torch.load is spy
+    assert not any(t.is_meta for t in agent.model.state_dict().values())
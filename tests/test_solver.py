@@ -0,0 +1,76 @@
+"""Endgame solver (solver.Solver) against exhaustive minimax."""
+
+import numpy as np
+import pytest
+
+from rank_moves import answer_moves
+from solver import Solver, random_endgame
+
+
+def brute(hands, turn, rival, owner):
+    """Whether the dizhu (seat 0) wins: full minimax, no table, no cut-offs."""
+    goal = turn == 0
+    nxt = (turn + 1) % 3
+    children = []
+    moves = answer_moves(hands[turn], rival)
+    if rival is not None:
+        moves = moves + [None]
+    for move in moves:
+        if move is None:
+            children.append(brute(hands, nxt, None if nxt == owner else rival, owner))
+        elif move.packed == hands[turn]:
+            children.append(goal)
+        else:
+            rest = list(hands)
+            rest[turn] -= move.packed
+            children.append(brute(tuple(rest), nxt, move, turn))
+    return any(children) if goal else all(children)
+
+
+@pytest.mark.parametrize("n_cards", [5, 6, 7])
+def test_dizhu_wins_equals_brute_force(n_cards):
+    rng = np.random.default_rng(n_cards)
+    solver = Solver(max_cards=20)
+    for _ in range(60):
+        hands = random_endgame(rng, n_cards)
+        for turn in range(3):
+            assert solver.dizhu_wins(hands, turn, None, turn) == brute(hands, turn, None, turn)
+            #对手刚出过一手牌的局面
+            owner = (turn - 1) % 3
+            for rival in answer_moves(hands[owner], None)[:3]:
+                if rival.packed == hands[owner]:
+                    continue
+                rest = list(hands)
+                rest[owner] -= rival.packed
+                rest = tuple(rest)
+                assert (solver.dizhu_wins(rest, turn, rival, owner)
+                        == brute(rest, turn, rival, owner))
+
+
+def test_solve_returns_a_winning_move():
+    rng = np.random.default_rng(1)
+    solver = Solver(max_cards=20)
+    for _ in range(100):
+        hands = random_endgame(rng, 7)
+        for turn in range(3):
+            move = solver.solve(hands, turn, None, turn)
+            goal = turn == 0
+            #dizhu_wins对seat 0而言; 农民赢即地主输
+            wins = brute(hands, turn, None, turn) == goal
+            assert (move is not None) == wins
+            if move is None or move.packed == hands[turn]:
+                continue
+            rest = list(hands)
+            rest[turn] -= move.packed
+            assert brute(tuple(rest), (turn + 1) % 3, move, turn) == goal
+
+
+def test_node_budget_aborts():
+    rng = np.random.default_rng(2)
+    solver = Solver(max_cards=20, max_nodes=10)
+    for _ in range(10):
+        solver.solve(random_endgame(rng, 16), 0, None, 0)
+        #超出预算的那个节点即中止
+        assert solver.last_nodes <= solver.max_nodes + 1
+    assert solver.aborted > 0
+    assert solver.stats()['solves'] == 10
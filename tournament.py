@@ -0,0 +1,367 @@
+# -*- coding: utf-8 -*-
+"""
+Parallel self-play: win-rate runs of main.Game over a process pool.
+
+Usage:
+    python tournament.py [--games N] [--workers W] [--model M] [--engine E]
+                         [--seed S] [--out FILE] [--flush-every K] [--verbose]
+                         [--sprt P [--delta D] [--alpha A] [--beta B]]
+                         [--shared-weights] [--move-cache SIZE]
+                         [--pimc-workers N] [--pimc-budget SECONDS]
+
+``--model`` is a model name ("random", "greedy", "douzero", "alphadou",
+"pimc", "solver", "solver+douzero", ...) or
+a JSON dict such as '{"dizhu": "alphadou", "nongmin": "random"}'.
+
+Games are independent, so they are handed to the workers one by one
+(in small chunks) and each result is streamed back as soon as it is done.
+Game k is seeded with game_rng(--seed, k), a counter-based generator, so
+results do not depend on the number of workers and any single game can be
+replayed with ``play_game(model, engine, game_rng(seed, k))``.
+
+With ``--out`` every result (game index, seed, dizhu_id, winner, turns,
+model per seat) is appended to a JSON-lines file, fsync'ed in batches of
+``--flush-every`` games, and FILE.ckpt records the committed length.  A
+killed run started again with the same arguments drops anything written
+after the last checkpoint, rebuilds the win counts from the file and plays
+only the games that are not in it.
+
+With ``--sprt P`` the dizhu win rate is tested against P (see
+sequential.py) after every game and the run stops as soon as it is
+decided; ``--games`` is then the upper limit.  Results arrive in
+completion order, so with several workers a slightly different set of
+games than with --workers 1 may be counted at the stopping point.
+
+``--pimc-workers`` and ``--pimc-budget`` set the rollout processes and
+the time limit of every "pimc" decision.  By default PIMC uses all cores
+when games run in this process (--workers 1) and one process inside pool
+workers, which already fill the cores.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import time
+
+from main import Game
+from move_cache import MoveCache
+from myclass import Player
+from myutil import game_rng, base_model, AI_MODELS
+from sequential import SequentialTest
+
+
+def play_game(model, engine="cards", seed=None, move_cache=None):
+    """Play one game to the end and return its result dict.
+
+    ``seed`` is anything Game accepts: None, an int or a Generator.  Only
+    the AI models get a move history (record="moves").  ``move_cache`` is
+    a MoveCache shared by the games of this process, or None.
+    """
+    begin = time.perf_counter()
+    cpu_begin = time.process_time()
+    models = model.values() if isinstance(model, dict) else [model]
+    record = "moves" if {base_model(m) for m in models} & set(AI_MODELS) else "none"
+    game = Game(model, engine, move_cache=move_cache, seed=seed, record=record)
+    game.game_start()
+    turns = 0
+    while game.playrecords.winner == 0:
+        game.next_move()
+        turns += 1
+    dizhu_id = game.playrecords.dizhu_id
+    winner = game.playrecords.winner
+    nongmin_model = game.model_dict.get("nongmin", "random")
+    return {
+        'dizhu_id': dizhu_id,
+        'winner': winner,
+        'dizhu_win': winner == dizhu_id,
+        'turns': turns,
+        'models': [game.model_dict.get("dizhu", nongmin_model) if seat == dizhu_id
+                   else nongmin_model for seat in (1, 2, 3)],
+        'seconds': time.perf_counter() - begin,
+        'cpu_seconds': time.process_time() - cpu_begin,
+        'pid': os.getpid(),
+    }
+
+
+# ============================================================
+#  Worker side
+# ============================================================
+
+_worker = {}
+
+
+def _init_pool(task, initargs, shared_weights=False, pimc=None):
+    """Pool initializer: keep the task and its settings in the worker."""
+    _worker['task'] = task
+    _worker['args'] = initargs
+    if shared_weights:
+        from ai_adapter import share_weights
+        share_weights()
+    if pimc:
+        from pimc import PIMC
+        PIMC.configure(**pimc)
+
+
+def _run(index):
+    return _worker['task'](*_worker['args'], index)
+
+
+def iter_pool(task, indices, initargs=(), workers=None, shared_weights=False, pimc=None):
+    """Yield ``task(*initargs, index)`` for every index, in completion order.
+
+    ``task`` is a module-level function (workers import it by name);
+    ``initargs`` reach every worker once, pickled, so mutable state in them
+    (a MoveCache) becomes per worker.  ``workers=1`` runs in this process
+    (no pool).  ``shared_weights`` memory-maps the NN checkpoints in every
+    worker (ai_adapter.share_weights); ``pimc`` is a dict of PIMC.configure
+    settings applied in every worker.
+    """
+    workers = workers or os.cpu_count() or 1
+    indices = list(indices)
+    if workers == 1:
+        _init_pool(task, initargs, shared_weights, pimc)
+        for index in indices:
+            yield _run(index)
+        return
+
+    chunksize = max(1, len(indices) // (workers * 16))
+    with multiprocessing.Pool(workers, _init_pool,
+                              (task, initargs, shared_weights, pimc)) as pool:
+        for result in pool.imap_unordered(_run, indices, chunksize):
+            yield result
+
+
+def play_indexed(model, engine, seed, move_cache, index):
+    """Game ``index`` of a run seeded with ``seed`` (the iter_games task)."""
+    result = play_game(model, engine, game_rng(seed, index), move_cache)
+    result['game'] = index
+    return result
+
+
+def iter_games(n_games, model, workers=None, seed=0, engine="cards", skip=(),
+               shared_weights=False, move_cache=0, pimc=None):
+    """Yield per-game result dicts as they finish, in completion order.
+
+    Game indices in ``skip`` (already played) are left out.  ``move_cache``
+    > 0 gives every worker a MoveCache of that size.  See iter_pool for
+    ``workers``, ``shared_weights`` and ``pimc``.
+    """
+    cache = MoveCache(move_cache) if move_cache else None
+    indices = [index for index in range(n_games) if index not in skip]
+    return iter_pool(play_indexed, indices, (model, engine, seed, cache),
+                     workers, shared_weights, pimc)
+
+
+# ============================================================
+#  Append-only results file
+# ============================================================
+
+class ResultsLog(object):
+    """JSON-lines results with a checkpoint of the committed length.
+
+    Lines are only appended, and FILE.ckpt is replaced atomically after
+    each fsync'ed batch, so after a crash everything up to the checkpoint
+    is complete and anything after it is discarded.
+    """
+    #每行保存的字段
+    FIELDS = ('game', 'seed', 'dizhu_id', 'winner', 'turns', 'models', 'cpu_seconds')
+
+    def __init__(self, path, config, flush_every=1000):
+        self.path = path
+        self.ckpt_path = path + '.ckpt'
+        #同一个结果文件只能续跑相同的设置(种子, 模型, 引擎)
+        self.config = config
+        self.flush_every = flush_every
+        self.pending = []
+        self.committed = 0
+
+    def resume(self):
+        """Return the committed results, truncating anything after them."""
+        if not os.path.exists(self.ckpt_path):
+            if os.path.exists(self.path) and os.path.getsize(self.path):
+                raise ValueError("%s has no checkpoint, refusing to append" % self.path)
+            open(self.path, 'w').close()
+            return []
+        with open(self.ckpt_path) as f:
+            ckpt = json.load(f)
+        if ckpt['config'] != self.config:
+            raise ValueError("%s was written with %s, not %s"
+                             % (self.path, ckpt['config'], self.config))
+        self.committed = ckpt['offset']
+        with open(self.path, 'rb+') as f:
+            data = f.read(self.committed)
+            f.truncate(self.committed)
+        return [json.loads(line) for line in data.decode('utf-8').splitlines()]
+
+    def add(self, result):
+        self.pending.append(json.dumps({key: result[key] for key in self.FIELDS}))
+        if len(self.pending) >= self.flush_every:
+            self.commit()
+
+    def commit(self):
+        """Append and fsync the pending lines, then move the checkpoint."""
+        if not self.pending:
+            return
+        with open(self.path, 'ab') as f:
+            f.write(('\n'.join(self.pending) + '\n').encode('utf-8'))
+            f.flush()
+            os.fsync(f.fileno())
+            self.committed = f.tell()
+        self.pending = []
+        tmp = self.ckpt_path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'config': self.config, 'offset': self.committed}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.ckpt_path)
+
+
+# ============================================================
+#  Merged statistics
+# ============================================================
+
+class Summary(object):
+    """Running totals over streamed game results.
+
+    Results resumed from a previous run count in the totals but not in
+    the games/s and speed-up of this run.
+    """
+    def __init__(self):
+        self.games = 0
+        #续跑时从结果文件读回的局数
+        self.resumed = 0
+        self.dizhu_wins = 0
+        self.nongmin_wins = 0
+        self.turns = 0
+        #每局CPU耗时之和(所有worker), 约等于单进程需要的时间
+        self.cpu_seconds = 0.0
+        self.begin = time.perf_counter()
+
+    def add(self, result, resumed=False):
+        self.games += 1
+        if result['winner'] == result['dizhu_id']:
+            self.dizhu_wins += 1
+        else:
+            self.nongmin_wins += 1
+        self.turns += result['turns']
+        if resumed:
+            self.resumed += 1
+        else:
+            self.cpu_seconds += result['cpu_seconds']
+
+    @property
+    def wall_seconds(self):
+        return time.perf_counter() - self.begin
+
+    def show(self):
+        games = max(self.games, 1)
+        wall = self.wall_seconds
+        played = self.games - self.resumed
+        print(f"Total games: {self.games}"
+              + (f" ({self.resumed} resumed, {played} played now)" if self.resumed else ""))
+        print(f"Dizhu wins: {self.dizhu_wins} ({self.dizhu_wins/games*100:.1f}%)")
+        print(f"Nongmin wins: {self.nongmin_wins} ({self.nongmin_wins/games*100:.1f}%)")
+        print(f"Turns/game: {self.turns/games:.1f}")
+        print(f"Time: {wall:.2f}s wall, {self.cpu_seconds:.2f}s CPU in games, "
+              f"{played/wall:.1f} games/s, "
+              f"speed-up x{self.cpu_seconds/wall:.2f}")
+
+
+def parse_model(text):
+    """Model name or JSON {"dizhu": ..., "nongmin": ...} dict."""
+    if text.lstrip().startswith('{'):
+        return json.loads(text)
+    return text
+
+
+def add_pimc_options(parser):
+    """--pimc-workers / --pimc-budget (tournament and arena CLIs)."""
+    parser.add_argument("--pimc-workers", type=int, metavar="N",
+                        help="rollout processes per pimc decision "
+                             "(default: all cores with --workers 1, else 1)")
+    parser.add_argument("--pimc-budget", type=float, metavar="SECONDS",
+                        help="time limit of a pimc decision")
+
+
+def pimc_settings(parser, args):
+    """PIMC.configure settings from the parsed options, or None."""
+    if (args.pimc_workers or 1) > 1 and args.workers != 1:
+        parser.error("--pimc-workers > 1 needs --workers 1 "
+                     "(pool workers cannot start pools of their own)")
+    settings = {}
+    if args.pimc_workers is not None:
+        settings['workers'] = args.pimc_workers
+    if args.pimc_budget is not None:
+        settings['time_budget'] = args.pimc_budget
+    return settings or None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--model", type=parse_model, default="random")
+    parser.add_argument("--engine", default="cards", choices=sorted(Player.ENGINES))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="append-only results file (resumed if present)")
+    parser.add_argument("--flush-every", type=int, default=1000)
+    parser.add_argument("--verbose", action="store_true", help="print every game")
+    parser.add_argument("--sprt", type=float, metavar="P",
+                        help="stop once the dizhu win rate is decided above/below P")
+    parser.add_argument("--delta", type=float, default=0.02, help="SPRT indifference zone")
+    parser.add_argument("--alpha", type=float, default=0.05)
+    parser.add_argument("--beta", type=float, default=0.05)
+    parser.add_argument("--report-every", type=int, default=100)
+    parser.add_argument("--shared-weights", action="store_true",
+                        help="memory-map the NN checkpoints, shared by all workers")
+    parser.add_argument("--move-cache", type=int, default=0, metavar="SIZE",
+                        help="per-worker LRU cache of legal moves (0: off)")
+    add_pimc_options(parser)
+    args = parser.parse_args()
+    pimc = pimc_settings(parser, args)
+
+    summary = Summary()
+    test = None
+    if args.sprt is not None:
+        test = SequentialTest(args.sprt, args.delta, args.alpha, args.beta)
+    log = None
+    done = set()
+    if args.out:
+        config = {'seed': args.seed, 'model': args.model, 'engine': args.engine}
+        log = ResultsLog(args.out, config, args.flush_every)
+        for result in log.resume():
+            summary.add(result, resumed=True)
+            done.add(result['game'])
+            if test is not None:
+                test.add(int(result['winner'] == result['dizhu_id']), resumed=True)
+        if done:
+            print(f"Resuming {args.out}: {len(done)} games already played")
+
+    try:
+        #续跑时可能已经判定
+        n_games = 0 if test is not None and test.decision is not None else args.games
+        for result in iter_games(n_games, args.model, args.workers, args.seed,
+                                 args.engine, skip=done, shared_weights=args.shared_weights,
+                                 move_cache=args.move_cache, pimc=pimc):
+            result['seed'] = args.seed
+            summary.add(result)
+            if log is not None:
+                log.add(result)
+            if args.verbose:
+                print(f"game {result['game']}: dizhu {result['dizhu_id']} "
+                      f"winner {result['winner']} turns {result['turns']} "
+                      f"({result['seconds']*1000:.1f}ms, pid {result['pid']})")
+            if test is not None:
+                decision = test.add(int(result['winner'] == result['dizhu_id']))
+                if summary.games % args.report_every == 0 or decision is not None:
+                    print(test.status())
+                #判定后退出, 关闭进程池里未完成的对局
+                if decision is not None:
+                    break
+    finally:
+        if log is not None:
+            log.commit()
+    summary.show()
+    if test is not None:
+        test.show("dizhu win rate")
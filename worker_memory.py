@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+Memory and start-up time per simulation worker, with and without shared weights.
+
+Usage:
+    python worker_memory.py [--model douzero|alphadou|...] [--workers W]
+                            [--games G] [--engine E] [--seed S]
+
+W worker processes are started twice: once loading the checkpoints the
+usual way (every worker reads its own copy through DeepAgent) and once
+with ai_adapter.share_weights() (weights memory-mapped from the checkpoint
+files, shared read-only through the page cache).  Each worker
+
+- builds the adapter and times it (start-up),
+- plays G games, so every network has run at least once,
+- waits until all W workers got there, then reads its memory.
+
+Memory is read from /proc/self/smaps_rollup: RSS counts shared pages in
+full in every process, PSS splits them between the processes mapping
+them, and USS is the private part.  Summed over the workers, PSS is the
+real footprint, so with shared weights the checkpoints appear once in
+total PSS instead of W times.
+"""
+
+import argparse
+import multiprocessing
+import resource
+import time
+
+from myutil import base_model, game_rng, AI_MODELS
+from tournament import parse_model, play_game
+
+
+def memory():
+    """{'rss', 'pss', 'uss'} of this process in MB (rss only off Linux)."""
+    fields = {}
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == 'kB':
+                    fields[parts[0].rstrip(':')] = int(parts[1]) / 1024
+    except OSError:
+        #ru_maxrss为峰值(Linux单位KB)
+        return {'rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+                'pss': None, 'uss': None}
+    return {
+        'rss': fields.get('Rss', 0.0),
+        'pss': fields.get('Pss', 0.0),
+        'uss': fields.get('Private_Clean', 0.0) + fields.get('Private_Dirty', 0.0),
+    }
+
+
+def _worker(model, shared_weights, games, engine, seed, index, barrier, queue):
+    begin = time.perf_counter()
+    from inference import adapter_for
+    if shared_weights:
+        from ai_adapter import share_weights
+        share_weights()
+    #只有AI模型需要加载网络
+    models = model.values() if isinstance(model, dict) else [model]
+    for name in {base_model(m) for m in models} & set(AI_MODELS):
+        adapter_for(name)
+    startup = time.perf_counter() - begin
+    for k in range(games):
+        play_game(model, engine, game_rng(seed, index * games + k))
+    barrier.wait()
+    queue.put(dict(memory(), startup=startup, worker=index))
+    #所有进程测完再退出, PSS才按W个进程分摊
+    barrier.wait()
+
+
+def measure(model, workers, shared_weights, games=1, engine="cards", seed=0):
+    """Per-worker dicts (startup seconds, rss/pss/uss MB) of one run."""
+    barrier = multiprocessing.Barrier(workers)
+    queue = multiprocessing.Queue()
+    processes = [multiprocessing.Process(
+        target=_worker,
+        args=(model, shared_weights, games, engine, seed, index, barrier, queue))
+        for index in range(workers)]
+    for process in processes:
+        process.start()
+    rows = [queue.get() for _ in processes]
+    for process in processes:
+        process.join()
+    return sorted(rows, key=lambda row: row['worker'])
+
+
+def show(label, rows):
+    def mean(key):
+        return sum(row[key] for row in rows) / len(rows)
+    def total(key):
+        return sum(row[key] for row in rows)
+    line = (f"{label:8s} per worker: start-up {mean('startup')*1000:8.1f}ms  "
+            f"RSS {mean('rss'):7.1f}MB")
+    if rows[0]['pss'] is not None:
+        line += (f"  PSS {mean('pss'):7.1f}MB  USS {mean('uss'):7.1f}MB;  "
+                 f"total PSS {total('pss'):8.1f}MB")
+    print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--model", type=parse_model, default="douzero")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--games", type=int, default=1)
+    parser.add_argument("--engine", default="cards")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{args.workers} workers, model {args.model}, {args.games} games each")
+    for label, shared_weights in (("copy", False), ("shared", True)):
+        show(label, measure(args.model, args.workers, shared_weights,
+                            args.games, args.engine, args.seed))